@@ -0,0 +1,332 @@
+"""Offline bulk classification of prompt logs in JSONL or CSV files.
+
+Input rows are streamed from the file and sent in chunks to a pool of worker
+processes. Each worker loads one model instance and classifies its chunks
+with service.classify_prompts: the same threshold selection and settings
+merge as /classify, so offline and online results match. Results are
+written in input order as JSONL (one object per row, the /classify response
+plus "row" and "id") or as a directory of Parquet part files.
+
+Progress is checkpointed to <output>.checkpoint every --checkpoint-rows
+rows. Running the same command again resumes after the last checkpoint;
+anything written after it is discarded first. Use --restart to start over.
+
+Usage:
+    python -m app.classify_offline prompts.jsonl results.jsonl --workers 4
+    python -m app.classify_offline logs.csv results/ --format parquet --text-field message --id-field request_id
+"""
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import time
+from collections import deque
+from pathlib import Path
+
+from app.src.service.logger import get_logger
+
+logger = get_logger("script:classify_offline")
+
+PARQUET_PART = "part-{:06d}.parquet"
+
+
+# --- Input ---
+def parse_line(number, line):
+    """(record, None) for a JSONL line, or (None, error) when it is not valid JSON"""
+    try:
+        return json.loads(line), None
+    except json.JSONDecodeError as e:
+        return None, f"invalid JSON on line {number}, column {e.colno}: {e.msg.removesuffix(' at')}"
+
+
+def read_rows(path, text_field, id_field=None, skip=0):
+    """Yield (row number, id, text, error) for every row of a .jsonl or .csv file, after the first ``skip`` rows.
+
+    A row that cannot be parsed has no text and says why in ``error``, so one
+    bad line does not stop a run (or every resume of it).
+    """
+    path = Path(path)
+    with path.open("r", encoding="utf-8", newline="") as f:
+        if path.suffix == ".csv":
+            records = ((record, None) for record in csv.DictReader(f))
+        elif path.suffix == ".jsonl":
+            # Skipped lines are counted, not parsed
+            lines = ((number, line) for number, line in enumerate(f, start=1) if line.strip())
+            records = (parse_line(number, line) if i >= skip else None for i, (number, line) in enumerate(lines))
+        else:
+            raise ValueError(f"Unsupported input file '{path}', expected .jsonl or .csv")
+
+        for row, (record, error) in enumerate(itertools.islice(records, skip, None), start=skip):
+            if error is not None:
+                yield row, None, None, error
+                continue
+            if not isinstance(record, dict):
+                record = {text_field: record}
+            text = record.get(text_field)
+            yield row, record.get(id_field) if id_field else None, text if isinstance(text, str) else None, None
+
+
+def count_rows(path):
+    """Number of data rows in the input, used for the ETA (approximate for CSV with multi-line fields)"""
+    path = Path(path)
+    with path.open("rb") as f:
+        if path.suffix == ".csv":
+            return max(0, sum(1 for line in f if line.strip()) - 1)
+        return sum(1 for line in f if line.strip())
+
+
+def chunked(rows, size):
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# --- Workers ---
+def init_worker(workers):
+    """Pool initializer: load this process's model instance once"""
+    # Ctrl-C stops the parent, which terminates the pool; a worker killed by
+    # it mid-task would leave the parent waiting for its result forever
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from app.src.service.executor import configure_torch_threads
+    from app.src.service.service import model_manager
+
+    configure_torch_threads(processes=workers)
+    model_manager.load()
+
+
+def classify_chunk(chunk, high_gap, ratio, min_threshold):
+    """Classify one chunk of (row, id, text, error) rows, returns one output record per row"""
+    from app.src.service.service import classify_prompts
+
+    valid = [(row, row_id, text) for row, row_id, text, _ in chunk if text and text.strip()]
+    results = classify_prompts([text for _, _, text in valid], high_gap, ratio, min_threshold)
+
+    records = {row: {"row": row, "id": row_id, "categories": categories, "settings": settings}
+               for (row, row_id, _), (categories, settings) in zip(valid, results)}
+    return [records.get(row) or {"row": row, "id": row_id, "error": error or "empty or missing text"}
+            for row, row_id, _, error in chunk]
+
+
+# --- Output ---
+class JsonlWriter:
+    """Appends records to one JSONL file; a checkpoint is the file size after a flush"""
+
+    def __init__(self, path, checkpoint):
+        self.path = Path(path)
+        if checkpoint:
+            # Drop rows written after the last checkpoint
+            with self.path.open("r+b") as f:
+                f.truncate(checkpoint["output_bytes"])
+        self.file = self.path.open("ab" if checkpoint else "wb")
+
+    def write(self, records):
+        self.file.write(b"".join(json.dumps(r, ensure_ascii=False).encode("utf-8") + b"\n" for r in records))
+
+    def commit(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {"output_bytes": self.file.tell()}
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """Writes every checkpoint's rows as a new part file in an output directory"""
+
+    def __init__(self, path, checkpoint):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise RuntimeError("Parquet output needs pyarrow: pip install pyarrow") from e
+        self.pa, self.pq = pyarrow, pyarrow.parquet
+        self.schema = pyarrow.schema([
+            ("row", pyarrow.int64()),
+            ("id", pyarrow.string()),
+            ("categories", pyarrow.list_(pyarrow.struct([("name", pyarrow.string()),
+                                                          ("confidence", pyarrow.float64())]))),
+            ("temperature", pyarrow.float64()),
+            ("reasoning_effort", pyarrow.string()),
+            ("web", pyarrow.string()),
+            ("verbosity", pyarrow.string()),
+            ("truncated_tokens", pyarrow.int64()),
+            ("config_version", pyarrow.string()),
+            ("error", pyarrow.string()),
+        ])
+
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.parts = checkpoint["parts"] if checkpoint else 0
+        # Drop parts written after the last checkpoint (all of them on a fresh run)
+        for part in self.path.glob("part-*.parquet"):
+            if int(part.stem.split("-")[1]) >= self.parts:
+                part.unlink()
+        self.pending = []
+
+    def write(self, records):
+        for r in records:
+            settings = r.get("settings", {})
+            truncation = settings.get("truncation")
+            self.pending.append({
+                "row": r["row"],
+                "id": None if r["id"] is None else str(r["id"]),
+                "categories": r.get("categories"),
+                "temperature": settings.get("temperature"),
+                "reasoning_effort": settings.get("reasoning_effort"),
+                "web": settings.get("web"),
+                "verbosity": settings.get("verbosity"),
+                "truncated_tokens": truncation["prompt_tokens"] - truncation["kept_tokens"] if truncation else None,
+                "config_version": settings.get("config_version"),
+                "error": r.get("error"),
+            })
+
+    def commit(self):
+        if self.pending:
+            table = self.pa.Table.from_pylist(self.pending, schema=self.schema)
+            self.pq.write_table(table, self.path / PARQUET_PART.format(self.parts))
+            self.parts += 1
+            self.pending = []
+        return {"parts": self.parts}
+
+    def close(self):
+        pass
+
+
+WRITERS = {"jsonl": JsonlWriter, "parquet": ParquetWriter}
+
+
+# --- Checkpoints ---
+def checkpoint_path(output):
+    return Path(str(Path(output)).rstrip("/\\") + ".checkpoint")
+
+
+def load_checkpoint(path, args):
+    if args.restart or not path.exists():
+        # A stale checkpoint would point into the output this run overwrites
+        path.unlink(missing_ok=True)
+        return None
+    checkpoint = json.loads(path.read_text(encoding="utf-8"))
+    if checkpoint["input"] != str(Path(args.input).resolve()) or checkpoint["format"] != args.format:
+        raise SystemExit(f"{path} belongs to a different run ({checkpoint['input']}, {checkpoint['format']}); "
+                         f"use --restart to overwrite it")
+    return checkpoint
+
+
+def save_checkpoint(path, checkpoint):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(checkpoint), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "unknown"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Input .jsonl or .csv file")
+    parser.add_argument("output", help="Output .jsonl file, or directory for --format parquet")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="jsonl")
+    parser.add_argument("--text-field", default="prompt", help="Field or column holding the prompt")
+    parser.add_argument("--id-field", help="Field or column copied to the output as 'id'")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 1) // 4),
+                        help="Worker processes, each with its own model instance")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Rows sent to a worker at a time")
+    parser.add_argument("--checkpoint-rows", type=int, default=10000, help="Rows between checkpoints")
+    parser.add_argument("--high-gap", type=float, default=0.15)
+    parser.add_argument("--ratio", type=float, default=0.8)
+    parser.add_argument("--min-threshold", type=float, default=0.2)
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and start over")
+    parser.add_argument("--progress-seconds", type=float, default=10, help="Interval between progress reports")
+    args = parser.parse_args()
+
+    ckpt_path = checkpoint_path(args.output)
+    checkpoint = load_checkpoint(ckpt_path, args)
+    rows_done = checkpoint["rows_done"] if checkpoint else 0
+    total = count_rows(args.input)
+    if checkpoint:
+        logger.info(f"Resuming {args.input} after row {rows_done} of {total}")
+
+    writer = WRITERS[args.format](args.output, checkpoint)
+    state = {
+        "input": str(Path(args.input).resolve()),
+        "format": args.format,
+        "rows_done": rows_done,
+        "config_version": checkpoint.get("config_version") if checkpoint else None,
+        # Read by app.seed_cache to build the same cache keys as /classify
+        "thresholds": {"high_gap": args.high_gap, "ratio": args.ratio, "min_threshold": args.min_threshold},
+    }
+
+    chunks = chunked(read_rows(args.input, args.text_field, args.id_field, skip=rows_done), args.chunk_size)
+    thresholds = (args.high_gap, args.ratio, args.min_threshold)
+    start = last_report = time.time()
+    since_checkpoint = processed = 0
+    # The rate is measured from the first result, so that model loading does not skew the ETA
+    rate_start = None
+
+    def consume(records):
+        nonlocal since_checkpoint, processed, last_report, rate_start
+        versions = {r["settings"]["config_version"] for r in records if "settings" in r}
+        if state["config_version"] is None and versions:
+            state["config_version"] = versions.pop()
+        if versions - {state["config_version"]}:
+            raise SystemExit(f"The label config changed from {state['config_version']} to {sorted(versions)}; "
+                             f"use --restart to classify everything with the new one")
+
+        writer.write(records)
+        state["rows_done"] += len(records)
+        since_checkpoint += len(records)
+        processed += len(records)
+        if rate_start is None:
+            rate_start = (time.time(), processed)
+        if since_checkpoint >= args.checkpoint_rows:
+            save_checkpoint(ckpt_path, {**state, **writer.commit()})
+            since_checkpoint = 0
+
+        now = time.time()
+        if now - last_report >= args.progress_seconds:
+            rate = (processed - rate_start[1]) / max(now - rate_start[0], 1e-9)
+            eta = (total - state["rows_done"]) / rate if rate else None
+            logger.info(f"{state['rows_done']}/{total} rows, {rate:.1f} rows/s, ETA {format_eta(eta)}")
+            last_report = now
+
+    # Workers are started fresh (spawn) so that each loads its own model instance
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(args.workers, initializer=init_worker, initargs=(args.workers,)) as pool:
+        # Bounded read-ahead, so the input is never held in memory as a whole;
+        # results are consumed in submission order, i.e. input order
+        pending = deque()
+        try:
+            for chunk in chunks:
+                pending.append(pool.apply_async(classify_chunk, (chunk, *thresholds)))
+                if len(pending) >= 2 * args.workers:
+                    consume(pending.popleft().get())
+            while pending:
+                consume(pending.popleft().get())
+        except KeyboardInterrupt:
+            # Rows after the last checkpoint are discarded and classified again on resume
+            writer.close()
+            checkpoint = json.loads(ckpt_path.read_text(encoding="utf-8")) if ckpt_path.exists() else {"rows_done": 0}
+            logger.info(f"Interrupted; run the same command again to resume after row {checkpoint['rows_done']}")
+            raise SystemExit(130)
+
+    save_checkpoint(ckpt_path, {**state, **writer.commit()})
+    writer.close()
+    elapsed = time.time() - start
+    logger.info(f"Done: {processed} rows in {elapsed:.1f}s ({processed / max(elapsed, 1e-9):.1f} rows/s), "
+                f"{state['rows_done']} total -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,40 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from app.src.routers.admission import router as admission_router
 from app.src.routers.classify import router as classify_router
 from app.src.routers.healthcheck import router as health_router
 from app.src.routers.latency import router as latency_router
-app = FastAPI()
+from app.src.routers.batching import router as batching_router
+from app.src.routers.cache import router as cache_router
+from app.src.routers.coalescing import router as coalescing_router
+from app.src.routers.labels import router as labels_router
+from app.src.routers.metrics import router as metrics_router
+from app.src.routers.ready import router as ready_router
+from app.src.routers.streaming import router as streaming_router
+from app.src.service.config import LABELS_WATCH_SECONDS
+from app.src.service.service import label_registry, model_manager
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load and warm up the model in the background; /ready reports progress
+    model_manager.start()
+    if LABELS_WATCH_SECONDS > 0:
+        label_registry.watch(LABELS_WATCH_SECONDS)
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 # include endpoints
 app.include_router(health_router)
+app.include_router(ready_router)
 app.include_router(classify_router)
-app.include_router(latency_router)
\ No newline at end of file
+app.include_router(latency_router)
+app.include_router(batching_router)
+app.include_router(cache_router)
+app.include_router(coalescing_router)
+app.include_router(admission_router)
+app.include_router(labels_router)
+app.include_router(streaming_router)
+app.include_router(metrics_router)
\ No newline at end of file
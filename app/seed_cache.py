@@ -0,0 +1,103 @@
+"""Pre-seed the persistent classification cache from an offline bulk classification run.
+
+Reads the input file of an app.classify_offline run together with its JSONL
+output and stores every classified row under the same key /classify uses
+(config version, normalized prompt and selection thresholds). The thresholds
+are taken from the run's checkpoint file when it is next to the output.
+Rows classified with another config version than the current labels,
+mapping and model are skipped, since /classify would never look them up.
+
+Usage:
+    python -m app.seed_cache prompts.jsonl results.jsonl --cache /var/cache/classifier.sqlite
+"""
+import argparse
+import itertools
+import json
+from pathlib import Path
+
+from app.classify_offline import checkpoint_path, read_rows
+from app.src.service.config import PERSISTENT_CACHE_MAX_ENTRIES, PERSISTENT_CACHE_PATH
+from app.src.service.logger import get_logger
+from app.src.service.persistent_cache import PersistentCache
+
+logger = get_logger("script:seed_cache")
+
+DEFAULT_THRESHOLDS = {"high_gap": 0.15, "ratio": 0.8, "min_threshold": 0.2}
+
+
+def read_results(path):
+    with Path(path).open("r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def run_thresholds(args):
+    """Thresholds from the command line, else from the run's checkpoint, else the /classify defaults"""
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    ckpt = checkpoint_path(args.output)
+    if ckpt.exists():
+        thresholds.update(json.loads(ckpt.read_text(encoding="utf-8")).get("thresholds", {}))
+    for name in thresholds:
+        if getattr(args, name) is not None:
+            thresholds[name] = getattr(args, name)
+    return thresholds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Input .jsonl or .csv file of the classify_offline run")
+    parser.add_argument("output", help="JSONL output of the classify_offline run")
+    parser.add_argument("--cache", default=PERSISTENT_CACHE_PATH,
+                        help="SQLite cache file (default: CLASSIFIER_PERSISTENT_CACHE_PATH)")
+    parser.add_argument("--text-field", default="prompt", help="Field or column holding the prompt")
+    parser.add_argument("--high-gap", type=float)
+    parser.add_argument("--ratio", type=float)
+    parser.add_argument("--min-threshold", type=float)
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows stored per transaction")
+    args = parser.parse_args()
+    if not args.cache:
+        parser.error("no cache file: pass --cache or set CLASSIFIER_PERSISTENT_CACHE_PATH")
+
+    # Imported here so that --help does not load torch
+    from app.src.service.service import cache_key, label_registry
+
+    label_set = label_registry.current
+    thresholds = run_thresholds(args)
+    cache = PersistentCache(args.cache, max_entries=PERSISTENT_CACHE_MAX_ENTRIES)
+    cache.ensure_version(label_set.version)
+    logger.info(f"Seeding {args.cache} for config version {label_set.version} with {thresholds}")
+
+    stored = skipped = stale = 0
+    rows = read_rows(args.input, args.text_field)
+    items = []
+    # The output of an interrupted run ends early; rows after it are not classified yet
+    for source, record in itertools.zip_longest(rows, read_results(args.output)):
+        if record is None:
+            break
+        if source is None or record["row"] != source[0]:
+            raise SystemExit(f"{args.output} does not match {args.input} at row {record['row']}")
+        _, _, text, _ = source
+        if "error" in record or not text:
+            skipped += 1
+            continue
+        if record["settings"].get("config_version") != label_set.version:
+            stale += 1
+            continue
+        key = cache_key(label_set, text, thresholds["high_gap"], thresholds["ratio"], thresholds["min_threshold"])
+        items.append((key, (record["categories"], record["settings"])))
+        if len(items) >= args.batch_size:
+            cache.put_many(items, label_set.version)
+            stored += len(items)
+            items = []
+    cache.put_many(items, label_set.version)
+    stored += len(items)
+
+    if cache.errors:
+        raise SystemExit(f"{cache.errors} writes to {args.cache} failed, see the log")
+    logger.info(f"Stored {stored} results, skipped {skipped} failed rows and {stale} rows of another "
+                f"config version; the cache holds {len(cache)} entries")
+
+
+if __name__ == "__main__":
+    main()
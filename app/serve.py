@@ -0,0 +1,138 @@
+"""Prefork multi-worker server that shares the model weights between workers.
+
+The parent process loads and warms up the model once, binds the listening
+socket and then forks the workers. Forked workers inherit the weights
+copy-on-write: inference only reads them, so their pages stay shared and
+each additional worker adds little resident memory. (uvicorn --workers
+spawns fresh interpreters instead, and every one loads its own copy.)
+
+Usage:
+    python -m app.serve --workers 4 --host 0.0.0.0 --port 8000
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+
+import torch
+import uvicorn
+
+from app.main import app
+from app.src.service.config import SERVE_PRELOAD, SERVE_WORKERS
+from app.src.service.executor import configure_torch_threads
+from app.src.service.latency_store import latency_store
+from app.src.service.logger import get_logger
+from app.src.service.service import model_manager
+
+logger = get_logger("script:serve")
+
+
+def bind_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def exit_worker(signum, frame):
+    sys.exit(0)
+
+
+def run_worker(sock, workers, log_level):
+    """Entry point of a forked worker; never returns"""
+    # uvicorn re-raises the signal it shut down on; exiting through SystemExit
+    # instead of the default action lets the atexit handlers run
+    signal.signal(signal.SIGTERM, exit_worker)
+    signal.signal(signal.SIGINT, exit_worker)
+    configure_torch_threads(processes=workers)
+
+    config = uvicorn.Config(app, log_level=log_level, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+    # Normal interpreter exit, so atexit handlers (latency snapshot) run
+    sys.exit(0)
+
+
+def fork_worker(sock, workers, log_level):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(sock, workers, log_level)
+        except SystemExit:
+            # Unwind normally so the atexit handlers (latency snapshot, queued logs) run
+            raise
+        except BaseException:
+            # Never fall back into the parent's loop; the logs may not drain before the exit
+            traceback.print_exc()
+            os._exit(1)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument("--preload", action=argparse.BooleanOptionalAction, default=SERVE_PRELOAD,
+                        help="Load the model in the parent before forking (default: CLASSIFIER_PRELOAD)")
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    if args.preload:
+        # Load and warm up single-threaded: an OpenMP thread team started in
+        # the parent is not usable in forked children. Workers set their own
+        # thread budget after the fork.
+        torch.set_num_threads(1)
+        model_manager.load()
+    # Write out anything seeded into the latency store so workers do not repeat it
+    latency_store.flush()
+
+    # Move every object allocated so far into the permanent generation, so the
+    # workers' garbage collector does not write to (and un-share) their pages
+    gc.collect()
+    gc.freeze()
+
+    sock = bind_socket(args.host, args.port)
+    logger.info(f"Serving on {args.host}:{args.port} with {args.workers} workers "
+                f"({'shared preloaded model' if args.preload else 'model loaded per worker'})")
+
+    workers = {}
+    for index in range(args.workers):
+        workers[fork_worker(sock, args.workers, args.log_level)] = index
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = workers.pop(pid, None)
+        if index is None or stopping:
+            continue
+        logger.warning(f"Worker {index} (pid {pid}) exited with status {status}, restarting")
+        time.sleep(1)
+        workers[fork_worker(sock, args.workers, args.log_level)] = index
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    main()
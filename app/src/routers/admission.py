@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from ..service.config import ADMISSION_DEADLINE_HEADER
+from ..service.service import admission
+
+# Initialize a new router
+router = APIRouter()
+
+
+@router.get("/admission")
+def get_admission_stats():
+    if admission is None:
+        return {"enabled": False}
+    return {"enabled": True, "deadline_header": ADMISSION_DEADLINE_HEADER, **admission.stats()}
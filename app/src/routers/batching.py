@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from ..service.service import batcher
+
+# Initialize a new router
+router = APIRouter()
+
+
+@router.get("/batching")
+def get_batching_stats():
+    if batcher is None:
+        return {"enabled": False, "queue_depth": 0}
+    return {"enabled": True, **batcher.stats()}
@@ -0,0 +1,26 @@
+from fastapi import APIRouter
+from ..service.service import persistent_cache, result_cache, similarity_cache
+
+# Initialize a new router
+router = APIRouter()
+
+
+@router.get("/cache")
+def get_cache_stats():
+    if result_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **result_cache.stats()}
+
+
+@router.get("/cache/persistent")
+def get_persistent_cache_stats():
+    if persistent_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **persistent_cache.stats()}
+
+
+@router.get("/cache/similarity")
+def get_similarity_cache_stats():
+    if similarity_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **similarity_cache.stats()}
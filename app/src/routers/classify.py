@@ -1,16 +1,167 @@
-from fastapi import APIRouter, HTTPException
-from ..schemas.schemas import PromptRequest, ClassificationResponse
-from ..service.service import classify_prompt
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from starlette.requests import ClientDisconnect
+from ..schemas.schemas import (
+    PromptRequest, ClassificationResponse, PromptBatchRequest, ClassificationBatchResponse,
+    StreamPromptRequest, StreamClassificationResponse, StreamError
+)
+from ..service.admission import Overloaded
+from ..service.batching import QueueFullError
+from ..service.config import ADMISSION_DEADLINE_HEADER, STREAM_WINDOW
+from ..service.service import (
+    admission, classify_prompt_shared, classify_prompts, degraded_result, is_cached, model_manager, stream_gate
+)
+from ..service.executor import run_inference
 from ..service.logger import get_logger
+from ..service.streaming import classify_stream, ndjson_lines
 router = APIRouter()
 
 logger = get_logger("script:classify")
 
+
+def ensure_ready():
+    if not model_manager.ready:
+        raise HTTPException(status_code=503, detail=f"Model is not ready ({model_manager.state})")
+
+
+def to_response(categories, settings, response_model=ClassificationResponse, **fields):
+    return response_model(
+        categories=categories,
+        settings=settings,
+        truncation=settings.get("truncation"),
+        approximate=settings.get("approximate"),
+        degraded=settings.get("degraded", False),
+        config_version=settings.get("config_version"),
+        **fields
+    )
+
+
+def release_when_done(ticket):
+    """Done callback of a request's classification: frees its admission slot only once the work is finished"""
+    def done(work):
+        if not work.cancelled():
+            # Retrieved here, since the request may have stopped waiting for it
+            work.exception()
+        admission.release(ticket)
+    return done
+
+
+def shed(overloaded):
+    """Answer a request the admission controller shed: the default settings, or 429/503 with Retry-After"""
+    if admission.overload == "degrade":
+        admission.degraded += 1
+        return to_response(*degraded_result())
+    # 429: too many requests in flight here; 503: this instance cannot answer within the deadline
+    raise HTTPException(
+        status_code=429 if overloaded.reason == "queue_full" else 503,
+        detail=f"Overloaded ({overloaded.reason})",
+        headers={"Retry-After": str(overloaded.retry_after)}
+    )
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """StreamingResponse that sends while the request body is still being read.
+
+    The base class watches for a disconnect by reading from ``receive`` on
+    ASGI servers older than spec 2.4, which swallows the body messages of a
+    request that is still streaming in. Here the body reader notices the
+    disconnect instead.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+
+
+def line_id(index):
+    """Id of a request line without one; shaped unlike a bare number, so it cannot pass for a client's id"""
+    return f"line-{index}"
+
+
+def request_id_of(line, index):
+    """The client-supplied id of a request line that failed validation, else its line id"""
+    try:
+        request_id = json.loads(line).get("id")
+    except (ValueError, AttributeError):
+        request_id = None
+    if isinstance(request_id, (str, int)):
+        return request_id
+    return str(request_id) if request_id is not None else line_id(index)
+
+
 @router.post("/classify", response_model=ClassificationResponse)
-async def classify(req: PromptRequest):
+async def classify(req: PromptRequest, request: Request):
+    ensure_ready()
+    # Cached prompts do not need the model, so they are never shed
+    ticket = None
+    if admission is not None and not is_cached(req.prompt):
+        try:
+            ticket = admission.admit(admission.deadline_seconds(request.headers.get(ADMISSION_DEADLINE_HEADER)))
+        except Overloaded as e:
+            return shed(e)
+
+    work = asyncio.ensure_future(classify_prompt_shared(req.prompt))
+    if ticket is not None:
+        work.add_done_callback(release_when_done(ticket))
+    # asyncio.wait neither cancels the work on timeout nor when the request is cancelled
+    await asyncio.wait([work], timeout=ticket.remaining() if ticket is not None else None)
+    if not work.done():
+        return shed(admission.expired(ticket))
+    try:
+        categories, settings = work.result()
+    except QueueFullError:
+        # The micro-batching queue had no room: overload, answered like a shed request
+        if admission is not None:
+            return shed(admission.reject("queue_full"))
+        raise HTTPException(status_code=429, detail="Overloaded (queue_full)", headers={"Retry-After": "1"})
+    except Exception as e:
+        logger.error(f"Error in classify endpoint: {e!r}")
+        raise HTTPException(status_code=500, detail="Failed to classify prompt")
+    return to_response(categories, settings)
+
+
+@router.post("/classify/batch", response_model=ClassificationBatchResponse)
+async def classify_batch(req: PromptBatchRequest):
+    ensure_ready()
     try:
-        categories, settings = classify_prompt(req.prompt)
-        return ClassificationResponse(categories=categories, settings=settings)
+        results = await run_inference(classify_prompts, req.prompts)
+        return ClassificationBatchResponse(results=[
+            to_response(categories, settings) for categories, settings in results
+        ])
     except Exception as e:
-        logger.error(f"Error in classify endpoint: {e}")
-        raise HTTPException(status_code=500, detail="Failed to classify prompt")
\ No newline at end of file
+        logger.error(f"Error in classify batch endpoint: {e}")
+        raise HTTPException(status_code=500, detail="Failed to classify prompts")
+
+
+@router.post("/classify/stream")
+async def classify_ndjson_stream(request: Request):
+    """Classify a stream of NDJSON PromptRequest lines, answering each as soon as it is classified"""
+    ensure_ready()
+
+    async def items():
+        index = 0
+        async for line in ndjson_lines(request.stream()):
+            try:
+                req = StreamPromptRequest.model_validate_json(line)
+            except ValidationError as e:
+                yield request_id_of(line, index), None, f"Invalid request: {e.errors()[0]['msg']}"
+            else:
+                yield req.id if req.id is not None else line_id(index), req.prompt, None
+            index += 1
+
+    async def lines():
+        async for request_id, result, error in classify_stream(
+            items(), classify_prompt_shared, stream_gate, STREAM_WINDOW
+        ):
+            if error is not None:
+                response = StreamError(id=request_id, error=error)
+            else:
+                response = to_response(*result, response_model=StreamClassificationResponse, id=request_id)
+            yield response.model_dump_json() + "\n"
+
+    return DuplexStreamingResponse(lines(), media_type="application/x-ndjson")
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from ..service.service import in_flight
+
+# Initialize a new router
+router = APIRouter()
+
+
+@router.get("/coalescing")
+def get_coalescing_stats():
+    if in_flight is None:
+        return {"enabled": False}
+    return {"enabled": True, **in_flight.stats()}
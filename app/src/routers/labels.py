@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException
+from ..service.executor import run_inference
+from ..service.service import label_registry
+
+# Initialize a new router
+router = APIRouter()
+
+
+@router.get("/labels")
+def get_labels():
+    return label_registry.stats()
+
+
+@router.post("/labels/reload")
+async def reload_labels():
+    """Reload labels.json and mapping.json; the previous version stays active if they are invalid"""
+    try:
+        # Re-tokenizing the label hypotheses runs on the inference pool
+        await run_inference(label_registry.reload)
+    except Exception:
+        raise HTTPException(status_code=400, detail=f"Label reload failed: {label_registry.last_error}")
+    return label_registry.stats()
@@ -1,18 +1,19 @@
-from pathlib import Path
 from fastapi import APIRouter
-import json
+from ..service.latency_store import latency_store
 
 # Initialize a new router
 router = APIRouter()
 
-LATENCY_FILE = Path(__file__).parent.parent / "service" / "latency_log.json"
-print("Latency file path:", LATENCY_FILE.resolve())
-
 
 @router.get("/latency")
 def get_average_latency():
-    if LATENCY_FILE.exists():
-        with open(LATENCY_FILE, "r") as f:
-            data = json.load(f)
-        return {"average_latency_seconds": data.get("average_latency", 0)}
-    return {"average_latency_seconds": 0}
+    summary = latency_store.summary()
+    return {
+        "average_latency_seconds": summary["average"],
+        "count": summary["count"],
+        "min_latency_seconds": summary["min"],
+        "max_latency_seconds": summary["max"],
+        "p50_latency_seconds": summary["p50"],
+        "p95_latency_seconds": summary["p95"],
+        "p99_latency_seconds": summary["p99"],
+    }
@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from ..service.service import model_manager
+
+# Initialize a new router
+router = APIRouter()
+
+
+@router.get("/ready")
+def ready():
+    """Readiness: 200 once the model is loaded and warmed up, 503 before (or after a failed load)"""
+    status = model_manager.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from ..service.config import STREAM_WINDOW
+from ..service.service import stream_gate
+
+# Initialize a new router
+router = APIRouter()
+
+
+@router.get("/streaming")
+def get_streaming_stats():
+    return {"window": STREAM_WINDOW, **stream_gate.stats()}
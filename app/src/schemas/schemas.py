@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import Optional, Union
+from pydantic import BaseModel, Field
+from ..service.config import BULK_MAX_PROMPTS
 
 class PromptRequest(BaseModel):
     prompt: str
@@ -13,6 +15,35 @@ class Settings(BaseModel):
     verbosity: str
     web: str
 
+class Truncation(BaseModel):
+    policy: str
+    prompt_tokens: int
+    kept_tokens: int
+
+class Approximate(BaseModel):
+    similarity: float
+
 class ClassificationResponse(BaseModel):
     categories: list[Category]
     settings: Settings
+    truncation: Optional[Truncation] = None
+    approximate: Optional[Approximate] = None
+    degraded: bool = False
+    config_version: Optional[str] = None
+
+# Client correlation ids are echoed back as sent, strings or numbers
+class StreamPromptRequest(PromptRequest):
+    id: Optional[Union[str, int]] = None
+
+class StreamClassificationResponse(ClassificationResponse):
+    id: Optional[Union[str, int]] = None
+
+class StreamError(BaseModel):
+    id: Optional[Union[str, int]] = None
+    error: str
+
+class PromptBatchRequest(BaseModel):
+    prompts: list[str] = Field(..., min_length=1, max_length=BULK_MAX_PROMPTS)
+
+class ClassificationBatchResponse(BaseModel):
+    results: list[ClassificationResponse]
@@ -0,0 +1,135 @@
+import math
+import time
+
+# How shed requests are answered: an error status, or the default settings flagged as degraded
+OVERLOAD_MODES = ("reject", "degrade")
+
+
+class Overloaded(Exception):
+    """A request was shed: ``reason`` is queue_full, deadline or timeout"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    __slots__ = ("admitted_at", "position", "deadline", "expired")
+
+    def __init__(self, admitted_at, position, deadline):
+        self.admitted_at = admitted_at
+        self.position = position
+        self.deadline = deadline
+        self.expired = False
+
+    def remaining(self):
+        """Seconds left until the deadline, or None without one"""
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+
+class AdmissionController:
+    """Bounded admission of requests that need the model, with deadline-aware load shedding.
+
+    At most ``max_in_flight`` admitted requests wait or run at once; more
+    are shed right away (queue_full). The service time is estimated from
+    recent requests: a request that was admitted behind ``position - 1``
+    others finished in about ``ceil(position / parallelism)`` service times,
+    since ``parallelism`` requests are classified together (one micro-batch).
+    A request whose predicted latency exceeds its deadline is shed before it
+    takes a slot (deadline). Callers that still run past their deadline shed
+    the request with ``expired`` (timeout), but keep the slot until the work
+    they started is done: it cannot be cancelled once it is in the inference
+    pool, and freeing the slot early would let that work pile up unbounded.
+    Must be used from the event loop thread.
+    """
+
+    def __init__(self, max_in_flight=256, parallelism=8, default_deadline_ms=0, overload="reject", smoothing=0.2):
+        if overload not in OVERLOAD_MODES:
+            raise ValueError(f"Unknown overload mode '{overload}', expected one of: {', '.join(OVERLOAD_MODES)}")
+        self.overload = overload
+        self.max_in_flight = max_in_flight
+        self.parallelism = max(1, parallelism)
+        self.default_deadline_ms = default_deadline_ms
+        self.smoothing = smoothing
+        self.service_seconds = None  # EWMA of one service time, None until a request completed
+
+        self.in_flight = 0
+        self.admitted = 0
+        self.completed = 0
+        self.shed = {"queue_full": 0, "deadline": 0, "timeout": 0}
+        self.degraded = 0
+
+    def predicted_seconds(self, position):
+        """Predicted latency of a request admitted at this position (1: nothing ahead of it)"""
+        if self.service_seconds is None:
+            return 0.0
+        return self.service_seconds * math.ceil(position / self.parallelism)
+
+    def retry_after(self):
+        """Whole seconds until the requests in flight are predicted to be done, at least 1"""
+        return max(1, math.ceil(self.predicted_seconds(self.in_flight)))
+
+    def deadline_seconds(self, header_value):
+        """The request's time budget from its header (milliseconds), else the default; None for no deadline"""
+        try:
+            budget_ms = float(header_value) if header_value is not None else self.default_deadline_ms
+        except ValueError:
+            budget_ms = self.default_deadline_ms
+        return budget_ms / 1000 if budget_ms > 0 else None
+
+    def admit(self, budget_seconds=None):
+        """Take a slot for a request, or raise Overloaded"""
+        if self.in_flight >= self.max_in_flight:
+            raise self.reject("queue_full")
+        position = self.in_flight + 1
+        if budget_seconds is not None and self.predicted_seconds(position) > budget_seconds:
+            raise self.reject("deadline")
+
+        now = time.monotonic()
+        self.in_flight += 1
+        self.admitted += 1
+        return Ticket(now, position, None if budget_seconds is None else now + budget_seconds)
+
+    def reject(self, reason):
+        """Count a request shed for ``reason``; returns the Overloaded to raise"""
+        self.shed[reason] += 1
+        return Overloaded(reason, self.retry_after())
+
+    def release(self, ticket):
+        """Give the slot back once the request's work is done and update the service time estimate"""
+        self.in_flight -= 1
+        if not ticket.expired:
+            self.completed += 1
+        self._observe(ticket)
+
+    def expired(self, ticket):
+        """Shed an admitted request that ran past its deadline; returns the Overloaded to raise.
+
+        The slot stays taken until ``release`` is called for the ticket.
+        """
+        ticket.expired = True
+        self.shed["timeout"] += 1
+        return Overloaded("timeout", self.retry_after())
+
+    def _observe(self, ticket):
+        sample = (time.monotonic() - ticket.admitted_at) / math.ceil(ticket.position / self.parallelism)
+        if self.service_seconds is None:
+            self.service_seconds = sample
+        else:
+            self.service_seconds += self.smoothing * (sample - self.service_seconds)
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "parallelism": self.parallelism,
+            "default_deadline_ms": self.default_deadline_ms,
+            "overload": self.overload,
+            "estimated_service_ms": None if self.service_seconds is None else self.service_seconds * 1000,
+            "predicted_wait_ms": self.predicted_seconds(self.in_flight + 1) * 1000,
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "shed": dict(self.shed),
+            "degraded": self.degraded,
+        }
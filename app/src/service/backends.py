@@ -0,0 +1,140 @@
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from .logger import get_logger
+
+logger = get_logger("script:backends")
+
+# fp32: eager float32 model (the default)
+# int8: dynamic int8 quantization of every nn.Linear (weights int8, activations quantized per batch)
+# bf16: bfloat16 weights and activations, only on CPUs with native bf16 support
+# jit: TorchScript trace of the forward pass, frozen for inference
+# compile: torch.compile with dynamic shapes
+# onnx: exported ONNX graph run with onnxruntime (optional dependency)
+BACKENDS = ("fp32", "int8", "bf16", "jit", "compile", "onnx")
+# Backends that replace the forward pass, so they only serve the fast path
+GRAPH_BACKENDS = ("jit", "compile", "onnx")
+
+PROBE_PROMPTS = ["How do I reverse a linked list in Python?", "hi"]
+
+
+def cpu_supports_bf16():
+    """True when the CPU has native bf16 instructions (AVX512-BF16 or AMX)"""
+    try:
+        flags = Path("/proc/cpuinfo").read_text()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+class LogitsModule(torch.nn.Module):
+    """Wrap a sequence-classification model so it maps (input_ids, attention_mask) to logits.
+
+    Tracing and ONNX export need a forward with positional tensor inputs and
+    a single tensor output.
+    """
+
+    def __init__(self, model, forward_kwargs):
+        super().__init__()
+        self.model = model
+        self.forward_kwargs = dict(forward_kwargs)
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(
+            input_ids=input_ids, attention_mask=attention_mask, return_dict=False, **self.forward_kwargs
+        )[0]
+
+
+def _graph_forward(graph):
+    def forward(input_ids, attention_mask):
+        with torch.inference_mode():
+            logits = graph(input_ids, attention_mask)
+        return logits.float().cpu().numpy()
+    return forward
+
+
+def _onnx_forward(scorer, onnx_path):
+    try:
+        import onnxruntime
+    except ImportError as e:
+        raise RuntimeError(
+            "The onnx backend needs onnxruntime (and onnx + onnxscript to export the graph): "
+            "pip install onnxruntime onnx onnxscript"
+        ) from e
+
+    onnx_path = Path(onnx_path)
+    if not onnx_path.exists():
+        input_ids, attention_mask = scorer.build_inputs(scorer.encode(PROBE_PROMPTS))
+        logger.info(f"Exporting NLI model to {onnx_path}")
+        torch.onnx.export(
+            LogitsModule(scorer.model, scorer.forward_kwargs).eval(),
+            (input_ids, attention_mask),
+            str(onnx_path),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "pairs", 1: "tokens"},
+                "attention_mask": {0: "pairs", 1: "tokens"},
+                "logits": {0: "pairs"},
+            },
+            opset_version=17
+        )
+
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = torch.get_num_threads()
+    session = onnxruntime.InferenceSession(str(onnx_path), options, providers=["CPUExecutionProvider"])
+
+    def forward(input_ids, attention_mask):
+        logits, = session.run(["logits"], {
+            "input_ids": input_ids.numpy(),
+            "attention_mask": attention_mask.numpy(),
+        })
+        return logits.astype(np.float32, copy=False)
+    return forward
+
+
+def apply_backend(scorer, backend, onnx_path=None):
+    """Convert the scorer's model for the selected inference backend.
+
+    int8 and bf16 convert the model in place, so the HF pipeline sharing it
+    runs the converted weights too. The graph backends replace
+    ``scorer.forward``. Returns the backend actually applied (bf16 falls
+    back to fp32 on CPUs without native support).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of: {', '.join(BACKENDS)}")
+    model = scorer.model
+    on_cpu = model.device.type == "cpu"
+    if backend in ("int8", "jit", "onnx") and not on_cpu:
+        raise ValueError(f"The {backend} backend runs on CPU only")
+
+    if backend == "int8":
+        torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    elif backend == "bf16":
+        if on_cpu and not cpu_supports_bf16():
+            logger.warning("CPU has no native bf16 support, keeping the fp32 backend")
+            return "fp32"
+        model.to(torch.bfloat16)
+    elif backend == "jit":
+        input_ids, attention_mask = scorer.build_inputs(scorer.encode(PROBE_PROMPTS))
+        with torch.inference_mode():
+            traced = torch.jit.trace(
+                LogitsModule(model, scorer.forward_kwargs).eval(),
+                (input_ids, attention_mask),
+                strict=False,
+                check_trace=False
+            )
+        scorer.forward = _graph_forward(torch.jit.optimize_for_inference(torch.jit.freeze(traced)))
+    elif backend == "compile":
+        compiled = torch.compile(LogitsModule(model, scorer.forward_kwargs).eval(), dynamic=True)
+        device = model.device
+        forward = _graph_forward(compiled)
+        scorer.forward = lambda input_ids, attention_mask: forward(input_ids.to(device), attention_mask.to(device))
+    elif backend == "onnx":
+        scorer.forward = _onnx_forward(scorer, onnx_path)
+
+    logger.info(f"NLI inference backend: {backend}")
+    return backend
@@ -0,0 +1,123 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from time import perf_counter_ns
+
+from .logger import get_logger
+from .metrics import BATCH_QUEUE_WAIT_SECONDS
+
+logger = get_logger("script:batching")
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the batching queue has reached its configured depth."""
+
+
+class MicroBatcher:
+    """Collect items submitted from many threads and process them in batches.
+
+    A background thread takes the first queued item, then keeps gathering
+    items until either ``max_batch_size`` items are collected or
+    ``max_wait_ms`` has passed. The whole batch is handed to
+    ``process_batch`` in one call and each result is scattered back to the
+    future returned by ``submit``.
+
+    Items submitted with a ``bucket`` (e.g. a prompt length class) are only
+    processed together with items of the same bucket: a collected batch is
+    split per bucket, in order of first arrival.
+    """
+
+    def __init__(self, process_batch, max_batch_size=8, max_wait_ms=5.0,
+                 max_queue_depth=256, name="micro-batcher"):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_queue_depth = max_queue_depth
+        self.name = name
+
+        self._queue = queue.Queue(maxsize=max_queue_depth)
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.batches_processed = 0
+        self.items_processed = 0
+        self.last_batch_size = 0
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, item, bucket=None) -> Future:
+        """Queue one item and return a future resolved with its result."""
+        if self._thread is None:
+            self.start()
+
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future, perf_counter_ns(), bucket))
+        except queue.Full:
+            raise QueueFullError(f"Batch queue is full ({self.max_queue_depth} pending items)")
+        return future
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches_processed": self.batches_processed,
+            "items_processed": self.items_processed,
+            "last_batch_size": self.last_batch_size,
+            "average_batch_size": (self.items_processed / self.batches_processed
+                                   if self.batches_processed else 0),
+        }
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = perf_counter_ns()
+            buckets = {}
+            for item, fut, enqueued, bucket in batch:
+                BATCH_QUEUE_WAIT_SECONDS.observe_ns(started - enqueued)
+                # Skip callers that gave up while waiting in the queue
+                if fut.set_running_or_notify_cancel():
+                    buckets.setdefault(bucket, []).append((item, fut))
+
+            for group in buckets.values():
+                self._process(group)
+
+    def _process(self, batch):
+        try:
+            results = self.process_batch([item for item, _ in batch])
+        except Exception as e:
+            logger.error(f"Batch of {len(batch)} items failed: {e}")
+            for _, fut in batch:
+                fut.set_exception(e)
+            return
+
+        self.batches_processed += 1
+        self.items_processed += len(batch)
+        self.last_batch_size = len(batch)
+        for (_, fut), result in zip(batch, results):
+            fut.set_result(result)
@@ -0,0 +1,209 @@
+import argparse
+import copy
+import json
+import zlib
+from time import perf_counter_ns
+
+import numpy as np
+
+from .config import SERVICE_DIR
+from .datasets import load_labeled_examples
+from .engines import ClassifierEngine
+from .logger import get_logger
+from .metrics import registry
+
+logger = get_logger("script:cascade")
+
+CASCADE_TIER_SECONDS = registry.histogram(
+    "classifier_cascade_tier_seconds",
+    "Time spent in each cascade tier per scoring call",
+    label="tier"
+)
+CASCADE_TIER1_ANSWERED = registry.counter(
+    "classifier_cascade_tier1_answered",
+    "Prompts answered by the first (cheap) cascade tier"
+)
+CASCADE_ESCALATED = registry.counter(
+    "classifier_cascade_escalated",
+    "Prompts escalated to the second (NLI) cascade tier"
+)
+
+
+def top_margin(scores):
+    """Top-vs-second score margin per row, the same delta classify_prompt computes"""
+    if scores.shape[1] < 2:
+        return scores[:, 0]
+    top_two = np.partition(scores, -2, axis=1)[:, -2:]
+    return top_two[:, 1] - top_two[:, 0]
+
+
+class HashedNgramClassifier:
+    """One-vs-rest logistic regression over hashed word and character n-grams.
+
+    Scores are independent per-label sigmoid probabilities, so they can go
+    through the same dual-threshold selection as the NLI scores.
+    """
+
+    def __init__(self, label_names, n_features=2 ** 18, char_ngrams=(3, 4, 5), max_chars=2000):
+        self.label_names = list(label_names)
+        self.n_features = n_features
+        self.char_ngrams = tuple(char_ngrams)
+        self.max_chars = max_chars
+        self.weights = np.zeros((n_features, len(self.label_names)), dtype=np.float32)
+        self.bias = np.zeros(len(self.label_names), dtype=np.float32)
+
+    def features(self, text):
+        """Hashed feature indices and L2-normalized log counts for one text"""
+        text = " ".join(text[:self.max_chars].lower().split())
+        words = text.split()
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        padded = f" {text} "
+        for n in self.char_ngrams:
+            grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+        counts = {}
+        for gram in grams:
+            h = zlib.crc32(gram.encode("utf-8")) % self.n_features
+            counts[h] = counts.get(h, 0) + 1
+        if not counts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.log1p(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        return indices, values / np.linalg.norm(values)
+
+    def score(self, prompts):
+        scores = np.empty((len(prompts), len(self.label_names)), dtype=np.float64)
+        for row, prompt in enumerate(prompts):
+            indices, values = self.features(prompt)
+            logits = values @ self.weights[indices] + self.bias
+            scores[row] = 1 / (1 + np.exp(-logits))
+        return scores
+
+    def fit(self, texts, categories, epochs=10, learning_rate=0.5, l2=1e-6, seed=0):
+        """Train with plain SGD on the logistic loss"""
+        index = {name: i for i, name in enumerate(self.label_names)}
+        samples = [(self.features(t), index[c]) for t, c in zip(texts, categories) if c in index]
+        rng = np.random.default_rng(seed)
+
+        for epoch in range(epochs):
+            loss = 0.0
+            for i in rng.permutation(len(samples)):
+                (indices, values), label = samples[i]
+                target = np.zeros(len(self.label_names), dtype=np.float32)
+                target[label] = 1
+                probs = 1 / (1 + np.exp(-(values @ self.weights[indices] + self.bias)))
+                grad = probs - target
+                self.weights[indices] -= learning_rate * (np.outer(values, grad) + l2 * self.weights[indices])
+                self.bias -= learning_rate * grad
+                loss -= np.sum(target * np.log(probs + 1e-9) + (1 - target) * np.log(1 - probs + 1e-9))
+            logger.info(f"Epoch {epoch + 1}/{epochs}: loss {loss / max(len(samples), 1):.4f}")
+        return self
+
+    def aligned_to(self, label_names):
+        """Reorder the output columns to match label_names (the candidate_labels order)"""
+        missing = set(label_names) - set(self.label_names)
+        if missing:
+            raise ValueError(f"First-tier model has no weights for labels: {sorted(missing)}")
+        order = [self.label_names.index(name) for name in label_names]
+        self.weights = self.weights[:, order]
+        self.bias = self.bias[order]
+        self.label_names = list(label_names)
+        return self
+
+    def save(self, path):
+        np.savez_compressed(
+            path,
+            weights=self.weights,
+            bias=self.bias,
+            label_names=np.array(self.label_names),
+            char_ngrams=np.array(self.char_ngrams),
+            max_chars=self.max_chars
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        model = cls(
+            [str(name) for name in data["label_names"]],
+            n_features=data["weights"].shape[0],
+            char_ngrams=tuple(int(n) for n in data["char_ngrams"]),
+            max_chars=int(data["max_chars"])
+        )
+        model.weights = data["weights"]
+        model.bias = data["bias"]
+        return model
+
+
+class CascadeEngine(ClassifierEngine):
+    """Answer with a cheap first tier and escalate uncertain prompts.
+
+    A prompt stays with the first tier when its top-vs-second margin is at
+    least ``margin``; the rest are re-scored by the second tier engine.
+    """
+
+    name = "cascade"
+
+    def __init__(self, first_tier, second_tier, margin=0.3):
+        self.first_tier = first_tier
+        self.second_tier = second_tier
+        self.margin = margin
+        self.model_name = second_tier.model_name
+        self.max_prompt_tokens = second_tier.max_prompt_tokens
+        self.truncation = second_tier.truncation
+
+    def score(self, prompts):
+        t = perf_counter_ns()
+        scores = self.first_tier.score(prompts)
+        confident = top_margin(scores) >= self.margin
+        now = perf_counter_ns()
+        CASCADE_TIER_SECONDS.labels("tier1").observe((now - t) / 1e9)
+
+        escalate = np.flatnonzero(~confident)
+        CASCADE_TIER1_ANSWERED.inc(len(prompts) - len(escalate))
+        if len(escalate):
+            CASCADE_ESCALATED.inc(len(escalate))
+            scores[escalate] = self.second_tier.score([prompts[i] for i in escalate])
+            CASCADE_TIER_SECONDS.labels("tier2").observe((perf_counter_ns() - now) / 1e9)
+        return scores
+
+    def with_labels(self, candidate_labels, label_names):
+        first_tier = copy.copy(self.first_tier).aligned_to(label_names)
+        return CascadeEngine(first_tier, self.second_tier.with_labels(candidate_labels, label_names), self.margin)
+
+    def token_lengths(self, prompts):
+        return self.second_tier.token_lengths(prompts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the first-tier hashed n-gram classifier")
+    parser.add_argument("--data", required=True, help="Labeled synthetic data (.json/.jsonl file or directory)")
+    parser.add_argument("--output", required=True, help="Where to write the model (.npz)")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fraction of examples kept for evaluation")
+    args = parser.parse_args()
+
+    with (SERVICE_DIR / "mapping.json").open("r") as f:
+        labels = list(json.load(f))
+
+    examples = [(t, c) for t, c in load_labeled_examples(args.data) if c in labels]
+    rng = np.random.default_rng(0)
+    order = rng.permutation(len(examples))
+    n_test = int(len(examples) * args.holdout)
+    test = [examples[i] for i in order[:n_test]]
+    train = [examples[i] for i in order[n_test:]]
+
+    model = HashedNgramClassifier(labels)
+    model.fit([t for t, _ in train], [c for _, c in train], epochs=args.epochs)
+    model.save(args.output)
+
+    if test:
+        scores = model.score([t for t, _ in test])
+        predicted = np.array(labels)[scores.argmax(axis=1)]
+        accuracy = np.mean(predicted == np.array([c for _, c in test]))
+        logger.info(f"Held-out top-1 accuracy: {accuracy:.3f} on {len(test)} examples")
+    logger.info(f"Saved model trained on {len(train)} examples to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import asyncio
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers with the same key.
+
+    The first caller for a key starts the call; callers arriving while it
+    runs await the same future instead of starting their own. The key is
+    released as soon as the call finishes, so results are not kept (that is
+    the result cache's job) and a failed call is retried by the next caller.
+
+    Every caller awaits the shared future through ``asyncio.shield``: a
+    cancelled caller (e.g. a disconnected client) stops waiting without
+    cancelling the call the others are waiting on. All methods must be
+    called from the event loop thread.
+    """
+
+    def __init__(self):
+        self._in_flight = {}  # key -> asyncio.Future
+
+        self.calls = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.cancelled = 0
+
+    def __len__(self):
+        return len(self._in_flight)
+
+    async def run(self, key, start):
+        """Await the result for ``key``, calling ``start()`` for an awaitable only if none is in flight"""
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(start())
+            self._in_flight[key] = future
+            future.add_done_callback(lambda f: self._release(key, f))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+    def _release(self, key, future):
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        # Retrieve the exception so it is not reported as unhandled when every caller is gone
+        if not future.cancelled() and future.exception() is not None:
+            self.errors += 1
+
+    def stats(self):
+        return {
+            "in_flight": len(self._in_flight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": self.coalesced / (self.calls + self.coalesced) if self.calls else 0,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+        }
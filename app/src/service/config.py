@@ -0,0 +1,171 @@
+import os
+from pathlib import Path
+
+SERVICE_DIR = Path(__file__).parent
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# --- Logging ---
+# With LOG_ASYNC, records are handed to a queue and written to the console
+# and log file by a background thread. Only LOG_DETAIL_SAMPLE_RATE of the
+# requests log their prompt, labels and settings.
+LOG_LEVEL = os.environ.get("CLASSIFIER_LOG_LEVEL", "INFO").upper()
+LOG_ASYNC = _env_bool("CLASSIFIER_LOG_ASYNC", True)
+LOG_QUEUE_SIZE = int(os.environ.get("CLASSIFIER_LOG_QUEUE_SIZE", 10000))
+LOG_JSON = _env_bool("CLASSIFIER_LOG_JSON", False)
+LOG_DETAIL_SAMPLE_RATE = float(os.environ.get("CLASSIFIER_LOG_DETAIL_SAMPLE_RATE", 1.0))
+
+# --- Micro-batching ---
+# Requests arriving within BATCH_MAX_WAIT_MS of each other (up to BATCH_MAX_SIZE
+# prompts) are classified together in one padded forward pass.
+BATCHING_ENABLED = _env_bool("CLASSIFIER_BATCHING", True)
+BATCH_MAX_SIZE = int(os.environ.get("CLASSIFIER_BATCH_MAX_SIZE", 8))
+BATCH_MAX_WAIT_MS = float(os.environ.get("CLASSIFIER_BATCH_MAX_WAIT_MS", 5))
+BATCH_QUEUE_DEPTH = int(os.environ.get("CLASSIFIER_BATCH_QUEUE_DEPTH", 256))
+
+# --- Inference execution ---
+# Requests await classification on a bounded thread pool so the event loop
+# stays free for /healthcheck and /latency while the model is busy.
+INFERENCE_WORKERS = int(os.environ.get("CLASSIFIER_INFERENCE_WORKERS", max(4, 2 * BATCH_MAX_SIZE)))
+
+# Torch thread budget. When unset, intra-op threads are split between the
+# forward passes that may run at the same time (a single one when batching,
+# which /classify/batch then waits for as well).
+TORCH_INTRA_OP_THREADS = int(os.environ.get("TORCH_INTRA_OP_THREADS", 0))
+TORCH_INTER_OP_THREADS = int(os.environ.get("TORCH_INTER_OP_THREADS", 1))
+
+# --- Bulk classification ---
+# /classify/batch scores prompts in tokenizer-length-sorted chunks of this size.
+BULK_CHUNK_SIZE = int(os.environ.get("CLASSIFIER_BULK_CHUNK_SIZE", 32))
+BULK_MAX_PROMPTS = int(os.environ.get("CLASSIFIER_BULK_MAX_PROMPTS", 5000))
+
+# --- Prompt length ---
+# Prompts longer than MAX_PROMPT_TOKENS (0: the model's own limit) are cut
+# with the TRUNCATION policy: head, tail or head_tail. Batches are split at
+# the LENGTH_BUCKETS token bounds so short prompts are not padded to the
+# length of a long one.
+TRUNCATION = os.environ.get("CLASSIFIER_TRUNCATION", "head")
+MAX_PROMPT_TOKENS = int(os.environ.get("CLASSIFIER_MAX_PROMPT_TOKENS", 0))
+LENGTH_BUCKETS = tuple(
+    int(bound) for bound in os.environ.get("CLASSIFIER_LENGTH_BUCKETS", "32,128,512").split(",") if bound.strip()
+)
+
+# --- Result cache ---
+# LRU cache of classification results keyed on the normalized prompt.
+CACHE_ENABLED = _env_bool("CLASSIFIER_CACHE", True)
+CACHE_MAX_ENTRIES = int(os.environ.get("CLASSIFIER_CACHE_MAX_ENTRIES", 10000))
+CACHE_MAX_MB = float(os.environ.get("CLASSIFIER_CACHE_MAX_MB", 64))
+CACHE_TTL_SECONDS = float(os.environ.get("CLASSIFIER_CACHE_TTL_SECONDS", 3600))
+CACHE_NFKC = _env_bool("CLASSIFIER_CACHE_NFKC", True)
+
+# --- Persistent cache ---
+# Second tier behind the result cache: a SQLite file (WAL mode) that every
+# worker process on the host reads and writes, and that survives restarts.
+# Disabled unless PERSISTENT_CACHE_PATH is set.
+PERSISTENT_CACHE_PATH = os.environ.get("CLASSIFIER_PERSISTENT_CACHE_PATH")
+PERSISTENT_CACHE_MAX_ENTRIES = int(os.environ.get("CLASSIFIER_PERSISTENT_CACHE_MAX_ENTRIES", 1_000_000))
+
+# --- Similarity cache ---
+# Off by default. After an exact cache miss, /classify looks for a cached
+# prompt whose estimated Jaccard similarity (MinHash over word n-grams, with
+# quoted spans, numbers and names masked) is at least SIMILARITY_THRESHOLD
+# and returns its result, marked as approximate. The defaults were tuned with
+# benchmarks/bench_similarity_cache.py on its labelled paraphrase pairs.
+SIMILARITY_CACHE_ENABLED = _env_bool("CLASSIFIER_SIMILARITY_CACHE", False)
+SIMILARITY_THRESHOLD = float(os.environ.get("CLASSIFIER_SIMILARITY_THRESHOLD", 0.7))
+SIMILARITY_MAX_ENTRIES = int(os.environ.get("CLASSIFIER_SIMILARITY_MAX_ENTRIES", 10000))
+SIMILARITY_NUM_PERM = int(os.environ.get("CLASSIFIER_SIMILARITY_NUM_PERM", 128))
+SIMILARITY_BANDS = int(os.environ.get("CLASSIFIER_SIMILARITY_BANDS", 32))
+SIMILARITY_SHINGLE_SIZE = int(os.environ.get("CLASSIFIER_SIMILARITY_SHINGLE_SIZE", 2))
+
+# --- Request coalescing ---
+# Concurrent /classify requests for the same normalized prompt and thresholds
+# share a single classification instead of each running the model.
+COALESCE_ENABLED = _env_bool("CLASSIFIER_COALESCE", True)
+
+# --- Streaming ---
+# /classify/stream keeps at most STREAM_WINDOW prompts of one stream in flight
+# (classifying, or classified but not yet sent) and STREAM_MAX_IN_FLIGHT across
+# all streams. At either limit the request body is no longer read, so TCP flow
+# control pushes back on the client.
+STREAM_WINDOW = int(os.environ.get("CLASSIFIER_STREAM_WINDOW", 4 * BATCH_MAX_SIZE))
+STREAM_MAX_IN_FLIGHT = int(os.environ.get("CLASSIFIER_STREAM_MAX_IN_FLIGHT", BATCH_QUEUE_DEPTH))
+
+# --- Admission control ---
+# /classify admits at most ADMISSION_MAX_IN_FLIGHT requests that need the
+# model and sheds the rest, and those whose predicted latency exceeds their
+# deadline (the ADMISSION_DEADLINE_HEADER value in milliseconds, else
+# ADMISSION_DEFAULT_DEADLINE_MS; 0 means none). ADMISSION_OVERLOAD "reject"
+# answers shed requests with 429/503, "degrade" with the default settings.
+ADMISSION_ENABLED = _env_bool("CLASSIFIER_ADMISSION", True)
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get("CLASSIFIER_ADMISSION_MAX_IN_FLIGHT", BATCH_QUEUE_DEPTH))
+ADMISSION_PARALLELISM = int(os.environ.get("CLASSIFIER_ADMISSION_PARALLELISM",
+                                           BATCH_MAX_SIZE if BATCHING_ENABLED else INFERENCE_WORKERS))
+ADMISSION_DEFAULT_DEADLINE_MS = float(os.environ.get("CLASSIFIER_ADMISSION_DEFAULT_DEADLINE_MS", 0))
+ADMISSION_DEADLINE_HEADER = os.environ.get("CLASSIFIER_ADMISSION_DEADLINE_HEADER", "X-Deadline-Ms")
+ADMISSION_OVERLOAD = os.environ.get("CLASSIFIER_ADMISSION_OVERLOAD", "reject")
+
+# --- Latency statistics ---
+# Aggregated in memory and persisted as a compact binary snapshot at most
+# every LATENCY_FLUSH_SECONDS. The legacy JSON log is only read once to seed it.
+LATENCY_SNAPSHOT_FILE = Path(os.environ.get("LATENCY_SNAPSHOT_FILE", SERVICE_DIR / "latency_stats.bin"))
+LATENCY_LEGACY_FILE = SERVICE_DIR / "latency_log.json"
+LATENCY_FLUSH_SECONDS = float(os.environ.get("LATENCY_FLUSH_SECONDS", 10))
+
+# --- Classifier engine ---
+# "nli" runs the zero-shot NLI cross-encoder, "embedding" scores prompts
+# against label embeddings with a small sentence-embedding model, "stub"
+# returns fixed pseudo-random scores without a model (benchmarks).
+ENGINE = os.environ.get("CLASSIFIER_ENGINE", "nli")
+NLI_MODEL = os.environ.get("CLASSIFIER_MODEL", "facebook/bart-large-mnli")
+# Score with pre-tokenized hypotheses instead of the HF zero-shot pipeline.
+NLI_FAST_PATH = _env_bool("CLASSIFIER_NLI_FAST_PATH", True)
+# Inference backend for the NLI model: fp32, int8 (dynamic quantization),
+# bf16, or a jit/compile/onnx graph (fast path only). The ONNX graph is
+# exported to NLI_ONNX_PATH on first use.
+NLI_BACKEND = os.environ.get("CLASSIFIER_NLI_BACKEND", "fp32")
+NLI_ONNX_PATH = os.environ.get("CLASSIFIER_NLI_ONNX_PATH", str(SERVICE_DIR / "nli_model.onnx"))
+
+EMBEDDING_MODEL = os.environ.get("CLASSIFIER_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# Optional labeled exemplars (synthetic data .json/.jsonl file or directory)
+EMBEDDING_EXEMPLARS = os.environ.get("CLASSIFIER_EMBEDDING_EXEMPLARS")
+# Cosine similarities are mapped to [0, 1] with sigmoid((sim - center) * scale)
+EMBEDDING_CENTER = float(os.environ.get("CLASSIFIER_EMBEDDING_CENTER", 0.35))
+EMBEDDING_SCALE = float(os.environ.get("CLASSIFIER_EMBEDDING_SCALE", 10))
+
+# The stub engine sleeps STUB_LATENCY_MS per forward pass plus
+# STUB_LATENCY_PER_PROMPT_MS per prompt, to stand in for the model's cost.
+STUB_LATENCY_MS = float(os.environ.get("CLASSIFIER_STUB_LATENCY_MS", 0))
+STUB_LATENCY_PER_PROMPT_MS = float(os.environ.get("CLASSIFIER_STUB_LATENCY_PER_PROMPT_MS", 0))
+
+# --- Cascade ---
+# A hashed n-gram model answers first; prompts whose top-vs-second margin is
+# below CASCADE_MARGIN are escalated to the configured engine.
+CASCADE_ENABLED = _env_bool("CLASSIFIER_CASCADE", False)
+CASCADE_MODEL = os.environ.get("CLASSIFIER_CASCADE_MODEL", str(SERVICE_DIR / "cascade_model.npz"))
+CASCADE_MARGIN = float(os.environ.get("CLASSIFIER_CASCADE_MARGIN", 0.3))
+
+# --- Label set ---
+# labels.json and mapping.json are polled every LABELS_WATCH_SECONDS and
+# reloaded without a restart when they change (0 disables the watch; POST
+# /labels/reload always works).
+LABELS_WATCH_SECONDS = float(os.environ.get("CLASSIFIER_LABELS_WATCH_SECONDS", 5))
+
+# --- Model lifecycle ---
+# The app loads the engine in the background at startup and reports progress
+# on /ready. Warm-up runs WARMUP_ROUNDS rounds of a single prompt and a
+# WARMUP_BATCH_SIZE batch before the model is marked ready.
+WARMUP_ROUNDS = int(os.environ.get("CLASSIFIER_WARMUP_ROUNDS", 2))
+WARMUP_BATCH_SIZE = int(os.environ.get("CLASSIFIER_WARMUP_BATCH_SIZE", BATCH_MAX_SIZE))
+
+# --- Multi-process serving (python -m app.serve) ---
+# With SERVE_PRELOAD the parent loads and warms up the model before forking
+# the workers, which then share the weights copy-on-write.
+SERVE_WORKERS = int(os.environ.get("CLASSIFIER_WORKERS", 1))
+SERVE_PRELOAD = _env_bool("CLASSIFIER_PRELOAD", True)
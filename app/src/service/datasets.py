@@ -0,0 +1,40 @@
+import json
+from pathlib import Path
+
+
+def _records_from_file(path: Path):
+    with path.open("r", encoding="utf-8") as f:
+        if path.suffix == ".jsonl":
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+            return
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = [data]
+    for record in data:
+        # Batches that could not be parsed were saved as a list of records
+        if isinstance(record, list):
+            yield from record
+        else:
+            yield record
+
+
+def load_labeled_examples(path):
+    """Load (text, category) pairs from synthetic data files.
+
+    Accepts a .json file (a list of {"example", "category"} records, as written
+    by syntetic_data_generation.py), a .jsonl file with one record per line,
+    or a directory containing such files. Records without both fields are
+    skipped.
+    """
+    path = Path(path)
+    files = sorted(p for p in path.iterdir() if p.suffix in (".json", ".jsonl")) if path.is_dir() else [path]
+
+    examples = []
+    for file in files:
+        for record in _records_from_file(file):
+            if isinstance(record, dict) and record.get("example") and record.get("category"):
+                examples.append((record["example"], record["category"]))
+    return examples
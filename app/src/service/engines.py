@@ -0,0 +1,292 @@
+import copy
+import time
+import zlib
+from time import perf_counter_ns
+
+import numpy as np
+import torch
+from transformers import AutoModel, AutoTokenizer, pipeline
+
+from .backends import GRAPH_BACKENDS, apply_backend
+from .config import (
+    EMBEDDING_CENTER, EMBEDDING_EXEMPLARS, EMBEDDING_MODEL, EMBEDDING_SCALE, MAX_PROMPT_TOKENS, NLI_BACKEND,
+    NLI_FAST_PATH, NLI_MODEL, NLI_ONNX_PATH, STUB_LATENCY_MS, STUB_LATENCY_PER_PROMPT_MS, TRUNCATION
+)
+from .datasets import load_labeled_examples
+from .logger import get_logger
+from .metrics import observe_stage
+from .nli import NLIScorer
+from .truncation import TRUNCATION_POLICIES, truncate_tokens
+
+logger = get_logger("script:engines")
+
+
+class ClassifierEngine:
+    """Scores prompts against the candidate labels.
+
+    ``score`` returns an (N, L) matrix of independent per-label scores in
+    [0, 1], in candidate_labels order, so the dual-threshold selection and
+    the settings merge behave the same for every engine.
+
+    Prompts longer than ``max_prompt_tokens`` (None: no limit) are cut with
+    the ``truncation`` policy.
+    """
+
+    name = "base"
+    model_name = None
+    max_prompt_tokens = None
+    truncation = "head"
+
+    def score(self, prompts):
+        raise NotImplementedError
+
+    def with_labels(self, candidate_labels, label_names):
+        """A copy of the engine for another label set, sharing the loaded model"""
+        raise NotImplementedError
+
+    def token_lengths(self, prompts):
+        """Approximate input lengths, used to sort prompts before batching"""
+        return [len(p) for p in prompts]
+
+
+class NLIEngine(ClassifierEngine):
+    """Zero-shot classification with an NLI cross-encoder (bart-large-mnli by default)"""
+
+    name = "nli"
+
+    def __init__(self, model_name, candidate_labels, device=-1, fast_path=True, backend="fp32", onnx_path=None,
+                 max_prompt_tokens=None, truncation="head"):
+        if backend in GRAPH_BACKENDS and not fast_path:
+            raise ValueError(f"The {backend} backend needs CLASSIFIER_NLI_FAST_PATH enabled")
+        if (max_prompt_tokens or truncation != "head") and not fast_path:
+            raise ValueError("A prompt token budget or truncation policy needs CLASSIFIER_NLI_FAST_PATH enabled")
+        if truncation not in TRUNCATION_POLICIES:
+            raise ValueError(f"Unknown truncation policy '{truncation}', expected one of: "
+                             f"{', '.join(TRUNCATION_POLICIES)}")
+        self.model_name = model_name
+        self.candidate_labels = list(candidate_labels)
+        self.label_index = {lbl: i for i, lbl in enumerate(self.candidate_labels)}
+        self.fast_path = fast_path
+
+        self.classifier = pipeline("zero-shot-classification", model=model_name, device=device)
+        self.scorer = NLIScorer(
+            self.classifier.model, self.classifier.tokenizer, self.candidate_labels,
+            max_prompt_tokens=max_prompt_tokens, truncation=truncation
+        )
+        self.backend = apply_backend(self.scorer, backend, onnx_path)
+        self.max_prompt_tokens = self.scorer.max_prompt_tokens
+        self.truncation = truncation
+
+    def run_pipeline(self, prompts):
+        """Score prompts through the HF zero-shot pipeline, returns an (N, L) matrix"""
+        t = perf_counter_ns()
+        results = self.classifier(
+            prompts,
+            self.candidate_labels,
+            multi_label=True,
+            batch_size=len(prompts) * len(self.candidate_labels)
+        )
+        if isinstance(results, dict):
+            results = [results]
+
+        scores = np.zeros((len(prompts), len(self.candidate_labels)))
+        for row, r in enumerate(results):
+            scores[row, [self.label_index[lbl] for lbl in r["labels"]]] = r["scores"]
+        observe_stage("forward", t)
+        return scores
+
+    def score(self, prompts):
+        if self.fast_path:
+            return self.scorer.score(prompts)
+        return self.run_pipeline(prompts)
+
+    def with_labels(self, candidate_labels, label_names):
+        engine = copy.copy(self)
+        engine.candidate_labels = list(candidate_labels)
+        engine.label_index = {lbl: i for i, lbl in enumerate(engine.candidate_labels)}
+        engine.scorer = copy.copy(self.scorer)
+        engine.scorer.set_labels(engine.candidate_labels)
+        engine.max_prompt_tokens = engine.scorer.max_prompt_tokens
+        return engine
+
+    def token_lengths(self, prompts):
+        return [len(ids) for ids in self.scorer.encode(prompts)]
+
+
+class EmbeddingEngine(ClassifierEngine):
+    """Bi-encoder classification with a small sentence-embedding model.
+
+    The label descriptions (and optional labeled exemplars) are embedded
+    once into a prototype matrix. Each prompt then needs a single encoder
+    pass and a matrix product; a label's score is its best cosine similarity
+    among its prototypes, squashed into [0, 1] with
+    ``sigmoid((similarity - center) * scale)``.
+    """
+
+    name = "embedding"
+
+    def __init__(self, model_name, candidate_labels, label_names, exemplars=(),
+                 center=0.35, scale=10.0, device=-1, max_length=256, max_prompt_tokens=None, truncation="head"):
+        if truncation not in TRUNCATION_POLICIES:
+            raise ValueError(f"Unknown truncation policy '{truncation}', expected one of: "
+                             f"{', '.join(TRUNCATION_POLICIES)}")
+        self.model_name = model_name
+        self.center = center
+        self.scale = scale
+        self.max_length = max_length
+        self.truncation = truncation
+        self.device = torch.device("cuda" if device >= 0 else "cpu")
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name).to(self.device).eval()
+        self.max_prompt_tokens = max_length - self.tokenizer.num_special_tokens_to_add()
+        if max_prompt_tokens:
+            self.max_prompt_tokens = min(self.max_prompt_tokens, max_prompt_tokens)
+
+        self.exemplars = list(exemplars)
+        self.set_labels(candidate_labels, label_names)
+
+    def set_labels(self, candidate_labels, label_names):
+        """Embed the prototypes: every label description, then the exemplars of known labels"""
+        name_index = {name: i for i, name in enumerate(label_names)}
+        texts, owners = list(candidate_labels), list(range(len(candidate_labels)))
+        for text, category in self.exemplars:
+            if category in name_index:
+                texts.append(text)
+                owners.append(name_index[category])
+
+        order = np.argsort(owners, kind="stable")
+        owners = np.asarray(owners)[order]
+        self.prototypes = self.embed([texts[i] for i in order])
+        self.group_starts = np.searchsorted(owners, np.arange(len(candidate_labels)))
+        logger.info(f"Embedding engine: {len(texts)} prototypes for {len(candidate_labels)} labels")
+
+    def embed(self, texts, batch_size=64):
+        """Mean-pooled, L2-normalized embeddings, shape (N, D)"""
+        chunks = []
+        for start in range(0, len(texts), batch_size):
+            ids = self.tokenizer(list(texts[start:start + batch_size]), add_special_tokens=False)["input_ids"]
+            inputs = self.tokenizer.pad(
+                [{"input_ids": self.tokenizer.build_inputs_with_special_tokens(
+                    truncate_tokens(seq, self.max_prompt_tokens, self.truncation))} for seq in ids],
+                return_tensors="pt"
+            ).to(self.device)
+            with torch.inference_mode():
+                hidden = self.model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+            chunks.append(torch.nn.functional.normalize(pooled, dim=-1).float().cpu().numpy())
+        return np.concatenate(chunks)
+
+    def score(self, prompts):
+        t = perf_counter_ns()
+        embeddings = self.embed(prompts)
+        t = observe_stage("forward", t)
+
+        similarities = embeddings @ self.prototypes.T
+        per_label = np.maximum.reduceat(similarities, self.group_starts, axis=1)
+        scores = 1 / (1 + np.exp(-(per_label - self.center) * self.scale))
+        observe_stage("softmax", t)
+        return scores
+
+    def with_labels(self, candidate_labels, label_names):
+        engine = copy.copy(self)
+        engine.set_labels(candidate_labels, label_names)
+        return engine
+
+    def token_lengths(self, prompts):
+        return [len(ids) for ids in self.tokenizer(list(prompts), add_special_tokens=False)["input_ids"]]
+
+
+def _mix64(x):
+    """splitmix64 finalizer over a uint64 array (wrapping arithmetic)"""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class StubEngine(ClassifierEngine):
+    """Deterministic stand-in for a model, to benchmark the serving path on any machine.
+
+    A prompt's score for a label is a hash of the two, so the same prompt
+    always gets the same scores and nothing is downloaded. Every call sleeps
+    ``latency_ms`` plus ``latency_per_prompt_ms`` per prompt; like a torch
+    forward pass, the sleep releases the GIL.
+    """
+
+    name = "stub"
+    model_name = "stub"
+
+    def __init__(self, candidate_labels, latency_ms=0.0, latency_per_prompt_ms=0.0, max_prompt_tokens=None,
+                 truncation="head"):
+        if truncation not in TRUNCATION_POLICIES:
+            raise ValueError(f"Unknown truncation policy '{truncation}', expected one of: "
+                             f"{', '.join(TRUNCATION_POLICIES)}")
+        self.latency_ms = latency_ms
+        self.latency_per_prompt_ms = latency_per_prompt_ms
+        self.max_prompt_tokens = max_prompt_tokens
+        self.truncation = truncation
+        self.set_labels(candidate_labels)
+
+    def set_labels(self, candidate_labels):
+        self.candidate_labels = list(candidate_labels)
+        self.label_seeds = np.array([zlib.crc32(lbl.encode("utf-8")) for lbl in self.candidate_labels],
+                                    dtype=np.uint64)
+
+    def score(self, prompts):
+        t = perf_counter_ns()
+        delay = self.latency_ms + self.latency_per_prompt_ms * len(prompts)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        t = observe_stage("forward", t)
+
+        prompt_seeds = np.array([zlib.crc32(p.encode("utf-8")) for p in prompts], dtype=np.uint64)
+        hashed = _mix64((prompt_seeds[:, None] << np.uint64(32)) | self.label_seeds[None, :])
+        scores = (hashed >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+        observe_stage("softmax", t)
+        return scores
+
+    def with_labels(self, candidate_labels, label_names):
+        engine = copy.copy(self)
+        engine.set_labels(candidate_labels)
+        return engine
+
+    def token_lengths(self, prompts):
+        return [len(p.split()) for p in prompts]
+
+
+def create_engine(name, candidate_labels, label_names, device=-1):
+    """Build the engine selected by CLASSIFIER_ENGINE"""
+    if name == "nli":
+        return NLIEngine(
+            NLI_MODEL,
+            candidate_labels,
+            device=device,
+            fast_path=NLI_FAST_PATH,
+            backend=NLI_BACKEND,
+            onnx_path=NLI_ONNX_PATH,
+            max_prompt_tokens=MAX_PROMPT_TOKENS or None,
+            truncation=TRUNCATION
+        )
+    if name == "embedding":
+        exemplars = load_labeled_examples(EMBEDDING_EXEMPLARS) if EMBEDDING_EXEMPLARS else []
+        return EmbeddingEngine(
+            EMBEDDING_MODEL,
+            candidate_labels,
+            label_names,
+            exemplars=exemplars,
+            center=EMBEDDING_CENTER,
+            scale=EMBEDDING_SCALE,
+            device=device,
+            max_prompt_tokens=MAX_PROMPT_TOKENS or None,
+            truncation=TRUNCATION
+        )
+    if name == "stub":
+        return StubEngine(
+            candidate_labels,
+            latency_ms=STUB_LATENCY_MS,
+            latency_per_prompt_ms=STUB_LATENCY_PER_PROMPT_MS,
+            max_prompt_tokens=MAX_PROMPT_TOKENS or None,
+            truncation=TRUNCATION
+        )
+    raise ValueError(f"Unknown classifier engine '{name}', expected one of: nli, embedding, stub")
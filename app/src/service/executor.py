@@ -0,0 +1,55 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+from .config import (
+    BATCHING_ENABLED,
+    INFERENCE_WORKERS,
+    TORCH_INTER_OP_THREADS,
+    TORCH_INTRA_OP_THREADS,
+)
+from .logger import get_logger
+
+logger = get_logger("script:executor")
+
+inference_executor = ThreadPoolExecutor(
+    max_workers=INFERENCE_WORKERS,
+    thread_name_prefix="inference"
+)
+
+# Forward passes of one process that may run at the same time: the batcher's
+# alone when batching, else one per inference worker. /classify/batch scores
+# on the pool next to the batcher, so every forward pass takes a slot and the
+# thread budget below is never oversubscribed.
+CONCURRENT_FORWARDS = 1 if BATCHING_ENABLED else INFERENCE_WORKERS
+forward_slots = threading.BoundedSemaphore(CONCURRENT_FORWARDS)
+
+
+def configure_torch_threads(processes=1):
+    """Apply the torch intra-op/inter-op thread budget before the model runs.
+
+    ``processes`` is the number of server worker processes sharing the cores.
+    """
+    cores = os.cpu_count() or 1
+    intra_op = TORCH_INTRA_OP_THREADS or max(1, cores // (processes * CONCURRENT_FORWARDS))
+
+    torch.set_num_threads(intra_op)
+    if torch.get_num_interop_threads() != TORCH_INTER_OP_THREADS:
+        try:
+            torch.set_num_interop_threads(TORCH_INTER_OP_THREADS)
+        except RuntimeError as e:
+            # Can only be set once, before any inter-op parallel work has started
+            logger.warning(f"Could not set inter-op threads: {e}")
+
+    logger.info(f"Torch threads: intra-op={torch.get_num_threads()}, "
+                f"inter-op={torch.get_num_interop_threads()}, inference workers={INFERENCE_WORKERS}")
+
+
+async def run_inference(func, *args, **kwargs):
+    """Run a blocking inference call on the inference pool and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(inference_executor, functools.partial(func, *args, **kwargs))
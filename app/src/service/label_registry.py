@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+from pathlib import Path
+
+from .cache import config_version
+from .logger import get_logger
+from .settings_table import SettingsTable
+
+logger = get_logger("script:labels")
+
+
+class LabelSet:
+    """One immutable version of the label descriptions and the settings mapping.
+
+    ``labels`` are the category names and ``candidate_labels`` their
+    natural-language descriptions, in the same order; score matrices use
+    this order. ``version`` hashes everything that changes classification
+    output, so it doubles as the result cache version.
+    """
+
+    def __init__(self, descriptions, category_mapping, version):
+        if not descriptions:
+            raise ValueError("The label set is empty")
+        if len(set(descriptions.values())) != len(descriptions):
+            raise ValueError("Label descriptions must be unique")
+        self.labels = list(descriptions)
+        self.candidate_labels = list(descriptions.values())
+        self.label_map = {description: name for name, description in descriptions.items()}
+        self.label_index = {description: i for i, description in enumerate(self.candidate_labels)}
+        self.category_mapping = category_mapping
+        self.settings_table = SettingsTable(category_mapping, self.labels)
+        self.version = version
+
+
+def load_label_set(labels_path, mapping_path, version_parts=()):
+    """Read and validate the label descriptions and the settings mapping"""
+    labels_bytes = Path(labels_path).read_bytes()
+    mapping_bytes = Path(mapping_path).read_bytes()
+    return LabelSet(
+        json.loads(labels_bytes),
+        json.loads(mapping_bytes),
+        config_version(labels_bytes, mapping_bytes, *version_parts)
+    )
+
+
+class LabelRegistry:
+    """Holds the active LabelSet and swaps in a new one atomically.
+
+    ``reload`` reads both files into a new LabelSet and runs every
+    registered preparer on it (e.g. pre-tokenizing the hypotheses for the
+    loaded model) before making it ``current``. If anything fails, the
+    previous version stays active. Requests read ``current`` once and use
+    that version throughout, so in-flight requests finish on the version
+    they started with.
+    """
+
+    def __init__(self, labels_path, mapping_path, version_parts=()):
+        self.labels_path = Path(labels_path)
+        self.mapping_path = Path(mapping_path)
+        self.version_parts = tuple(version_parts)
+        self._preparers = []
+        self._lock = threading.Lock()
+        self._watcher = None
+
+        self.current = load_label_set(self.labels_path, self.mapping_path, self.version_parts)
+        self.loaded_at = time.time()
+        self.reloads = 0
+        self.failed_reloads = 0
+        self.last_error = None
+
+    def add_preparer(self, prepare):
+        """Run ``prepare(label_set)`` on every new version before it becomes current"""
+        self._preparers.append(prepare)
+
+    def _mtimes(self):
+        return self.labels_path.stat().st_mtime_ns, self.mapping_path.stat().st_mtime_ns
+
+    def reload(self):
+        """Load the files again and swap in the new version; returns the current LabelSet"""
+        with self._lock:
+            try:
+                label_set = load_label_set(self.labels_path, self.mapping_path, self.version_parts)
+                if label_set.version == self.current.version:
+                    return self.current
+                for prepare in self._preparers:
+                    prepare(label_set)
+            except Exception as e:
+                self.failed_reloads += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.error("Label reload failed, keeping version %s: %s", self.current.version, self.last_error)
+                raise
+
+            previous, self.current = self.current, label_set
+            self.loaded_at = time.time()
+            self.reloads += 1
+            self.last_error = None
+        logger.info("Labels reloaded: version %s -> %s", previous.version, label_set.version)
+        return label_set
+
+    def watch(self, interval_seconds):
+        """Poll both files on a daemon thread and reload when either changes"""
+        if self._watcher is not None:
+            return
+
+        def run():
+            seen = self._mtimes()
+            while True:
+                time.sleep(interval_seconds)
+                try:
+                    mtimes = self._mtimes()
+                except OSError:
+                    continue  # mid-replace; try again on the next poll
+                if mtimes == seen:
+                    continue
+                seen = mtimes
+                try:
+                    self.reload()
+                except Exception:
+                    pass  # logged and counted by reload
+
+        self._watcher = threading.Thread(target=run, name="label-watcher", daemon=True)
+        self._watcher.start()
+
+    def stats(self):
+        label_set = self.current
+        return {
+            "version": label_set.version,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "failed_reloads": self.failed_reloads,
+            "last_error": self.last_error,
+            "labels": dict(zip(label_set.labels, label_set.candidate_labels)),
+        }
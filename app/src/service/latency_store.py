@@ -0,0 +1,232 @@
+import atexit
+import json
+import math
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+from .config import LATENCY_FLUSH_SECONDS, LATENCY_LEGACY_FILE, LATENCY_SNAPSHOT_FILE
+from .logger import get_logger
+
+logger = get_logger("script:latency")
+
+SNAPSHOT_MAGIC = b"LAT1"
+SNAPSHOT_HEADER = struct.Struct("<4sQdddQI")  # magic, count, sum, min, max, zero count, bins
+SNAPSHOT_BIN = struct.Struct("<iQ")           # bin index, count
+
+
+class QuantileSketch:
+    """Log-bucketed quantile sketch with a bounded relative error (DDSketch style).
+
+    Updates are O(1), and two sketches with the same accuracy can be merged
+    by adding their bucket counts.
+    """
+
+    def __init__(self, relative_accuracy=0.01, min_value=1e-6):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        if value <= self.min_value:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self.log_gamma)
+        self.bins[index] = self.bins.get(index, 0) + 1
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        self.count += other.count
+        self.zero_count += other.zero_count
+        for index, n in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + n
+
+    def quantile(self, q):
+        if self.count == 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                # Midpoint of the bucket (gamma^(i-1), gamma^i] in relative terms
+                return 2 * self.gamma ** index / (1 + self.gamma)
+        return 2 * self.gamma ** max(self.bins) / (1 + self.gamma)
+
+
+class LatencyStats:
+    """Streaming count/sum/min/max plus a quantile sketch"""
+
+    def __init__(self, relative_accuracy=0.01):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def record(self, latency):
+        self.count += 1
+        self.total += latency
+        if latency < self.min:
+            self.min = latency
+        if latency > self.max:
+            self.max = latency
+        self.sketch.add(latency)
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.sketch.merge(other.sketch)
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else 0
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "average": self.average,
+            "min": self.min if self.count else 0,
+            "max": self.max,
+            "p50": self.sketch.quantile(0.50),
+            "p95": self.sketch.quantile(0.95),
+            "p99": self.sketch.quantile(0.99),
+        }
+
+    def to_bytes(self):
+        sketch = self.sketch
+        parts = [SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, self.count, self.total, self.min, self.max,
+                                      sketch.zero_count, len(sketch.bins))]
+        parts.extend(SNAPSHOT_BIN.pack(index, n) for index, n in sketch.bins.items())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data, relative_accuracy=0.01):
+        magic, count, total, min_, max_, zero_count, n_bins = SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("Not a latency snapshot")
+        stats = cls(relative_accuracy)
+        stats.count, stats.total, stats.min, stats.max = count, total, min_, max_
+        stats.sketch.count, stats.sketch.zero_count = count, zero_count
+        offset = SNAPSHOT_HEADER.size
+        for _ in range(n_bins):
+            index, n = SNAPSHOT_BIN.unpack_from(data, offset)
+            stats.sketch.bins[index] = n
+            offset += SNAPSHOT_BIN.size
+        return stats
+
+
+class LatencyStore:
+    """Process-wide latency aggregator persisted to a compact binary snapshot.
+
+    The snapshot is rewritten every ``flush_seconds`` by a background thread
+    of each process and on exit, never by a request. Latencies recorded
+    since the last flush are
+    kept apart and merged into the snapshot under a file lock, so several
+    worker processes can share one snapshot; after a flush ``summary``
+    covers every process that has flushed.
+    """
+
+    def __init__(self, snapshot_path, flush_seconds=10.0, legacy_path=None):
+        self.snapshot_path = Path(snapshot_path)
+        self.lock_path = self.snapshot_path.with_suffix(self.snapshot_path.suffix + ".lock")
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+        self._pending = LatencyStats()
+        self.stats = self._load(legacy_path)
+
+    def _read_snapshot(self):
+        try:
+            if self.snapshot_path.exists():
+                return LatencyStats.from_bytes(self.snapshot_path.read_bytes())
+        except (ValueError, struct.error) as e:
+            logger.warning(f"Ignoring unreadable latency snapshot {self.snapshot_path}: {e}")
+        return None
+
+    def _load(self, legacy_path):
+        stats = self._read_snapshot()
+        if stats is not None:
+            return stats
+
+        stats = LatencyStats()
+        if legacy_path is not None and Path(legacy_path).exists():
+            # Seed from the old rewrite-whole-file JSON log
+            try:
+                with open(legacy_path, "r") as f:
+                    for query in json.load(f).get("queries", []):
+                        stats.record(query["latency"])
+                self._pending.merge(stats)
+            except (ValueError, KeyError) as e:
+                logger.warning(f"Could not import legacy latency log {legacy_path}: {e}")
+        return stats
+
+    def record(self, latency):
+        with self._lock:
+            self.stats.record(latency)
+            self._pending.record(latency)
+            average = self.stats.average
+            # A forked worker needs its own flush thread
+            if self._flusher_pid != os.getpid():
+                self._flusher_pid = os.getpid()
+                threading.Thread(target=self._flush_loop, name="latency-flush", daemon=True).start()
+        return average
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(max(self.flush_seconds, 0.1))
+            self.flush()
+
+    def summary(self):
+        with self._lock:
+            return self.stats.summary()
+
+    def flush(self):
+        with self._lock:
+            if not self._pending.count:
+                return
+            pending, self._pending = self._pending, LatencyStats()
+        try:
+            with open(self.lock_path, "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                merged = self._read_snapshot() or LatencyStats()
+                merged.merge(pending)
+                tmp_path = self.snapshot_path.with_suffix(f"{self.snapshot_path.suffix}.{os.getpid()}.tmp")
+                tmp_path.write_bytes(merged.to_bytes())
+                os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            logger.warning(f"Failed to write latency snapshot: {e}")
+            with self._lock:
+                self._pending.merge(pending)
+            return
+
+        with self._lock:
+            # Latencies recorded during the write are still pending, but belong in the view
+            merged.merge(self._pending)
+            self.stats = merged
+
+
+latency_store = LatencyStore(
+    LATENCY_SNAPSHOT_FILE,
+    flush_seconds=LATENCY_FLUSH_SECONDS,
+    legacy_path=LATENCY_LEGACY_FILE
+)
+atexit.register(latency_store.flush)
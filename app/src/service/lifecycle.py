@@ -0,0 +1,125 @@
+import threading
+import time
+
+from .logger import get_logger
+
+logger = get_logger("script:lifecycle")
+
+# Prompts of different lengths so warm-up covers short and long padded shapes
+WARMUP_PROMPTS = [
+    "hi",
+    "How do I reverse a linked list in Python?",
+    "translate 'good morning' to french",
+    "plan 3 days in paris with museums and cafes, we arrive friday evening and leave monday",
+    "I'm getting 'IndexError: list index out of range'. How do I fix this in my python loop?",
+    "Summarize the following text: " + "The quick brown fox jumps over the lazy dog. " * 12,
+]
+
+
+class ModelNotReadyError(RuntimeError):
+    """The model is still loading or failed to load"""
+
+
+class ModelManager:
+    """Loads the classifier engine once, in the background or on first use, and warms it up.
+
+    ``load`` builds the engine and then scores ``warmup_rounds`` rounds of
+    a single prompt and a ``warmup_batch_size`` batch. The first forward
+    passes pay one-time costs (allocator growth, kernel selection, lazy
+    module init) that would otherwise land on the first real requests.
+    ``start`` runs ``load`` on a daemon thread; ``get`` returns the engine,
+    loading it in the calling thread when nothing started it yet.
+    """
+
+    def __init__(self, loader, warmup_rounds=2, warmup_batch_size=8, warmup_prompts=WARMUP_PROMPTS):
+        self.loader = loader
+        self.warmup_rounds = warmup_rounds
+        self.warmup_batch_size = warmup_batch_size
+        self.warmup_prompts = list(warmup_prompts)
+
+        self._engine = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.state = "not_started"
+        self.error = None
+        self.started_at = None
+        self.load_seconds = None
+        self.warmup_seconds = []
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def start(self):
+        """Load the engine on a background thread (no-op if already started)"""
+        with self._lock:
+            if self._thread is not None or self._engine is not None:
+                return
+            self._thread = threading.Thread(target=self._load_in_background, name="model-loader", daemon=True)
+            self._thread.start()
+
+    def _load_in_background(self):
+        try:
+            self.load()
+        except Exception:
+            pass  # recorded in self.error and reported by /ready
+
+    def load(self):
+        with self._lock:
+            if self._engine is not None:
+                return self._engine
+            self.state = "loading"
+            self.error = None
+            self.started_at = time.time()
+            try:
+                start = time.perf_counter()
+                engine = self.loader()
+                self.load_seconds = time.perf_counter() - start
+
+                self.state = "warming_up"
+                self.warmup_seconds = self._warm_up(engine)
+            except Exception as e:
+                self.state = "failed"
+                self.error = f"{type(e).__name__}: {e}"
+                logger.error(f"Model load failed: {self.error}")
+                raise
+
+            self._engine = engine
+            self.state = "ready"
+            logger.info(f"Model ready: load {self.load_seconds:.2f}s, "
+                        f"warm-up {', '.join(f'{s:.3f}s' for s in self.warmup_seconds)}")
+            return engine
+
+    def _warm_up(self, engine):
+        if not self.warmup_prompts:
+            return []
+        batch = [self.warmup_prompts[i % len(self.warmup_prompts)] for i in range(self.warmup_batch_size)]
+        timings = []
+        for _ in range(self.warmup_rounds):
+            start = time.perf_counter()
+            engine.score(batch[:1])
+            engine.score(batch)
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    def get(self):
+        """Return the loaded engine, waiting for (or running) the load"""
+        if self._engine is not None:
+            return self._engine
+        try:
+            return self.load()
+        except Exception as e:
+            raise ModelNotReadyError(f"Classifier model failed to load: {self.error}") from e
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "error": self.error,
+            "loading_seconds": time.time() - self.started_at if self.state in ("loading", "warming_up") else None,
+            "load_seconds": self.load_seconds,
+            "warmup_rounds": self.warmup_rounds,
+            "warmup_batch_size": self.warmup_batch_size,
+            "warmup_seconds": self.warmup_seconds,
+        }
@@ -1,9 +1,66 @@
+import atexit
+import contextvars
+import json
+import queue
+import random
 import sys
 import os
 import logging
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 
-log_format = logging.Formatter(
+from .config import LOG_ASYNC, LOG_DETAIL_SAMPLE_RATE, LOG_JSON, LOG_LEVEL, LOG_QUEUE_SIZE
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, logger, level, message (and exception)"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, self.datefmt),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        if record.exc_info or record.exc_text:
+            entry["exception"] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+_exception_formatter = logging.Formatter()
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hand records to a background listener without blocking.
+
+    The message is built in the calling thread, since the logged objects
+    (e.g. settings dicts) may change right after the log call; formatting
+    with the handlers' formatters and all I/O happen on the listener. When
+    the queue is full the record is dropped and counted instead of
+    stalling the request.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # The traceback is rendered now as well; formatters use exc_text when set
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+log_format = JsonFormatter(datefmt="%Y-%m-%dT%H:%M:%S") if LOG_JSON else logging.Formatter(
     '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     datefmt="%Y-%m-%d %H:%M:%S"
 )
@@ -13,7 +70,7 @@ console_handler = logging.StreamHandler(sys.stdout)
 console_handler.setFormatter(log_format)
 
 # Determine log file path
-log_file_name = f"app_{datetime.now().strftime('%Y%m%d')}.log"
+log_file_name = f"app_{datetime.now().strftime('%Y%m%d')}.{'jsonl' if LOG_JSON else 'log'}"
 project_root = os.environ.get("PROJECT_ROOT") or os.getcwd()  # fallback to cwd
 log_dir = os.path.join(project_root, "log")
 os.makedirs(log_dir, exist_ok=True)
@@ -23,15 +80,51 @@ log_file_path = os.path.join(log_dir, log_file_name)
 file_handler = logging.FileHandler(log_file_path, mode="a", encoding="utf-8")
 file_handler.setFormatter(log_format)
 
+# Console and file I/O happen on a background listener thread
+queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+queue_listener = QueueListener(queue_handler.queue, console_handler, file_handler, respect_handler_level=True)
+
+
+def _restart_listener_after_fork():
+    # The listener thread does not survive a fork and the old queue may be
+    # locked; give the child a fresh queue and listener thread
+    queue_handler.queue = queue_listener.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_listener._thread = None
+    queue_listener.start()
+
+
+if LOG_ASYNC:
+    queue_listener.start()
+    # Write out everything still queued on exit
+    atexit.register(queue_listener.stop)
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+# --- Sampling of per-request detail logs ---
+_details_enabled = contextvars.ContextVar("log_details_enabled", default=True)
+
+
+def sample_details(rate=LOG_DETAIL_SAMPLE_RATE):
+    """Decide whether the current request logs its details; returns the decision"""
+    enabled = rate >= 1 or random.random() < rate
+    _details_enabled.set(enabled)
+    return enabled
+
+
+def details_enabled():
+    return _details_enabled.get()
+
 
 def get_logger(name: str):
     logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
+    logger.setLevel(LOG_LEVEL)
 
     # Avoid adding handlers multiple times
     if not logger.handlers:
-        logger.addHandler(console_handler)
-        logger.addHandler(file_handler)
+        if LOG_ASYNC:
+            logger.addHandler(queue_handler)
+        else:
+            logger.addHandler(console_handler)
+            logger.addHandler(file_handler)
 
     logger.propagate = False
     return logger
@@ -0,0 +1,214 @@
+import threading
+from bisect import bisect_left
+from time import perf_counter_ns
+
+# Upper bounds in seconds, from 1 microsecond to 10 seconds
+LATENCY_BUCKETS = (
+    1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3,
+    0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def render(self):
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {_format_value(self.value)}",
+        ]
+
+
+class Gauge:
+    """A gauge that is either set explicitly or read from a callback at scrape time"""
+
+    def __init__(self, name, documentation, callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def render(self):
+        value = self.callback() if self.callback is not None else self.value
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_format_value(value)}",
+        ]
+
+
+class _HistogramShard:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class _HistogramChild:
+    """Observations are written to a per-thread shard without a lock and merged when read"""
+
+    __slots__ = ("buckets", "_local", "_shards", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _new_shard(self):
+        shard = self._local.shard = _HistogramShard(len(self.buckets) + 1)
+        with self._lock:
+            self._shards.append(shard)
+        return shard
+
+    def observe(self, value):
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard.counts[bisect_left(self.buckets, value)] += 1
+        shard.sum += value
+        shard.count += 1
+
+    def observe_ns(self, elapsed_ns):
+        self.observe(elapsed_ns / 1e9)
+
+    def snapshot(self):
+        """Merged (counts, sum, count) of all threads"""
+        with self._lock:
+            shards = list(self._shards)
+        counts = [sum(column) for column in zip(*(shard.counts for shard in shards))] or [0] * (len(self.buckets) + 1)
+        return counts, sum(shard.sum for shard in shards), sum(shard.count for shard in shards)
+
+
+class Histogram:
+    """Fixed-bucket histogram, optionally split by one label"""
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS, label=None):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.label = label
+        self._children = {}
+        self._lock = threading.Lock()
+        if label is None:
+            self._default = self.labels(None)
+
+    def labels(self, value):
+        child = self._children.get(value)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(value, _HistogramChild(self.buckets))
+        return child
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def observe_ns(self, elapsed_ns):
+        self._default.observe(elapsed_ns / 1e9)
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for value, child in sorted(self._children.items(), key=lambda kv: str(kv[0])):
+            base = [(self.label, value)] if self.label is not None else []
+            counts, total, count = child.snapshot()
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_format_labels(base + [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(base)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(base)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation):
+        return self._register(Counter(name, documentation))
+
+    def gauge(self, name, documentation, callback=None):
+        gauge = self._register(Gauge(name, documentation))
+        if callback is not None:
+            gauge.callback = callback
+        return gauge
+
+    def histogram(self, name, documentation, buckets=LATENCY_BUCKETS, label=None):
+        return self._register(Histogram(name, documentation, buckets, label))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    "classifier_stage_seconds",
+    "Time spent in each stage of classify_prompt",
+    label="stage"
+)
+BATCH_QUEUE_WAIT_SECONDS = registry.histogram(
+    "classifier_batch_queue_wait_seconds",
+    "Time a prompt waited in the batching queue before its batch started"
+)
+BATCH_SIZE = registry.histogram(
+    "classifier_batch_size",
+    "Number of prompts per model forward pass",
+    buckets=SIZE_BUCKETS
+)
+MODEL_LOAD_SECONDS = registry.gauge(
+    "classifier_model_load_seconds",
+    "Time it took to load the classifier model"
+)
+
+
+def observe_stage(stage, start_ns):
+    """Record the time since start_ns for a stage and return the current timestamp.
+
+    Returning the timestamp lets consecutive stages be chained without an
+    extra clock read::
+
+        t = perf_counter_ns()
+        ...
+        t = observe_stage("selection", t)
+    """
+    now = perf_counter_ns()
+    STAGE_SECONDS.labels(stage).observe((now - start_ns) / 1e9)
+    return now
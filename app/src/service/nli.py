@@ -0,0 +1,152 @@
+import inspect
+from time import perf_counter_ns
+
+import numpy as np
+import torch
+
+from .metrics import observe_stage
+from .truncation import truncate_tokens
+
+HYPOTHESIS_TEMPLATE = "This example is {}."
+
+
+def pair_template(tokenizer):
+    """Special tokens the tokenizer puts before, between and after a text pair.
+
+    Derived from a probe encoding so it works for any fast tokenizer, e.g.
+    BART gives ``<s> A </s></s> B </s>`` -> ([0], [2, 2], [2]).
+    """
+    encoding = tokenizer("a", "b")
+    ids = encoding["input_ids"]
+    sequence_ids = encoding.sequence_ids(0)
+    first = [i for i, s in enumerate(sequence_ids) if s == 0]
+    second = [i for i, s in enumerate(sequence_ids) if s == 1]
+    return ids[:first[0]], ids[first[-1] + 1:second[0]], ids[second[-1] + 1:]
+
+
+class NLIScorer:
+    """Zero-shot NLI scoring with the candidate-label hypotheses tokenized once.
+
+    Reproduces ``pipeline("zero-shot-classification")(..., multi_label=True)``
+    for a sequence-classification NLI model: every prompt is paired with
+    ``HYPOTHESIS_TEMPLATE.format(label)`` for each label and each label score
+    is the softmax of entailment vs. contradiction logits.
+
+    Only the prompt is truncated. By default, like the pipeline, it is cut
+    separately for each pair to what fits next to that hypothesis (keeping
+    the head). With an explicit ``max_prompt_tokens`` or another
+    ``truncation`` policy, it is cut once to that budget, and never beyond
+    what fits next to the longest hypothesis, so every pair sees the same
+    tokens. ``max_prompt_tokens`` is the budget of the shortest pair either way.
+
+    The pipeline tokenizes every premise/hypothesis pair separately (10
+    tokenizer calls per prompt) and runs them through a DataLoader. Here the
+    hypotheses are tokenized once at construction, each prompt is tokenized
+    once, and the pairs are assembled from token ids directly.
+
+    The prompt cannot be encoded once and reused across labels: the NLI
+    model is a cross-encoder whose encoder attends jointly over premise and
+    hypothesis, so each pair still needs its own forward pass. Scores match
+    the pipeline to within 1e-5 (float32 noise from different padding
+    within a batch).
+    """
+
+    def __init__(self, model, tokenizer, candidate_labels, hypothesis_template=HYPOTHESIS_TEMPLATE,
+                 max_prompt_tokens=None, truncation="head"):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.hypothesis_template = hypothesis_template
+        self.requested_max_prompt_tokens = max_prompt_tokens
+        self.truncation = truncation
+        self.pair_budgets = None
+
+        self.entailment_id = next(
+            (idx for label, idx in model.config.label2id.items() if label.lower().startswith("entail")), -1
+        )
+        self.contradiction_id = -1 if self.entailment_id == 0 else 0
+
+        if tokenizer.pad_token_id is None:
+            tokenizer.pad_token = tokenizer.eos_token
+        self.pad_token_id = tokenizer.pad_token_id
+        self.prefix, self.middle, self.suffix = pair_template(tokenizer)
+        self.num_special_tokens = len(self.prefix) + len(self.middle) + len(self.suffix)
+        self.max_length = tokenizer.model_max_length
+        # Sequence-classification models should not build a decoder cache
+        self.forward_kwargs = {"use_cache": False} if "use_cache" in inspect.signature(model.forward).parameters else {}
+        # Replaced by an optimized runner when an inference backend is applied
+        self.forward = self.torch_forward
+
+        self.set_labels(candidate_labels)
+
+    def set_labels(self, candidate_labels):
+        """Pre-tokenize the hypothesis for every candidate label"""
+        self.candidate_labels = list(candidate_labels)
+        hypotheses = [self.hypothesis_template.format(label) for label in self.candidate_labels]
+        self.hypothesis_ids = self.tokenizer(hypotheses, add_special_tokens=False)["input_ids"]
+        self.set_budget(self.requested_max_prompt_tokens, self.truncation)
+
+    def set_budget(self, max_prompt_tokens=None, truncation="head"):
+        """Prompt token budget and truncation policy; None and head cut each pair like the pipeline"""
+        self.requested_max_prompt_tokens = max_prompt_tokens
+        self.truncation = truncation
+        pair_budgets = [self.max_length - self.num_special_tokens - len(h) for h in self.hypothesis_ids]
+        self.max_prompt_tokens = min(pair_budgets)
+        if max_prompt_tokens:
+            self.max_prompt_tokens = min(self.max_prompt_tokens, max_prompt_tokens)
+        self.pair_budgets = pair_budgets if not max_prompt_tokens and truncation == "head" else None
+
+    def encode(self, prompts):
+        """Tokenize prompts (without special tokens) in one tokenizer call"""
+        return self.tokenizer(list(prompts), add_special_tokens=False)["input_ids"]
+
+    def build_inputs(self, premise_ids):
+        """Assemble padded (N * L, T) input_ids/attention_mask for every premise/hypothesis pair"""
+        sequences = []
+        for premise in premise_ids:
+            if self.pair_budgets is not None and len(premise) > self.max_prompt_tokens:
+                # Each pair keeps as much of the prompt as fits next to its hypothesis
+                for hypothesis, budget in zip(self.hypothesis_ids, self.pair_budgets):
+                    sequences.append(self.prefix + premise[:budget] + self.middle + hypothesis + self.suffix)
+                continue
+            premise = truncate_tokens(premise, self.max_prompt_tokens, self.truncation)
+            for hypothesis in self.hypothesis_ids:
+                sequences.append(self.prefix + premise + self.middle + hypothesis + self.suffix)
+
+        width = max(len(seq) for seq in sequences)
+        input_ids = np.full((len(sequences), width), self.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(sequences), width), dtype=np.int64)
+        for i, seq in enumerate(sequences):
+            input_ids[i, :len(seq)] = seq
+            attention_mask[i, :len(seq)] = 1
+        return torch.from_numpy(input_ids), torch.from_numpy(attention_mask)
+
+    def torch_forward(self, input_ids, attention_mask):
+        """Run the model eagerly, returns (N * L, C) float32 logits as a numpy array"""
+        device = self.model.device
+        with torch.inference_mode():
+            logits = self.model(
+                input_ids=input_ids.to(device),
+                attention_mask=attention_mask.to(device),
+                **self.forward_kwargs
+            ).logits
+        return logits.float().cpu().numpy()
+
+    def score_encoded(self, premise_ids, start_ns=None):
+        """Return an (N, L) entailment score matrix for already tokenized prompts"""
+        t = perf_counter_ns() if start_ns is None else start_ns
+        input_ids, attention_mask = self.build_inputs(premise_ids)
+        t = observe_stage("tokenize", t)
+
+        logits = self.forward(input_ids, attention_mask)
+        t = observe_stage("forward", t)
+
+        logits = logits.reshape(len(premise_ids), len(self.hypothesis_ids), -1)
+        entail_contr = logits[..., [self.contradiction_id, self.entailment_id]]
+        entail_contr = np.exp(entail_contr - entail_contr.max(axis=-1, keepdims=True))
+        scores = entail_contr[..., 1] / entail_contr.sum(axis=-1)
+        observe_stage("softmax", t)
+        return scores
+
+    def score(self, prompts):
+        t = perf_counter_ns()
+        return self.score_encoded(self.encode(prompts), start_ns=t)
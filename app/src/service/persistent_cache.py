@@ -0,0 +1,260 @@
+import atexit
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .logger import get_logger
+
+logger = get_logger("script:persistent_cache")
+
+# Rows of another config version are only deleted once no process has read
+# them for this long, so workers that reload labels a few seconds apart do
+# not delete each other's entries
+STALE_VERSION_GRACE_SECONDS = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    version TEXT NOT NULL,
+    value TEXT NOT NULL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+"""
+
+
+def persistent_key(key) -> str:
+    """Stable hash of a cache_key tuple, the same in every process"""
+    return hashlib.sha256(json.dumps(key, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class PersistentCache:
+    """Second-tier result cache in a local SQLite file, shared by processes on one host.
+
+    The database runs in WAL mode, so any number of processes read while
+    one writes. Rows are keyed by the hash of the full cache key, which
+    embeds the config version (model, labels, mapping), and also record the
+    version so stale rows can be pruned. Every process and thread opens its
+    own connection. Beyond ``max_entries`` rows, the least recently read
+    ones are deleted; reads refresh a row's access time at most once per
+    ``touch_seconds`` to keep hits read-only. Storage errors are logged and
+    treated as misses: the cache never fails a request.
+
+    With ``write_behind``, writes and access time refreshes are queued to a
+    background thread of each process, which commits everything queued in
+    one transaction. A request then never waits for another process's
+    write lock; when the queue is full, the write is dropped and counted.
+    """
+
+    def __init__(self, path, max_entries=1_000_000, touch_seconds=60.0, busy_timeout_ms=5000,
+                 write_behind=False, write_queue_size=10_000):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.touch_seconds = touch_seconds
+        self.busy_timeout_ms = busy_timeout_ms
+        self.write_behind = write_behind
+        self.write_queue_size = write_queue_size
+        # Entries are counted again every prune_every writes of this process
+        self.prune_every = max(100, max_entries // 100)
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._version = None
+        self._writes_since_prune = 0
+        self._queue = queue.Queue(maxsize=write_queue_size)
+        self._writer_pid = None
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+        self.dropped = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+        if write_behind:
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+            # Commit whatever is still queued on exit
+            atexit.register(self.flush)
+
+    def _connection(self):
+        # A connection must not cross a fork (app.serve preloads, then forks)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _reset_after_fork(self):
+        # The writer thread does not survive a fork and the locks may be held;
+        # the child starts its own writer on its first write
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=self.write_queue_size)
+        self._writer_pid = None
+
+    def _failed(self, action, error):
+        with self._lock:
+            self.errors += 1
+        logger.warning("Persistent cache %s failed: %s", action, error)
+
+    def ensure_version(self, version):
+        """Remember the current config version; rows of other versions are pruned first"""
+        self._version = version
+
+    def get(self, key):
+        digest = persistent_key(key)
+        try:
+            conn = self._connection()
+            row = conn.execute("SELECT value, accessed FROM results WHERE key = ?", (digest,)).fetchone()
+            if row is not None and row[1] < time.time() - self.touch_seconds:
+                if self.write_behind:
+                    self._enqueue([], [digest])
+                else:
+                    conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), digest))
+        except sqlite3.Error as e:
+            self._failed("read", e)
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        categories, settings = json.loads(row[0])
+        return categories, settings
+
+    def put(self, key, value, version=None):
+        self.put_many([(key, value)], version)
+
+    def put_many(self, items, version=None):
+        """Store (key, (categories, settings)) pairs in one transaction (queued with write_behind)"""
+        now = time.time()
+        # Serialized now: the caller may change the values after this returns
+        rows = [(persistent_key(key), version or self._version, json.dumps(value, ensure_ascii=False), now)
+                for key, value in items]
+        if not rows:
+            return
+        if self.write_behind:
+            self._enqueue(rows, [])
+        else:
+            self._write(rows, [])
+
+    def _enqueue(self, rows, touched):
+        if self._writer_pid != os.getpid():
+            with self._lock:
+                if self._writer_pid != os.getpid():
+                    threading.Thread(target=self._write_loop, args=(self._queue,), name="persistent-cache-writer",
+                                     daemon=True).start()
+                    self._writer_pid = os.getpid()
+        try:
+            self._queue.put_nowait((rows, touched))
+        except queue.Full:
+            with self._lock:
+                self.dropped += len(rows)
+
+    def _write_loop(self, write_queue):
+        while True:
+            rows, touched = write_queue.get()
+            taken = 1
+            # Commit everything queued meanwhile in the same transaction
+            while len(rows) < self.prune_every:
+                try:
+                    more_rows, more_touched = write_queue.get_nowait()
+                except queue.Empty:
+                    break
+                rows, touched, taken = rows + more_rows, touched + more_touched, taken + 1
+            try:
+                self._write(rows, touched)
+            finally:
+                for _ in range(taken):
+                    write_queue.task_done()
+
+    def flush(self):
+        """Wait until every queued write of this process is committed"""
+        if self.write_behind and self._writer_pid == os.getpid():
+            self._queue.join()
+
+    def _write(self, rows, touched):
+        now = time.time()
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany("INSERT OR REPLACE INTO results (key, version, value, accessed) VALUES (?, ?, ?, ?)",
+                                 rows)
+                conn.executemany("UPDATE results SET accessed = ? WHERE key = ?", [(now, key) for key in touched])
+        except sqlite3.Error as e:
+            self._failed("write", e)
+            return
+        if not rows:
+            return
+
+        with self._lock:
+            self.writes += len(rows)
+            self._writes_since_prune += len(rows)
+            prune = self._writes_since_prune >= self.prune_every
+            if prune:
+                self._writes_since_prune = 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """Delete stale-version rows, then the least recently read ones beyond max_entries"""
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                deleted = conn.execute("DELETE FROM results WHERE version != ? AND accessed < ?",
+                                       (self._version, time.time() - STALE_VERSION_GRACE_SECONDS)).rowcount
+                excess = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    # Make room for the next prune_every writes as well
+                    excess += min(self.prune_every, self.max_entries // 10)
+                    deleted += conn.execute(
+                        "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY accessed LIMIT ?)",
+                        (excess,)
+                    ).rowcount
+        except sqlite3.Error as e:
+            self._failed("prune", e)
+            return
+        with self._lock:
+            self.evictions += deleted
+
+    def clear(self):
+        try:
+            self._connection().execute("DELETE FROM results")
+        except sqlite3.Error as e:
+            self._failed("clear", e)
+
+    def __len__(self):
+        try:
+            return self._connection().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        except sqlite3.Error as e:
+            self._failed("count", e)
+            return 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "version": self._version,
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "write_queue": self._queue.qsize(),
+        }
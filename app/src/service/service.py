@@ -1,188 +1,562 @@
-from transformers import pipeline
-import json
+import threading
 import time
+from collections import OrderedDict
 from pathlib import Path
+from time import perf_counter_ns
+import numpy as np
 import torch
-from .logger import get_logger
+from .admission import AdmissionController
+from .batching import MicroBatcher, QueueFullError
+from .cache import ResultCache, file_digest, normalize_prompt
+from .config import (
+    BATCHING_ENABLED, BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, BATCH_QUEUE_DEPTH, BULK_CHUNK_SIZE,
+    CACHE_ENABLED, CACHE_MAX_ENTRIES, CACHE_MAX_MB, CACHE_TTL_SECONDS, CACHE_NFKC, COALESCE_ENABLED,
+    ENGINE, NLI_MODEL, NLI_BACKEND, NLI_FAST_PATH, EMBEDDING_MODEL, EMBEDDING_EXEMPLARS, EMBEDDING_CENTER,
+    EMBEDDING_SCALE, CASCADE_ENABLED, CASCADE_MODEL, CASCADE_MARGIN,
+    WARMUP_ROUNDS, WARMUP_BATCH_SIZE, TRUNCATION, MAX_PROMPT_TOKENS, LENGTH_BUCKETS, STREAM_MAX_IN_FLIGHT,
+    SIMILARITY_CACHE_ENABLED, SIMILARITY_THRESHOLD, SIMILARITY_MAX_ENTRIES, SIMILARITY_NUM_PERM, SIMILARITY_BANDS,
+    SIMILARITY_SHINGLE_SIZE, PERSISTENT_CACHE_PATH, PERSISTENT_CACHE_MAX_ENTRIES, ADMISSION_ENABLED,
+    ADMISSION_MAX_IN_FLIGHT, ADMISSION_PARALLELISM, ADMISSION_DEFAULT_DEADLINE_MS, ADMISSION_OVERLOAD
+)
+from .cascade import CascadeEngine, HashedNgramClassifier
+from .coalesce import SingleFlight
+from .engines import create_engine
+from .executor import configure_torch_threads, forward_slots, run_inference
+from .label_registry import LabelRegistry
+from .latency_store import latency_store
+from .lifecycle import ModelManager
+from .logger import details_enabled, get_logger, sample_details
+from .metrics import BATCH_SIZE, MODEL_LOAD_SECONDS, observe_stage, registry
+from .persistent_cache import PersistentCache
+from .similarity_cache import SimilarityCache
+from .streaming import StreamGate
+from .truncation import length_bucket, truncation_info
 
 logger = get_logger("script:classify")
 
 # --- Paths ---
 BASE_DIR = Path(__file__).parent
+LABELS_PATH = BASE_DIR / "labels.json"
 MAPPING_PATH = BASE_DIR / "mapping.json"
-LATENCY_FILE = BASE_DIR / "latency_log.json"
-print(f"latency file {LATENCY_FILE.resolve()}")
-LATENCY_FILE2 = Path(__file__).parent / "latency_log.json"
-print("Latency file path:", LATENCY_FILE2.resolve())
-
-# --- Load category mapping ---
-with MAPPING_PATH.open("r") as f:
-    CATEGORY_MAPPING = json.load(f)
-
-# --- Labels and candidate labels ---
-labels = [
-    "Coding", "Debugging", "Creative_Writing", "Factual_QA",
-    "Summarization", "Translation", "Data_Analysis", "Planning_Itinerary",
-    "Sensitive_Medical_Legal", "ChitChat"
-]
-
-candidate_labels = [
-    "The user is asking about programming or code.",
-    "The user is asking for help debugging an error.",
-    "The user wants creative writing or storytelling.",
-    "The user wants factual general knowledge.",
-    "The user wants a summary of text.",
-    "The user wants translation to another language.",
-    "The user wants data analysis or statistics.",
-    "The user is planning a trip, schedule or time.",
-    "The user is asking medical or legal questions.",
-    "The user is having casual chitchat or greeting."
-]
-
-LABEL_MAP = {
-    "The user wants creative writing or storytelling.": "Creative_Writing",
-    "The user is having casual chitchat or greeting.": "ChitChat",
-    "The user wants translation to another language.": "Translation",
-    "The user wants a summary of text.": "Summarization",
-    "The user is asking for help debugging an error.": "Debugging",
-    "The user wants factual general knowledge.": "Factual_QA",
-    "The user is asking about programming or code.": "Coding",
-    "The user is planning a trip, schedule or time.": "Planning_Itinerary",
-    "The user is asking medical or legal questions.": "Sensitive_Medical_Legal",
-    "The user wants data analysis or statistics.": "Data_Analysis"
-}
-
-# --- Precompute order indices ---
-RE_ORDER = ["minimal", "medium", "high", "maximal"]
-WEB_ORDER = ["disabled", "optional", "mandatory"]
-VERBOSITY_ORDER = ["concise", "balanced", "verbose"]
-
-RE_INDEX = {v: i for i, v in enumerate(RE_ORDER)}
-WEB_INDEX = {v: i for i, v in enumerate(WEB_ORDER)}
-VERBOSITY_INDEX = {v: i for i, v in enumerate(VERBOSITY_ORDER)}
+
+# --- Labels and settings mapping ---
+# labels.json maps each category to the description the classifier scores
+# against; mapping.json holds each category's settings. Both can be reloaded
+# at runtime. The version hashes them together with everything else that
+# changes classification output, so a reload also invalidates the cache.
+# Model and exemplar files are hashed by content: the persistent cache
+# outlives the process, and a file replaced in place keeps its path.
+label_registry = LabelRegistry(LABELS_PATH, MAPPING_PATH, version_parts=(
+    ENGINE, NLI_MODEL, NLI_BACKEND, NLI_FAST_PATH, EMBEDDING_MODEL,
+    EMBEDDING_EXEMPLARS and (EMBEDDING_EXEMPLARS, file_digest(EMBEDDING_EXEMPLARS)), EMBEDDING_CENTER, EMBEDDING_SCALE,
+    CASCADE_ENABLED and (CASCADE_MODEL, file_digest(CASCADE_MODEL), CASCADE_MARGIN),
+    TRUNCATION, MAX_PROMPT_TOKENS
+))
+
+# --- Result cache for repeated prompts ---
+# Keys embed the label set version, so results of an older version are never served.
+result_cache = ResultCache(
+    max_entries=CACHE_MAX_ENTRIES,
+    max_bytes=int(CACHE_MAX_MB * 1024 * 1024),
+    ttl_seconds=CACHE_TTL_SECONDS
+) if CACHE_ENABLED else None
+if result_cache is not None:
+    result_cache.ensure_version(label_registry.current.version)
+
+
+def cache_key(label_set, prompt, high_gap, ratio, min_threshold):
+    return (label_set.version, normalize_prompt(prompt, CACHE_NFKC), high_gap, ratio, min_threshold)
+
+
+# --- Persistent cache shared by the worker processes of this host ---
+# Looked up after a result cache miss; hits are copied into the result cache.
+# Writes go through a background thread, so a request never waits for the
+# SQLite write lock of another worker.
+persistent_cache = PersistentCache(
+    PERSISTENT_CACHE_PATH,
+    max_entries=PERSISTENT_CACHE_MAX_ENTRIES,
+    write_behind=True
+) if PERSISTENT_CACHE_PATH else None
+if persistent_cache is not None:
+    persistent_cache.ensure_version(label_registry.current.version)
+
+# --- Near-duplicate cache for prompts that differ in a few words ---
+# Only consulted by /classify (and /classify/stream) after an exact miss.
+similarity_cache = SimilarityCache(
+    threshold=SIMILARITY_THRESHOLD,
+    max_entries=SIMILARITY_MAX_ENTRIES,
+    num_perm=SIMILARITY_NUM_PERM,
+    bands=SIMILARITY_BANDS,
+    shingle_size=SIMILARITY_SHINGLE_SIZE,
+    ttl_seconds=CACHE_TTL_SECONDS,
+    nfkc=CACHE_NFKC
+) if SIMILARITY_CACHE_ENABLED else None
+if similarity_cache is not None:
+    similarity_cache.ensure_version(label_registry.current.version)
+
+
+def _copy_result(categories, settings):
+    return [dict(c) for c in categories], dict(settings)
+
+
+# --- In-flight deduplication of identical concurrent requests ---
+in_flight = SingleFlight() if COALESCE_ENABLED else None
+
+# --- Admission control and load shedding for /classify ---
+admission = AdmissionController(
+    max_in_flight=ADMISSION_MAX_IN_FLIGHT,
+    parallelism=ADMISSION_PARALLELISM,
+    default_deadline_ms=ADMISSION_DEFAULT_DEADLINE_MS,
+    overload=ADMISSION_OVERLOAD
+) if ADMISSION_ENABLED else None
+
+# --- Bound on prompts in flight across all /classify/stream connections ---
+stream_gate = StreamGate(STREAM_MAX_IN_FLIGHT)
 
 # --- Detect device ---
 device = 0 if torch.cuda.is_available() else -1
 logger.info(f"Using device: {'GPU' if device >= 0 else 'CPU'}")
 
-# --- Load classifier once ---
-classifier = pipeline(
-    "zero-shot-classification",
-    model="facebook/bart-large-mnli",
-    device=device
-)
+# --- Classifier engine, loaded once on startup or first use ---
+configure_torch_threads()
+
+
+def load_engine():
+    """Build the engine selected by the configuration (wrapped in the cascade if enabled)"""
+    load_start = perf_counter_ns()
+    label_set = label_registry.current
+    engine = create_engine(ENGINE, label_set.candidate_labels, label_set.labels, device=device)
+    if CASCADE_ENABLED:
+        engine = CascadeEngine(
+            HashedNgramClassifier.load(CASCADE_MODEL).aligned_to(label_set.labels), engine, CASCADE_MARGIN
+        )
+    MODEL_LOAD_SECONDS.set((perf_counter_ns() - load_start) / 1e9)
+    logger.info(f"Loaded '{engine.name}' engine ({engine.model_name})")
+    with _engine_views_lock:
+        _engine_views[label_set.version] = engine
+    return engine
+
+
+model_manager = ModelManager(load_engine, warmup_rounds=WARMUP_ROUNDS, warmup_batch_size=WARMUP_BATCH_SIZE)
+
+# The loaded engine for each recent label set version; every view shares the model
+_engine_views = OrderedDict()
+_engine_views_lock = threading.Lock()
+ENGINE_VIEWS_KEPT = 2
+
+
+def _engine_view(label_set, engine):
+    with _engine_views_lock:
+        view = _engine_views.get(label_set.version)
+        if view is None:
+            view = engine.with_labels(label_set.candidate_labels, label_set.labels)
+            _engine_views[label_set.version] = view
+            # Only older versions age out: the current one (and one being
+            # prepared to replace it) is kept even when a straggler adds a view
+            kept = {label_registry.current.version, label_set.version}
+            older = [version for version in _engine_views if version not in kept]
+            while older and len(_engine_views) > ENGINE_VIEWS_KEPT:
+                del _engine_views[older.pop(0)]
+        return view
+
+
+def get_engine(label_set=None):
+    """The loaded classifier engine for a label set (the current one by default).
+
+    Loads the model in the calling thread if nothing started the load yet.
+    """
+    engine = model_manager.get()
+    return _engine_view(label_set or label_registry.current, engine)
+
+
+def _prepare_label_set(label_set):
+    # Redo the label precomputation before the swap, never on a request
+    if model_manager.ready:
+        _engine_view(label_set, model_manager.get())
+    if result_cache is not None:
+        result_cache.ensure_version(label_set.version)
+    if persistent_cache is not None:
+        persistent_cache.ensure_version(label_set.version)
+    if similarity_cache is not None:
+        similarity_cache.ensure_version(label_set.version)
+
+
+label_registry.add_preparer(_prepare_label_set)
+
+
+def run_classifier(prompts, label_set=None):
+    """Score a list of prompts against all candidate labels in one padded forward pass.
+
+    Returns an (N, L) score matrix in candidate_labels order.
+    """
+    BATCH_SIZE.observe(len(prompts))
+    engine = get_engine(label_set)
+    with forward_slots:
+        return engine.score(prompts)
+
+
+def run_classifier_batch(items):
+    """Score (prompt, label_set) pairs from the batcher; a batch never mixes label sets"""
+    return run_classifier([prompt for prompt, _ in items], items[0][1])
+
+
+def prompt_length_info(engine, prompt_tokens):
+    """Return (length bucket, truncation metadata or None) for a prompt of prompt_tokens tokens"""
+    kept = prompt_tokens if engine.max_prompt_tokens is None else min(prompt_tokens, engine.max_prompt_tokens)
+    return length_bucket(kept, LENGTH_BUCKETS), truncation_info(prompt_tokens, engine.max_prompt_tokens,
+                                                                engine.truncation)
+
+
+def score_prompts(prompts, chunk_size=BULK_CHUNK_SIZE, lengths=None, label_set=None):
+    """Return an (N, L) score matrix in candidate_labels order.
+
+    Prompts are sorted by token length (after truncation) and scored in
+    chunks that never cross a LENGTH_BUCKETS bound, so that each padded
+    batch holds prompts of similar length.
+    """
+    label_set = label_set or label_registry.current
+    engine = get_engine(label_set)
+    scores = np.zeros((len(prompts), len(label_set.candidate_labels)))
+    if lengths is None:
+        lengths = engine.token_lengths(prompts)
+    lengths = np.asarray(lengths)
+    if engine.max_prompt_tokens is not None:
+        lengths = np.minimum(lengths, engine.max_prompt_tokens)
+    order = np.argsort(lengths, kind="stable")
+    buckets = np.searchsorted(LENGTH_BUCKETS, lengths[order], side="left")
+
+    for bucket_order in np.split(order, np.flatnonzero(np.diff(buckets)) + 1):
+        for start in range(0, len(bucket_order), chunk_size):
+            chunk = bucket_order[start:start + chunk_size]
+            scores[chunk] = run_classifier([prompts[i] for i in chunk], label_set)
+    return scores
+
+
+# --- Micro-batching stage in front of the classifier ---
+batcher = MicroBatcher(
+    run_classifier_batch,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+    max_queue_depth=BATCH_QUEUE_DEPTH,
+    name="classifier-batcher"
+) if BATCHING_ENABLED else None
+
+# --- Scrape-time gauges ---
+registry.gauge("classifier_model_ready", "1 once the model is loaded and warmed up",
+               lambda: int(model_manager.ready))
+registry.gauge("classifier_label_reloads", "Label set reloads swapped in", lambda: label_registry.reloads)
+registry.gauge("classifier_label_reload_failures", "Label set reloads rejected", lambda: label_registry.failed_reloads)
+if batcher is not None:
+    registry.gauge("classifier_batch_queue_depth", "Prompts waiting in the batching queue",
+                   lambda: batcher.queue_depth)
+if result_cache is not None:
+    registry.gauge("classifier_cache_hit_ratio", "Result cache hits / lookups",
+                   lambda: result_cache.stats()["hit_ratio"])
+    registry.gauge("classifier_cache_hits", "Result cache hits", lambda: result_cache.hits)
+    registry.gauge("classifier_cache_misses", "Result cache misses", lambda: result_cache.misses)
+    registry.gauge("classifier_cache_evictions", "Result cache evictions", lambda: result_cache.evictions)
+    registry.gauge("classifier_cache_entries", "Result cache entries", lambda: len(result_cache))
+if persistent_cache is not None:
+    registry.gauge("classifier_persistent_cache_hits", "Persistent cache hits in this process",
+                   lambda: persistent_cache.hits)
+    registry.gauge("classifier_persistent_cache_misses", "Persistent cache misses in this process",
+                   lambda: persistent_cache.misses)
+    registry.gauge("classifier_persistent_cache_errors", "Persistent cache reads or writes that failed",
+                   lambda: persistent_cache.errors)
+    registry.gauge("classifier_persistent_cache_dropped", "Persistent cache writes dropped on a full write queue",
+                   lambda: persistent_cache.dropped)
+if similarity_cache is not None:
+    registry.gauge("classifier_similarity_cache_hit_ratio", "Similarity cache hits / lookups",
+                   lambda: similarity_cache.stats()["hit_ratio"])
+    registry.gauge("classifier_similarity_cache_hits", "Approximate results served by the similarity cache",
+                   lambda: similarity_cache.hits)
+    registry.gauge("classifier_similarity_cache_misses", "Similarity cache misses", lambda: similarity_cache.misses)
+    registry.gauge("classifier_similarity_cache_entries", "Similarity cache entries", lambda: len(similarity_cache))
+if admission is not None:
+    registry.gauge("classifier_admission_in_flight", "Admitted /classify requests waiting or running",
+                   lambda: admission.in_flight)
+    registry.gauge("classifier_admission_predicted_wait_seconds", "Predicted latency of the next admitted request",
+                   lambda: admission.predicted_seconds(admission.in_flight + 1))
+    registry.gauge("classifier_admission_shed_queue_full", "Requests shed because too many were in flight",
+                   lambda: admission.shed["queue_full"])
+    registry.gauge("classifier_admission_shed_deadline", "Requests shed because they could not meet their deadline",
+                   lambda: admission.shed["deadline"])
+    registry.gauge("classifier_admission_shed_timeout", "Admitted requests shed when their deadline passed",
+                   lambda: admission.shed["timeout"])
+    registry.gauge("classifier_admission_degraded", "Shed requests answered with the default settings",
+                   lambda: admission.degraded)
+registry.gauge("classifier_stream_active", "Open /classify/stream connections", lambda: stream_gate.streams)
+registry.gauge("classifier_stream_in_flight", "Streamed prompts classifying or waiting to be sent",
+               lambda: stream_gate.in_flight)
+registry.gauge("classifier_stream_throttled", "Times a stream waited for a free in-flight slot",
+               lambda: stream_gate.throttled)
+if in_flight is not None:
+    registry.gauge("classifier_coalesce_in_flight", "Distinct prompts being classified", lambda: len(in_flight))
+    registry.gauge("classifier_coalesce_calls", "Classifications started by /classify", lambda: in_flight.calls)
+    registry.gauge("classifier_coalesce_coalesced", "Requests that joined an in-flight classification",
+                   lambda: in_flight.coalesced)
+    registry.gauge("classifier_coalesce_errors", "Shared classifications that raised", lambda: in_flight.errors)
+    registry.gauge("classifier_coalesce_cancelled", "Requests cancelled while waiting",
+                   lambda: in_flight.cancelled)
 
 
 # --- Helper functions ---
-def get_default_settings():
-    fallback = next(iter(CATEGORY_MAPPING.values()), {})
-    return {
-        "temperature": fallback.get("temperature", 0.7),
-        "reasoning_effort": fallback.get("reasoning_effort", "medium"),
-        "web": fallback.get("web", "optional"),
-        "verbosity": fallback.get("verbosity", "balanced")
-    }
+def get_default_settings(label_set=None):
+    return (label_set or label_registry.current).settings_table.lookup(0)
 
 
-def map_to_settings(filtered_labels, filtered_scores):
-    """Merge LLM settings for filtered labels only"""
-    logger.info("=== Step: Merging settings from filtered labels ===")
-    logger.info(f"Filtered labels: {filtered_labels}")
-    logger.info(f"Scores: {filtered_scores}")
+def degraded_result():
+    """Answer for a shed request in degrade mode: no categories, the default settings"""
+    label_set = label_registry.current
+    settings = dict(get_default_settings(label_set))
+    settings["config_version"] = label_set.version
+    settings["degraded"] = True
+    return [], settings
 
-    keys = [LABEL_MAP[lbl] for lbl in filtered_labels if lbl in LABEL_MAP]
-    logger.info(f"Category keys: {keys}")
 
-    try:
-        temps = [CATEGORY_MAPPING[k]["temperature"] for k in keys]
-        re_values = [RE_INDEX[CATEGORY_MAPPING[k]["reasoning_effort"]] for k in keys]
-        web_values = [WEB_INDEX[CATEGORY_MAPPING[k]["web"]] for k in keys]
-        verb_values = [VERBOSITY_INDEX[CATEGORY_MAPPING[k]["verbosity"]] for k in keys]
-
-        merged = {
-            "temperature": min(temps),
-            "reasoning_effort": RE_ORDER[max(re_values)],
-            "web": WEB_ORDER[max(web_values)],
-            "verbosity": VERBOSITY_ORDER[max(verb_values)]
-        }
-    except KeyError as e:
-        logger.warning(f"Missing category mapping for key: {e}. Using default settings.")
-        merged = get_default_settings()
-
-    logger.info(f"=== Final merged settings ===\n{merged}")
+def is_cached(prompt: str, high_gap=0.15, ratio=0.8, min_threshold=0.2):
+    """Whether the result cache can answer the prompt (without counting a lookup)"""
+    return result_cache is not None and cache_key(
+        label_registry.current, prompt, high_gap, ratio, min_threshold
+    ) in result_cache
+
+
+def map_to_settings(filtered_labels, filtered_scores, label_set=None):
+    """Merge LLM settings for filtered labels only"""
+    label_set = label_set or label_registry.current
+    details = details_enabled()
+    if details:
+        logger.info("=== Step: Merging settings from filtered labels ===")
+        logger.info("Filtered labels: %s", filtered_labels)
+        logger.info("Scores: %s", filtered_scores)
+        logger.info("Category keys: %s", [label_set.label_map[lbl] for lbl in filtered_labels])
+
+    merged = label_set.settings_table.lookup(sum(1 << label_set.label_index[lbl] for lbl in filtered_labels))
+    if details:
+        logger.info("=== Final merged settings ===\n%s", merged)
     return merged
 
 
-def update_latency_log(prompt, latency):
-    try:
-        data = {"queries": [], "average_latency": 0}
-        if LATENCY_FILE.exists():
-            with LATENCY_FILE.open("r") as f:
-                data = json.load(f)
+def select_labels(scores, high_gap=0.15, ratio=0.8, min_threshold=0.2):
+    """Dual-threshold selection over an (N, L) score matrix, returns a boolean mask"""
+    rows = np.arange(scores.shape[0])
+    top_idx = scores.argmax(axis=1)
+    top_score = scores[rows, top_idx]
+    if scores.shape[1] > 1:
+        second_score = np.partition(scores, -2, axis=1)[:, -2]
+    else:
+        second_score = np.zeros_like(top_score)
+    delta = top_score - second_score
+
+    threshold = np.maximum(min_threshold, top_score * ratio)
+    mask = scores >= threshold[:, None]
 
-        data["queries"].append({"prompt": prompt, "latency": latency})
-        avg_latency = sum(q["latency"] for q in data["queries"]) / len(data["queries"])
-        data["average_latency"] = avg_latency
+    # Dominant top label, or nothing cleared the threshold: keep only the top label
+    top_only = (delta > high_gap) | ~mask.any(axis=1)
+    mask[top_only] = False
+    mask[rows[top_only], top_idx[top_only]] = True
+    return mask
 
-        with LATENCY_FILE.open("w") as f:
-            json.dump(data, f, indent=2)
 
+def merge_settings(mask, label_set=None):
+    """Vectorized map_to_settings: merge settings for every row of a label mask"""
+    return (label_set or label_registry.current).settings_table.lookup_mask(mask)
+
+
+def update_latency_log(prompt, latency):
+    """Record one request latency in the in-memory latency store"""
+    try:
+        avg_latency = latency_store.record(latency)
         return latency, avg_latency
     except Exception as e:
-        logger.warning(f"Failed to update latency log: {e}")
+        logger.warning("Failed to update latency log: %s", e)
         return latency, latency
 
 
 def log_selected_labels(labels, scores, msg="Selected labels"):
+    if not details_enabled():
+        return
     for lbl, sc in zip(labels, scores):
-        logger.info(f"{msg}: {lbl} ({sc:.3f})")
+        logger.info("%s: %s (%.3f)", msg, lbl, sc)
 
 
 # --- Main classification function ---
 def classify_prompt(prompt: str, high_gap=0.15, ratio=0.8, min_threshold=0.2):
-    logger.info(f"\nInput Prompt: {prompt}")
+    request_start = t = perf_counter_ns()
+    if sample_details():
+        logger.info("\nInput Prompt: %s", prompt)
     start_time = time.time()
-
+    # One label set version for the whole request, even if a reload swaps it meanwhile
+    label_set = label_registry.current
+
+    key = cache_key(label_set, prompt, high_gap, ratio, min_threshold)
+    cached = result_cache.get(key) if result_cache is not None else None
+    t = observe_stage("cache_lookup", t)
+    if cached is None and persistent_cache is not None:
+        cached = persistent_cache.get(key)
+        if cached is not None and result_cache is not None:
+            result_cache.put(key, _copy_result(*cached))
+        t = observe_stage("persistent_lookup", t)
+    if cached is not None:
+        filtered_categories, settings = _copy_result(*cached)
+        latency = round(time.time() - start_time, 3)
+        _, avg_latency = update_latency_log(prompt, latency)
+        settings["latency_seconds"] = latency
+        logger.info("Cache hit. Latency: %ss, Avg latency: %ss", latency, avg_latency)
+        observe_stage("total", request_start)
+        return filtered_categories, settings
+
+    signature = None
+    if similarity_cache is not None:
+        # Results are only shared between requests with the same selection thresholds
+        group = (label_set.version, high_gap, ratio, min_threshold)
+        signature = similarity_cache.signature(prompt)
+        near = similarity_cache.get(signature, group)
+        t = observe_stage("similarity_lookup", t)
+        if near is not None:
+            similarity, cached = near
+            filtered_categories, settings = _copy_result(*cached)
+            settings["approximate"] = {"similarity": similarity}
+            latency = round(time.time() - start_time, 3)
+            _, avg_latency = update_latency_log(prompt, latency)
+            settings["latency_seconds"] = latency
+            logger.info("Approximate cache hit (similarity %.2f). Latency: %ss, Avg latency: %ss",
+                        similarity, latency, avg_latency)
+            observe_stage("total", request_start)
+            return filtered_categories, settings
+
+    truncation = None
     try:
-        result = classifier(prompt, candidate_labels, multi_label=True)
-        labels_out, scores_out = result["labels"], result["scores"]
+        engine = get_engine(label_set)
+        bucket, truncation = prompt_length_info(engine, engine.token_lengths([prompt])[0])
+        t = observe_stage("length", t)
+        if batcher is not None:
+            scores_out = batcher.submit((prompt, label_set), bucket=(label_set.version, bucket)).result()
+        else:
+            scores_out = run_classifier([prompt], label_set)[0]
+        labels_out = label_set.candidate_labels
+    except QueueFullError:
+        # Overload, not a result: the caller answers it like a shed request
+        raise
     except Exception as e:
-        logger.error(f"Classifier error: {e}")
+        logger.error("Classifier error: %s", e)
         labels_out, scores_out = [], []
+    t = observe_stage("inference", t)
+    if truncation is not None:
+        logger.info("Prompt truncated (%s): %s -> %s tokens",
+                    truncation["policy"], truncation["prompt_tokens"], truncation["kept_tokens"])
 
     latency = round(time.time() - start_time, 3)
     if not labels_out:
         logger.warning("No classifier output. Returning defaults.")
-        settings = get_default_settings()
+        settings = get_default_settings(label_set)
+        settings["config_version"] = label_set.version
+        settings["degraded"] = True
         settings["latency_seconds"] = latency
+        observe_stage("total", request_start)
         return [], settings
 
     # --- Dual-threshold selection ---
-    sorted_pairs = sorted(zip(labels_out, scores_out), key=lambda x: x[1], reverse=True)
-    top_label, top_score = sorted_pairs[0]
-    second_score = sorted_pairs[1][1] if len(sorted_pairs) > 1 else 0
-    delta = top_score - second_score
-
-    if delta > high_gap:
-        filtered = [(top_label, top_score)]
-    else:
-        threshold = max(min_threshold, top_score * ratio)
-        filtered = [(lbl, sc) for lbl, sc in sorted_pairs if sc >= threshold]
-
-    if not filtered:
-        filtered = [(top_label, top_score)]
+    sorted_pairs = sorted(zip(labels_out, map(float, scores_out)), key=lambda x: x[1], reverse=True)
+    mask = select_labels(np.array([[sc for _, sc in sorted_pairs]]), high_gap, ratio, min_threshold)[0]
+    filtered = [pair for pair, keep in zip(sorted_pairs, mask) if keep]
+    t = observe_stage("selection", t)
 
     filtered_labels, filtered_scores = zip(*filtered)
     log_selected_labels(filtered_labels, filtered_scores)
+    t = observe_stage("logging", t)
 
     # --- Build output ---
-    filtered_categories = [{"name": LABEL_MAP[label], "confidence": score}
+    filtered_categories = [{"name": label_set.label_map[label], "confidence": score}
                            for label, score in filtered]
 
-    settings = map_to_settings(filtered_labels, filtered_scores)
+    settings = map_to_settings(filtered_labels, filtered_scores, label_set)
+    settings["config_version"] = label_set.version
+    if truncation is not None:
+        settings["truncation"] = truncation
+    t = observe_stage("settings_merge", t)
+    if result_cache is not None:
+        result_cache.put(key, _copy_result(filtered_categories, settings))
+        t = observe_stage("cache_store", t)
+    if persistent_cache is not None:
+        persistent_cache.put(key, (filtered_categories, settings), label_set.version)
+        t = observe_stage("persistent_store", t)
+    # A truncated prompt's result only reflects part of its text, so it is not shared with similar prompts
+    if signature is not None and truncation is None:
+        similarity_cache.put(signature, _copy_result(filtered_categories, settings), group)
     _, avg_latency = update_latency_log(prompt, latency)
     settings["latency_seconds"] = latency
+    t = observe_stage("latency_log", t)
 
-    logger.info(f"Latency: {latency}s, Avg latency: {avg_latency}s")
+    logger.info("Latency: %ss, Avg latency: %ss", latency, avg_latency)
+    observe_stage("total", request_start)
     return filtered_categories, settings
 
+
+def classify_prompts(prompts, high_gap=0.15, ratio=0.8, min_threshold=0.2):
+    """Classify many prompts at once, returning (categories, settings) pairs in input order"""
+    if not prompts:
+        return []
+
+    # One sampling decision for the whole batch, not the one left on this thread
+    if sample_details():
+        logger.info("\nInput batch: %d prompts", len(prompts))
+    start_time = time.time()
+    label_set = label_registry.current
+    results = [None] * len(prompts)
+    keys = [cache_key(label_set, p, high_gap, ratio, min_threshold) for p in prompts]
+
+    # Only prompts that are not cached go through the model
+    misses = []
+    for i, key in enumerate(keys):
+        cached = result_cache.get(key) if result_cache is not None else None
+        if cached is None and persistent_cache is not None:
+            cached = persistent_cache.get(key)
+            if cached is not None and result_cache is not None:
+                result_cache.put(key, _copy_result(*cached))
+        if cached is not None:
+            results[i] = _copy_result(*cached)
+        else:
+            misses.append(i)
+
+    if misses:
+        engine = get_engine(label_set)
+        miss_prompts = [prompts[i] for i in misses]
+        lengths = engine.token_lengths(miss_prompts)
+        scores = score_prompts(miss_prompts, lengths=lengths, label_set=label_set)
+        mask = select_labels(scores, high_gap, ratio, min_threshold)
+        merged = merge_settings(mask, label_set)
+        for row, prompt_tokens in enumerate(lengths):
+            merged[row]["config_version"] = label_set.version
+            _, truncation = prompt_length_info(engine, prompt_tokens)
+            if truncation is not None:
+                merged[row]["truncation"] = truncation
+
+        # Categories ordered by descending confidence, as in classify_prompt
+        order = np.argsort(-scores, axis=1, kind="stable")
+        for row, i in enumerate(misses):
+            selected = [j for j in order[row] if mask[row, j]]
+            log_selected_labels([label_set.candidate_labels[j] for j in selected], scores[row, selected],
+                                msg=f"Selected labels of prompt {i}")
+            categories = [{"name": label_set.labels[j], "confidence": float(scores[row, j])} for j in selected]
+            results[i] = (categories, merged[row])
+            if result_cache is not None:
+                result_cache.put(keys[i], _copy_result(categories, merged[row]))
+        if persistent_cache is not None:
+            persistent_cache.put_many([(keys[i], results[i]) for i in misses], label_set.version)
+
+    logger.info("Classified batch of %d prompts (%d uncached) in %.3fs",
+                len(prompts), len(misses), time.time() - start_time)
+    return results
+
+
+async def classify_prompt_shared(prompt: str, high_gap=0.15, ratio=0.8, min_threshold=0.2):
+    """Await classify_prompt on the inference pool, sharing one call between identical concurrent requests"""
+    if in_flight is None:
+        return await run_inference(classify_prompt, prompt, high_gap, ratio, min_threshold)
+    key = cache_key(label_registry.current, prompt, high_gap, ratio, min_threshold)
+    result = await in_flight.run(
+        key, lambda: run_inference(classify_prompt, prompt, high_gap, ratio, min_threshold)
+    )
+    # Every waiter gets its own copy of the shared result
+    return _copy_result(*result)
@@ -0,0 +1,88 @@
+import numpy as np
+
+# --- Order of the enum settings, lowest first ---
+RE_ORDER = ["minimal", "medium", "high", "maximal"]
+WEB_ORDER = ["disabled", "optional", "mandatory"]
+VERBOSITY_ORDER = ["concise", "balanced", "verbose"]
+
+RE_INDEX = {v: i for i, v in enumerate(RE_ORDER)}
+WEB_INDEX = {v: i for i, v in enumerate(WEB_ORDER)}
+VERBOSITY_INDEX = {v: i for i, v in enumerate(VERBOSITY_ORDER)}
+
+ENUM_FIELDS = {"reasoning_effort": RE_INDEX, "web": WEB_INDEX, "verbosity": VERBOSITY_INDEX}
+
+# 2 ** MAX_LABELS entries
+MAX_LABELS = 16
+
+
+def validate_mapping(category_mapping, categories):
+    """Raise ValueError listing every category that is missing or has an invalid setting"""
+    problems = []
+    for category in categories:
+        entry = category_mapping.get(category)
+        if not isinstance(entry, dict):
+            problems.append(f"{category}: missing from the mapping")
+            continue
+        temperature = entry.get("temperature")
+        if isinstance(temperature, bool) or not isinstance(temperature, (int, float)):
+            problems.append(f"{category}.temperature: expected a number, got {temperature!r}")
+        for field, index in ENUM_FIELDS.items():
+            if entry.get(field) not in index:
+                problems.append(f"{category}.{field}: {entry.get(field)!r} is not one of {list(index)}")
+    if problems:
+        raise ValueError("Invalid category mapping:\n  " + "\n  ".join(problems))
+
+
+class SettingsTable:
+    """Merged settings for every subset of labels, indexed by a label bitmask.
+
+    Bit ``i`` of the index stands for ``categories[i]``. Each entry holds the
+    merge of the selected categories' settings: the minimum temperature and
+    the highest reasoning effort, web use and verbosity. Index 0 (nothing
+    selected) holds the first category's settings, the service default.
+    The mapping is validated when the table is built, so a lookup cannot
+    fail.
+    """
+
+    def __init__(self, category_mapping, categories):
+        if len(categories) > MAX_LABELS:
+            raise ValueError(f"A settings table supports at most {MAX_LABELS} labels, got {len(categories)}")
+        validate_mapping(category_mapping, categories)
+        self.categories = list(categories)
+        self.bits = 1 << np.arange(len(categories), dtype=np.int64)
+
+        size = 1 << len(categories)
+        temperature = np.empty(size)
+        levels = {field: np.empty(size, dtype=np.int64) for field in ENUM_FIELDS}
+
+        default = next(iter(category_mapping.values()))
+        temperature[0] = default["temperature"]
+        for field, index in ENUM_FIELDS.items():
+            levels[field][0] = index[default[field]]
+
+        # Every subset is one of its labels merged with the (smaller) rest of it
+        for mask in range(1, size):
+            low = mask & -mask
+            entry = category_mapping[self.categories[low.bit_length() - 1]]
+            rest = mask ^ low
+            temperature[mask] = entry["temperature"] if not rest else min(temperature[rest], entry["temperature"])
+            for field, index in ENUM_FIELDS.items():
+                level = index[entry[field]]
+                levels[field][mask] = level if not rest else max(levels[field][rest], level)
+
+        self.settings = np.empty(size, dtype=object)
+        for mask in range(size):
+            self.settings[mask] = {
+                "temperature": float(temperature[mask]),
+                "reasoning_effort": RE_ORDER[levels["reasoning_effort"][mask]],
+                "web": WEB_ORDER[levels["web"][mask]],
+                "verbosity": VERBOSITY_ORDER[levels["verbosity"][mask]]
+            }
+
+    def lookup(self, bitmask):
+        """A copy of the merged settings for one label bitmask"""
+        return dict(self.settings[bitmask])
+
+    def lookup_mask(self, mask):
+        """Merged settings for every row of an (N, L) boolean label mask"""
+        return [dict(s) for s in self.settings[mask @ self.bits]]
@@ -0,0 +1,188 @@
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from itertools import count
+
+import numpy as np
+
+from .cache import normalize_prompt
+
+# MinHash permutations h(x) = (a * x + b) mod p over 32-bit shingle hashes
+MERSENNE_PRIME = (1 << 31) - 1
+
+
+# Spans that vary between otherwise identical requests ("translate 'hello' to
+# french" vs. "translate 'thanks' to french") are replaced by placeholders
+QUOTED = re.compile(r"""(?<!\w)(["'`])[^\n]+?\1(?!\w)|“[^”\n]*”|‘[^’\n]*’""")
+NUMBER = re.compile(r"\d+(?:[.,:/]\d+)*")
+# A capitalized word inside a sentence, e.g. a place or a person
+NAME = re.compile(r"(?<=[^\s.!?:]\s)[A-Z][a-z]+\b")
+TOKEN = re.compile(r"@?\w+")
+
+
+def mask_prompt(prompt):
+    """The prompt with quoted spans, numbers and names replaced by @quote, @number and @name"""
+    prompt = QUOTED.sub(" @quote ", prompt)
+    prompt = NUMBER.sub(" @number ", prompt)
+    return NAME.sub("@name", prompt)
+
+
+def shingles(text, size=2):
+    """Word n-grams of 1 to ``size`` words of a normalized prompt (the whole prompt if it has no words)"""
+    words = TOKEN.findall(text)
+    if not words:
+        return {text}
+    return {" ".join(words[i:i + n]) for n in range(1, size + 1) for i in range(len(words) - n + 1)}
+
+
+class MinHasher:
+    """MinHash signatures: the fraction of equal positions estimates Jaccard similarity"""
+
+    def __init__(self, num_perm=64, seed=0):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_set):
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingle_set),
+                             dtype=np.uint64, count=len(shingle_set))
+        # a < 2**31 and hashes < 2**32, so the products fit in 64 bits
+        return ((hashes[:, None] * self.a + self.b) % MERSENNE_PRIME).min(axis=0).astype(np.uint32)
+
+
+def similarity(sig_a, sig_b):
+    return float(np.mean(sig_a == sig_b))
+
+
+class SimilarityCache:
+    """Near-duplicate result cache: MinHash signatures in a banded LSH index.
+
+    Prompts are compared as sets of word n-grams after masking quoted spans,
+    numbers and names, so requests that only differ in those are identical
+    and rewordings of a few words stay similar. A signature of
+    ``bands * rows`` values is cut into ``bands`` bands; two prompts become
+    candidates when any band matches exactly, which happens with high
+    probability above a Jaccard similarity of roughly
+    ``(1 / bands) ** (1 / rows)``. Candidates are then checked against
+    ``threshold`` with the signature estimate of their similarity and the
+    most similar one is returned. Results are only shared between lookups
+    with the same selection thresholds.
+
+    Entries are evicted least recently used beyond ``max_entries`` and, like
+    ResultCache, dropped as a whole when the config version changes.
+    """
+
+    def __init__(self, threshold=0.7, max_entries=10000, num_perm=128, bands=32, shingle_size=2,
+                 ttl_seconds=3600.0, nfkc=True):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.ttl = ttl_seconds
+        self.nfkc = nfkc
+        self.hasher = MinHasher(num_perm)
+
+        self._entries = OrderedDict()  # id -> (expires_at, group, signature, band keys, value)
+        self._buckets = {}  # (group, band, band bytes) -> set of ids
+        self._ids = count()
+        self._lock = threading.Lock()
+        self._version = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def signature(self, prompt):
+        return self.hasher.signature(shingles(normalize_prompt(mask_prompt(prompt), self.nfkc), self.shingle_size))
+
+    def _band_keys(self, group, signature):
+        return [(group, band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+                for band in range(self.bands)]
+
+    def ensure_version(self, version):
+        """Drop every entry when labels or the settings mapping changed"""
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._buckets.clear()
+                self._version = version
+
+    def get(self, signature, group=None):
+        """Return (similarity, value) of the most similar entry above the threshold, or None"""
+        keys = self._band_keys(group, signature)
+        with self._lock:
+            candidates = set()
+            for key in keys:
+                candidates.update(self._buckets.get(key, ()))
+
+            now = time.monotonic()
+            best_id, best = None, self.threshold
+            for entry_id in candidates:
+                expires_at, _, entry_signature, _, _ = self._entries[entry_id]
+                if expires_at is not None and expires_at < now:
+                    self._remove(entry_id)
+                    continue
+                score = similarity(signature, entry_signature)
+                if score >= best:
+                    best_id, best = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return best, self._entries[best_id][4]
+
+    def put(self, signature, value, group=None):
+        keys = self._band_keys(group, signature)
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = (expires_at, group, signature, keys, value)
+            for key in keys:
+                self._buckets.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, entry_id):
+        _, _, _, keys, _ = self._entries.pop(entry_id)
+        for key in keys:
+            bucket = self._buckets[key]
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._buckets[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "version": self._version,
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "bands": self.bands,
+            "rows": self.rows,
+            "shingle_size": self.shingle_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,140 @@
+import asyncio
+
+from .batching import QueueFullError
+from .logger import get_logger
+
+logger = get_logger("script:stream")
+
+# A line without a newline after this many bytes ends the stream
+MAX_LINE_BYTES = 1 << 20
+
+
+async def ndjson_lines(chunks, max_line_bytes=MAX_LINE_BYTES):
+    """Split an async stream of byte chunks into non-empty lines"""
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+        if len(buffer) > max_line_bytes:
+            raise ValueError(f"Line longer than {max_line_bytes} bytes")
+    if buffer.strip():
+        yield buffer
+
+
+class StreamGate:
+    """Process-wide bound on streamed prompts in flight, shared by all streams.
+
+    A stream takes a slot before it starts classifying a prompt and gives it
+    back once the result is handed to the client. While all slots are taken,
+    streams stop reading their request bodies. Must be used from the event
+    loop thread.
+    """
+
+    def __init__(self, max_in_flight):
+        self.max_in_flight = max_in_flight
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+        self.streams = 0
+        self.in_flight = 0
+        self.prompts = 0
+        self.errors = 0
+        self.throttled = 0
+
+    async def acquire(self):
+        if self._slots.locked():
+            self.throttled += 1
+        await self._slots.acquire()
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        return {
+            "active_streams": self.streams,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "prompts": self.prompts,
+            "errors": self.errors,
+            "throttled": self.throttled,
+        }
+
+
+async def classify_stream(items, classify, gate, window):
+    """Classify an async stream of (request_id, prompt, error) items as they arrive.
+
+    Yields (request_id, result, error) in completion order, so a slow prompt
+    does not hold back the ones after it. Items that arrive with an error
+    (e.g. a line that failed to parse) are passed through without being
+    classified. At most ``window`` prompts of this stream, and the gate's
+    limit across all streams, are in flight at once; a prompt counts until
+    its result has been yielded, so a client that stops reading responses
+    also stops the intake.
+    """
+    done = asyncio.Queue()
+    slots = asyncio.Semaphore(window)
+    tasks = set()
+    end = object()
+
+    async def run(request_id, prompt):
+        try:
+            result, error = await classify(prompt), None
+        except QueueFullError:
+            result, error = None, "Overloaded (queue_full)"
+        except Exception as e:
+            logger.error("Stream item %s failed: %s", request_id, e)
+            result, error = None, "Failed to classify prompt"
+        done.put_nowait((request_id, result, error, True))
+
+    def finished(task):
+        tasks.discard(task)
+        # A cancelled prompt never reaches the queue, so its slot is returned here
+        if task.cancelled():
+            gate.release()
+
+    async def read():
+        try:
+            async for request_id, prompt, error in items:
+                if error is not None:
+                    done.put_nowait((request_id, None, error, False))
+                    continue
+                await slots.acquire()
+                await gate.acquire()
+                gate.prompts += 1
+                task = asyncio.create_task(run(request_id, prompt))
+                tasks.add(task)
+                task.add_done_callback(finished)
+        except Exception as e:
+            done.put_nowait((None, None, f"Stream aborted: {e}", False))
+        if tasks:
+            await asyncio.wait(tasks)
+        done.put_nowait(end)
+
+    gate.streams += 1
+    reader = asyncio.create_task(read())
+    try:
+        while (item := await done.get()) is not end:
+            request_id, result, error, holds_slot = item
+            if error is not None:
+                gate.errors += 1
+            try:
+                yield request_id, result, error
+            finally:
+                if holds_slot:
+                    slots.release()
+                    gate.release()
+    finally:
+        gate.streams -= 1
+        # Client gone or stream finished: stop reading and drop unsent results
+        reader.cancel()
+        for task in list(tasks):
+            task.cancel()
+        while not done.empty():
+            item = done.get_nowait()
+            if item is not end and item[3]:
+                gate.release()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,16 +1,88 @@
-import os
+"""Synthetic human-like queries per category, generated with a chat-completion model.
+
+The generator runs every category in parallel on asyncio: at most
+--concurrency requests are in flight, --rate bounds the requests per second
+across all of them, and failed requests are retried with exponential backoff
+(honouring Retry-After). Each category is appended to its own
+<category>_synthetic_data.jsonl file in --output-dir, one
+{"example", "category"} record per line, and checkpointed to
+<category>_synthetic_data.checkpoint after every batch. Running the same
+command again resumes each category from its checkpoint; anything written
+after it is discarded first. Examples already generated for a category are
+not written again. Use --restart to start over.
+
+The client is pluggable: --client openai talks to the OpenAI API or any
+compatible server (--base-url), --client stub answers offline with made-up
+examples, to try the pipeline or measure it without an API key.
+
+Usage:
+    python -m app.src.service.syntetic_data_generation --output-dir synthetic_data/ --per-category 500
+    python -m app.src.service.syntetic_data_generation --output-dir /tmp/synthetic --client stub --categories Coding Debugging
+"""
+import argparse
+import asyncio
 import json
+import os
+import random
+import re
+import time
+from pathlib import Path
+
 from openai import OpenAI
 from dotenv import load_dotenv
 
+from .config import SERVICE_DIR
+from .logger import get_logger
+
 load_dotenv()
 
+logger = get_logger("script:synthetic_data")
+
+DEFAULT_MODEL = "gpt-4.1-mini"
+SYSTEM_PROMPT = "You are an expert synthetic data generator for human-like queries."
+
+# Prompt builder of each category
+PROMPT_BUILDERS = {
+    "Coding": "create_prompt",
+    "Debugging": "create_debugging_prompt",
+    "Creative_Writing": "create_creative_writing_prompt",
+    "Factual_QA": "create_factual_qa_prompt",
+    "Data_Analysis": "create_data_analysis_prompt",
+    "Planning_Itinerary": "create_travel_prompt",
+    "Sensitive_Medical_Legal": "create_medical_prompt",
+    "Summarization": "create_summarization_prompt",
+    "Translation": "create_translation_prompt",
+    "ChitChat": "create_chitchat_prompt",
+}
+
+# Client errors that the same request would get again
+NON_RETRYABLE_STATUS = {400, 401, 403, 404, 422}
+
+
 class SyntheticUserDataGenerator:
-    def __init__(self):
+    def __init__(self, client=None):
         self.api_key = os.environ.get("OPENAI_API_KEY")
-        self.client = OpenAI(api_key=self.api_key)
-        self.model = "gpt-4.1-mini"
-        self.temperature = 0.8  
+        # Created on first use, so the prompts can be built without an API key
+        self._client = client
+        self.model = DEFAULT_MODEL
+        self.temperature = 0.8
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = OpenAI(api_key=self.api_key)
+        return self._client
+
+    def build_prompt(self, category, num_examples=5):
+        if category not in PROMPT_BUILDERS:
+            raise ValueError(f"No prompt for category '{category}', expected one of: {', '.join(PROMPT_BUILDERS)}")
+        return getattr(self, PROMPT_BUILDERS[category])(category, num_examples)
+
+    def messages(self, category, num_examples=5):
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": self.build_prompt(category, num_examples)},
+        ]
      
     def create_prompt(self, category, num_examples=5):
         prompt = f"""
@@ -350,13 +422,138 @@ class SyntheticUserDataGenerator:
         """
         return prompt
     
-    def generate_examples(self, category, num_examples=10):
-        prompt = self.create_debugging_prompt(category, num_examples)
+    def create_summarization_prompt(self, category="Summarization", num_examples=5):
+        prompt = f"""
+            You are a data generation assistant. Your task is to generate {num_examples} human-like user queries for the category "{category}".
 
-        messages = [
-            {"role": "system", "content": "You are an expert synthetic data generator for human-like queries."},
-            {"role": "user", "content": prompt},
-        ]
+            These queries must look like real inputs typed into a search bar or chatbot, including:
+            - Short keyword-style fragments (e.g., "tldr this article")
+            - Natural request-style queries (e.g., "can you summarize this email in 3 bullet points")
+            - Occasional typos or missing punctuation
+            - Casual, human phrasing
+
+            The "{category}" category includes any query where the user wants **a shorter version of a given text**:
+            - Pasted articles, emails, reports, meeting notes, chat logs or papers to condense
+            - Requests for bullet points, a TL;DR, key takeaways, an abstract or a one-line gist
+            - Length or format constraints (e.g., "in 50 words", "for a 5 year old")
+
+            Do NOT generate:
+            - Translation requests (this is Translation)
+            - Questions about facts that are not about a provided text (this is Factual_QA)
+            - Analysis of numbers or datasets (this is Data_Analysis)
+            - Requests to write new stories or poems (this is Creative_Writing)
+
+            Output format (strict):
+            [
+                {{"example": "user query here", "category": "{category}"}}
+            ]
+
+            Requirements:
+            1. Every example must be unique and clearly fall under "{category}".
+            2. At least 40% of the queries should include the text to summarize (a few sentences pasted inline).
+            3. Mix short fragments and full sentences.
+            4. Include a query that might have a slight typo or casual phrasing.
+            5. Keep the category field exactly equal to "{category}".
+
+            Here are sample examples for style guidance (do NOT repeat them):
+            [
+                {{"example": "tldr: The city council voted on Tuesday to extend the bike lane network by 40 km, funded by a parking fee increase...", "category": "Summarization"}},
+                {{"example": "summarize this email in 2 sentences", "category": "Summarization"}},
+                {{"example": "key points of the meeting notes below pls", "category": "Summarization"}},
+                {{"example": "give me a short abstract for my paper on solar panel efficency", "category": "Summarization"}},
+                {{"example": "condense this into 3 bullet points: Our Q3 revenue grew 12% while costs stayed flat...", "category": "Summarization"}}
+            ]
+        """
+        return prompt
+
+    def create_translation_prompt(self, category="Translation", num_examples=5):
+        prompt = f"""
+            You are a data generation assistant. Your task is to generate {num_examples} human-like user queries for the category "{category}".
+
+            These queries must look like real inputs typed into a search bar or chatbot, including:
+            - Short keyword-style fragments (e.g., "thank you in japanese")
+            - Natural request-style queries (e.g., "translate this paragraph into german")
+            - Occasional typos or missing punctuation
+            - Casual, human phrasing
+
+            The "{category}" category includes any query where the user wants **text rendered in another language**:
+            - Single words, phrases, sentences or whole paragraphs
+            - Many language pairs, not only English to Spanish or French
+            - Tone or register constraints (e.g., "formal", "for a business email")
+            - Text in a non-English language to translate into English
+
+            Do NOT generate:
+            - Grammar explanations or language-learning questions
+            - Summaries of text (this is Summarization)
+            - Translating code between programming languages (this is Coding)
+
+            Output format (strict):
+            [
+                {{"example": "user query here", "category": "{category}"}}
+            ]
+
+            Requirements:
+            1. Every example must be unique and clearly fall under "{category}".
+            2. Use at least 8 different target languages across the examples.
+            3. Include the text to translate in most queries, sometimes in quotes.
+            4. Include a query that might have a slight typo or casual phrasing.
+            5. Keep the category field exactly equal to "{category}".
+
+            Here are sample examples for style guidance (do NOT repeat them):
+            [
+                {{"example": "translate 'where is the train station' to italian", "category": "Translation"}},
+                {{"example": "how do you say good luck in korean", "category": "Translation"}},
+                {{"example": "what does 'je ne sais quoi' mean in english", "category": "Translation"}},
+                {{"example": "translate this to formal german: we will send the invoice next week", "category": "Translation"}},
+                {{"example": "portugese for i miss you", "category": "Translation"}}
+            ]
+        """
+        return prompt
+
+    def create_chitchat_prompt(self, category="ChitChat", num_examples=5):
+        prompt = f"""
+            You are a data generation assistant. Your task is to generate {num_examples} human-like user queries for the category "{category}".
+
+            These queries must look like real inputs typed into a chatbot, including:
+            - Greetings and very short messages (e.g., "hey", "good morning!")
+            - Small talk and casual questions to the assistant (e.g., "how's your day going")
+            - Typos, slang, emojis or missing punctuation
+            - Casual, human phrasing
+
+            The "{category}" category includes any message that is **social conversation rather than a task**:
+            - Greetings, goodbyes, thanks and reactions (e.g., "lol nice", "thx that helped")
+            - Questions about the assistant itself (e.g., "are you a robot")
+            - Sharing feelings or everyday life without asking for advice (e.g., "so tired today")
+            - Jokes and banter
+
+            Do NOT generate:
+            - Requests for facts, code, plans, stories or translations
+            - Medical or legal concerns (this is Sensitive_Medical_Legal)
+
+            Output format (strict):
+            [
+                {{"example": "user query here", "category": "{category}"}}
+            ]
+
+            Requirements:
+            1. Every example must be unique and clearly fall under "{category}".
+            2. Mix one- or two-word messages with longer casual sentences.
+            3. Include some typos, slang or emojis.
+            4. Keep the category field exactly equal to "{category}".
+
+            Here are sample examples for style guidance (do NOT repeat them):
+            [
+                {{"example": "hi there", "category": "ChitChat"}},
+                {{"example": "how are you doing today?", "category": "ChitChat"}},
+                {{"example": "ur pretty funny for a bot lol", "category": "ChitChat"}},
+                {{"example": "thanks, have a nice weekend!", "category": "ChitChat"}},
+                {{"example": "ugh mondays am i right", "category": "ChitChat"}}
+            ]
+        """
+        return prompt
+
+    def generate_examples(self, category, num_examples=10):
+        messages = self.messages(category, num_examples)
 
         try:
             response = self.client.chat.completions.create(
@@ -381,7 +578,10 @@ class SyntheticUserDataGenerator:
             raise Exception(f"Failed to generate synthetic data: {str(e)}")
 
 def save_to_json_append(data, filename="synthetic_debugging_data.json"):
-    """Append new data to existing JSON file (or create if it doesn't exist)."""
+    """Append new data to existing JSON file (or create if it doesn't exist).
+
+    Rewrites the whole file on every call; generate_all appends JSONL instead.
+    """
     if os.path.exists(filename):
         with open(filename, "r", encoding="utf-8") as f:
             try:
@@ -406,14 +606,356 @@ def save_to_json_append(data, filename="synthetic_debugging_data.json"):
     print(f"Saved {len(data)} new examples, total {len(existing_data)} examples in {filename}")
 
 
-if __name__ == "__main__":
-    generator = SyntheticUserDataGenerator()
-    category = "Debugging"  # Example category
-    
-    total_examples = 100
-    batch_size = 20
 
-    for _ in range(total_examples // batch_size):
-        print(f" batch generating...")
-        batch = generator.generate_examples(category, num_examples=batch_size)
-        save_to_json_append(batch, filename=f"{category}_synthetic_data.json")
\ No newline at end of file
+# --- Clients ---
+class OpenAIChatClient:
+    """Chat completions from the OpenAI API or a compatible server at ``base_url``"""
+
+    def __init__(self, model=DEFAULT_MODEL, temperature=0.8, max_tokens=2000, base_url=None, api_key=None,
+                 timeout=60.0):
+        from openai import AsyncOpenAI
+
+        # A local server does not check the key, but the client requires one
+        api_key = api_key or os.environ.get("OPENAI_API_KEY") or ("unused" if base_url else None)
+        # Retries are done by the generator, which also paces them with the rate limit
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+
+    async def complete(self, messages):
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            top_p=1,
+            max_tokens=self.max_tokens,
+        )
+        return response.choices[0].message.content
+
+    async def close(self):
+        await self.client.close()
+
+
+class StubChatClient:
+    """Offline client answering with made-up examples after ``latency_ms``; fails ``failure_rate`` of requests"""
+
+    REQUEST = re.compile(r'generate (\d+) \**human-like user queries\** for the category "([^"]+)"')
+
+    def __init__(self, latency_ms=200.0, failure_rate=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+
+    async def complete(self, messages):
+        await asyncio.sleep(self.latency_ms / 1000)
+        if self.random.random() < self.failure_rate:
+            raise ConnectionError("Stub failure")
+        num_examples, category = self.REQUEST.search(messages[-1]["content"]).groups()
+        topic = category.replace("_", " ").lower()
+        return json.dumps([{"example": f"{topic} query {self.random.getrandbits(48):012x}", "category": category}
+                           for _ in range(int(num_examples))])
+
+    async def close(self):
+        pass
+
+
+CLIENTS = {"openai": OpenAIChatClient, "stub": StubChatClient}
+
+
+def parse_examples(content, category):
+    """Records of a model response, with the category of the request; raises ValueError if there are none"""
+    text = content.strip()
+    if text.startswith("```"):
+        # Fenced code block, with or without a language tag
+        text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+    data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get("examples", [data])
+    examples = [
+        {"example": record["example"].strip(), "category": category}
+        for record in data
+        if isinstance(record, dict) and isinstance(record.get("example"), str) and record["example"].strip()
+    ]
+    if not examples:
+        raise ValueError("No examples in the response")
+    return examples
+
+
+# --- Pacing ---
+class RateLimiter:
+    """Spaces acquisitions at least 1 / ``rate`` seconds apart; no limit without a rate"""
+
+    def __init__(self, rate=None):
+        self.interval = 1 / rate if rate else 0.0
+        self.next_slot = 0.0
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        # Reserve the slot before sleeping, so concurrent callers queue up behind it
+        slot = max(now, self.next_slot)
+        self.next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+def retry_after_seconds(error):
+    """The Retry-After of an HTTP error response, if any"""
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+# --- Output ---
+def output_paths(output_dir, category):
+    base = Path(output_dir) / f"{category}_synthetic_data"
+    return base.with_suffix(".jsonl"), base.with_suffix(".checkpoint")
+
+
+class CategoryWriter:
+    """Appends one category's examples to its JSONL file; checkpoints the file size after every batch"""
+
+    def __init__(self, output_dir, category, target, restart=False):
+        self.category = category
+        self.target = target
+        self.path, self.checkpoint_path = output_paths(output_dir, category)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        checkpoint = None
+        if restart:
+            self.checkpoint_path.unlink(missing_ok=True)
+        elif self.checkpoint_path.exists():
+            checkpoint = json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+
+        self.seen = set()
+        self.done = 0
+        self.requests = checkpoint["requests"] if checkpoint else 0
+        if checkpoint:
+            # Drop examples written after the last checkpoint
+            with self.path.open("r+b") as f:
+                f.truncate(checkpoint["output_bytes"])
+            with self.path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self.seen.add(dedup_key(json.loads(line)["example"]))
+                        self.done += 1
+        # Without a checkpoint, an existing file is from a run that never reached one
+        self.file = self.path.open("ab" if checkpoint else "wb")
+
+    @property
+    def remaining(self):
+        return max(0, self.target - self.done)
+
+    def write(self, examples):
+        """Append the examples not generated before, up to the target; returns how many were new"""
+        new = []
+        for record in examples:
+            key = dedup_key(record["example"])
+            if key not in self.seen and len(new) < self.remaining:
+                self.seen.add(key)
+                new.append(record)
+        self.file.write(b"".join(json.dumps(r, ensure_ascii=False).encode("utf-8") + b"\n" for r in new))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.done += len(new)
+        self.requests += 1
+
+        tmp = self.checkpoint_path.with_name(self.checkpoint_path.name + ".tmp")
+        tmp.write_text(json.dumps({
+            "category": self.category,
+            "examples": self.done,
+            "requests": self.requests,
+            "output_bytes": self.file.tell(),
+        }), encoding="utf-8")
+        os.replace(tmp, self.checkpoint_path)
+        return len(new)
+
+    def close(self):
+        self.file.close()
+
+
+def dedup_key(example):
+    return " ".join(example.lower().split())
+
+
+# --- Generation ---
+class AsyncSyntheticDataGenerator:
+    """Generates examples for many categories at once with a bounded number of requests in flight.
+
+    ``concurrency`` workers take batches from whichever category still needs
+    the most examples, counting the ones already requested, so every
+    category progresses in parallel and none is over-requested. A request is
+    tried ``max_retries`` more times after a failure or an unparseable
+    response, with full-jitter exponential backoff from ``backoff_seconds``
+    up to ``max_backoff_seconds``. A category is given up after
+    ``max_stalled`` batches in a row that added nothing new (only duplicates
+    or failures), since more requests would not help.
+    """
+
+    def __init__(self, client, prompts=None, concurrency=8, rate=None, batch_size=20, max_retries=5,
+                 backoff_seconds=1.0, max_backoff_seconds=60.0, max_stalled=5, progress_seconds=10.0):
+        self.client = client
+        self.prompts = prompts or SyntheticUserDataGenerator()
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rate)
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.max_stalled = max_stalled
+        self.progress_seconds = progress_seconds
+
+        self.retries = 0
+        self.failures = 0
+
+    async def request(self, category, num_examples):
+        """One batch of parsed examples, retried with backoff; raises the last error"""
+        messages = self.prompts.messages(category, num_examples)
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            try:
+                return parse_examples(await self.client.complete(messages), category)
+            except Exception as e:
+                if getattr(e, "status_code", None) in NON_RETRYABLE_STATUS or attempt == self.max_retries:
+                    raise
+                delay = retry_after_seconds(e)
+                if delay is None:
+                    delay = random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt))
+                self.retries += 1
+                logger.warning(f"{category}: request failed ({type(e).__name__}: {e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def generate_all(self, writers):
+        """Fill every CategoryWriter up to its target; returns per-category counts of this run"""
+        pending = {w.category: 0 for w in writers}  # examples requested and not answered yet
+        stalled = {w.category: 0 for w in writers}
+        generated = {w.category: 0 for w in writers}
+        changed = asyncio.Condition()
+        start = last_report = time.monotonic()
+
+        def needed(writer):
+            """Examples still to request for a category"""
+            if stalled[writer.category] >= self.max_stalled:
+                return 0
+            return writer.remaining - pending[writer.category]
+
+        def next_batch():
+            """The writer and size of the next batch, None when nothing is left to request"""
+            writer = max(writers, key=needed)
+            if needed(writer) <= 0:
+                return None
+            size = min(self.batch_size, needed(writer))
+            pending[writer.category] += size
+            return writer, size
+
+        async def worker():
+            nonlocal last_report
+            while True:
+                async with changed:
+                    # A batch in flight may come back short, so wait for it before giving up
+                    await changed.wait_for(lambda: any(needed(w) > 0 for w in writers) or not any(pending.values()))
+                    batch = next_batch()
+                    if batch is None:
+                        return
+                writer, size = batch
+                try:
+                    examples = await self.request(writer.category, size)
+                except Exception as e:
+                    self.failures += 1
+                    logger.error(f"{writer.category}: batch of {size} failed after {self.max_retries} retries: {e}")
+                    examples = []
+
+                async with changed:
+                    pending[writer.category] -= size
+                    added = writer.write(examples) if examples else 0
+                    generated[writer.category] += added
+                    stalled[writer.category] = 0 if added else stalled[writer.category] + 1
+                    if stalled[writer.category] == self.max_stalled:
+                        logger.error(f"{writer.category}: giving up after {self.max_stalled} batches without "
+                                     f"new examples, {writer.done}/{writer.target} generated")
+                    changed.notify_all()
+
+                now = time.monotonic()
+                if now - last_report >= self.progress_seconds:
+                    total = sum(generated.values())
+                    logger.info(f"{total} examples, {total / (now - start):.1f} examples/s; " + ", ".join(
+                        f"{w.category} {w.done}/{w.target}" for w in writers))
+                    last_report = now
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return generated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output-dir", required=True, help="Directory of the per-category .jsonl files")
+    parser.add_argument("--categories", nargs="+", choices=list(PROMPT_BUILDERS), metavar="CATEGORY",
+                        help=f"Categories to generate (default: all of {', '.join(PROMPT_BUILDERS)})")
+    parser.add_argument("--per-category", type=int, default=100, help="Examples per category")
+    parser.add_argument("--batch-size", type=int, default=20, help="Examples asked for per request")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight")
+    parser.add_argument("--rate", type=float, help="Requests per second (default: unlimited)")
+    parser.add_argument("--max-retries", type=int, default=5, help="Retries of a failed request")
+    parser.add_argument("--client", choices=sorted(CLIENTS), default="openai")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--temperature", type=float, default=0.8)
+    parser.add_argument("--base-url", help="OpenAI-compatible server, e.g. http://127.0.0.1:9000/v1")
+    parser.add_argument("--stub-latency-ms", type=float, default=200, help="Response time of --client stub")
+    parser.add_argument("--stub-failure-rate", type=float, default=0.0, help="Failed requests of --client stub")
+    parser.add_argument("--restart", action="store_true", help="Ignore existing checkpoints and start over")
+    parser.add_argument("--progress-seconds", type=float, default=10, help="Interval between progress reports")
+    args = parser.parse_args()
+    if args.categories is None:
+        args.categories = list(PROMPT_BUILDERS)
+        with (SERVICE_DIR / "labels.json").open("r", encoding="utf-8") as f:
+            skipped = [category for category in json.load(f) if category not in PROMPT_BUILDERS]
+        if skipped:
+            logger.warning(f"No prompt for {', '.join(skipped)} from labels.json; these categories are skipped")
+
+    if args.client == "stub":
+        client = StubChatClient(args.stub_latency_ms, args.stub_failure_rate)
+    else:
+        client = OpenAIChatClient(args.model, args.temperature, base_url=args.base_url)
+    writers = [CategoryWriter(args.output_dir, c, args.per_category, args.restart) for c in args.categories]
+    for writer in writers:
+        if writer.done:
+            logger.info(f"{writer.category}: resuming at {writer.done}/{writer.target} examples")
+
+    generator = AsyncSyntheticDataGenerator(
+        client, concurrency=args.concurrency, rate=args.rate, batch_size=args.batch_size,
+        max_retries=args.max_retries, progress_seconds=args.progress_seconds,
+    )
+
+    async def run():
+        try:
+            return await generator.generate_all(writers)
+        finally:
+            await client.close()
+
+    start = time.monotonic()
+    try:
+        generated = asyncio.run(run())
+    except KeyboardInterrupt:
+        # Every finished batch is checkpointed, only the ones in flight are lost
+        logger.info("Interrupted; run the same command again to resume")
+        raise SystemExit(130)
+    finally:
+        for writer in writers:
+            writer.close()
+
+    elapsed = time.monotonic() - start
+    total = sum(generated.values())
+    for writer in writers:
+        logger.info(f"{writer.category}: {generated[writer.category]} new, {writer.done}/{writer.target} "
+                    f"in {writer.path}")
+    logger.info(f"Done: {total} examples in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.1f} examples/s), "
+                f"{generator.retries} retries, {generator.failures} failed batches")
+    if any(writer.remaining for writer in writers):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
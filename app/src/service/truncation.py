@@ -0,0 +1,32 @@
+from bisect import bisect_left
+
+# head: keep the first tokens of the prompt (what the HF pipeline does)
+# tail: keep the last tokens, e.g. the error at the end of a pasted log
+# head_tail: keep the start and the end and drop the middle
+TRUNCATION_POLICIES = ("head", "tail", "head_tail")
+
+
+def truncate_tokens(ids, max_tokens, policy="head", head_fraction=0.5):
+    """Cut a token id list down to ``max_tokens`` with the given policy"""
+    if max_tokens is None or len(ids) <= max_tokens:
+        return ids
+    if policy == "head":
+        return ids[:max_tokens]
+    if policy == "tail":
+        return ids[len(ids) - max_tokens:]
+    if policy == "head_tail":
+        head = int(max_tokens * head_fraction)
+        return ids[:head] + ids[len(ids) - (max_tokens - head):]
+    raise ValueError(f"Unknown truncation policy '{policy}', expected one of: {', '.join(TRUNCATION_POLICIES)}")
+
+
+def truncation_info(prompt_tokens, max_tokens, policy):
+    """Response metadata for a prompt longer than the token budget, None when nothing was cut"""
+    if max_tokens is None or prompt_tokens <= max_tokens:
+        return None
+    return {"policy": policy, "prompt_tokens": prompt_tokens, "kept_tokens": max_tokens}
+
+
+def length_bucket(tokens, bounds):
+    """Index of the first bucket whose upper bound fits ``tokens`` (len(bounds) for longer prompts)"""
+    return bisect_left(bounds, tokens)
@@ -0,0 +1,133 @@
+"""Per-request logging overhead: synchronous handlers vs. the queue-based pipeline.
+
+Each simulated request emits the log lines of a classify_prompt cache miss
+(prompt, selected labels, settings merge, latency). "sync" is the previous
+setup: f-strings formatted eagerly and written by a console and a file
+handler in the request thread. The other modes go through the
+NonBlockingQueueHandler with lazy %-formatting, optionally with JSON
+lines and detail sampling. Console output goes to a temporary file so the
+terminal does not skew the numbers; the time the listener needs to drain
+the queue afterwards is reported separately.
+
+Usage:
+    python -m benchmarks.bench_logging --requests 20000 --output logging.json
+"""
+import argparse
+import logging
+import queue
+import random
+import tempfile
+import time
+from logging.handlers import QueueListener
+from pathlib import Path
+
+import numpy as np
+
+from app.src.service.logger import JsonFormatter, NonBlockingQueueHandler, log_format
+from benchmarks.common import SAMPLE_PROMPTS, write_json
+
+LABELS = ("The user is asking about programming or code.", "The user is asking for help debugging an error.")
+SCORES = (0.912, 0.804)
+SETTINGS = {"temperature": 0.1, "reasoning_effort": "high", "web": "disabled", "verbosity": "concise"}
+
+
+def eager_request(logger, prompt):
+    logger.info(f"\nInput Prompt: {prompt}")
+    for lbl, sc in zip(LABELS, SCORES):
+        logger.info(f"Selected labels: {lbl} ({sc:.3f})")
+    logger.info("=== Step: Merging settings from filtered labels ===")
+    logger.info(f"Filtered labels: {LABELS}")
+    logger.info(f"Scores: {SCORES}")
+    logger.info(f"Category keys: {['Coding', 'Debugging']}")
+    logger.info(f"=== Final merged settings ===\n{SETTINGS}")
+    logger.info(f"Latency: {0.412}s, Avg latency: {0.398}s")
+
+
+def lazy_request(logger, prompt, details):
+    if details:
+        logger.info("\nInput Prompt: %s", prompt)
+        for lbl, sc in zip(LABELS, SCORES):
+            logger.info("%s: %s (%.3f)", "Selected labels", lbl, sc)
+        logger.info("=== Step: Merging settings from filtered labels ===")
+        logger.info("Filtered labels: %s", LABELS)
+        logger.info("Scores: %s", SCORES)
+        logger.info("Category keys: %s", ["Coding", "Debugging"])
+        logger.info("=== Final merged settings ===\n%s", SETTINGS)
+    logger.info("Latency: %ss, Avg latency: %ss", 0.412, 0.398)
+
+
+def run_mode(mode, requests, sample_rate, log_dir):
+    formatter = JsonFormatter(datefmt="%Y-%m-%dT%H:%M:%S") if mode == "async_json" else log_format
+    console = logging.StreamHandler(open(log_dir / f"{mode}_console.log", "w", encoding="utf-8"))
+    file = logging.FileHandler(log_dir / f"{mode}.log", mode="w", encoding="utf-8")
+    for handler in (console, file):
+        handler.setFormatter(formatter)
+
+    logger = logging.getLogger(f"bench:{mode}")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener = None
+    if mode == "sync":
+        logger.addHandler(console)
+        logger.addHandler(file)
+    else:
+        queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=requests * 10))
+        listener = QueueListener(queue_handler.queue, console, file, respect_handler_level=True)
+        listener.start()
+        logger.addHandler(queue_handler)
+
+    rng = random.Random(0)
+    timings = np.zeros(requests)
+    for i in range(requests):
+        prompt = SAMPLE_PROMPTS[i % len(SAMPLE_PROMPTS)]
+        start = time.perf_counter()
+        if mode == "sync":
+            eager_request(logger, prompt)
+        else:
+            lazy_request(logger, prompt, sample_rate >= 1 or rng.random() < sample_rate)
+        timings[i] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if listener is not None:
+        listener.stop()
+    drain = time.perf_counter() - start
+    for handler in (console, file):
+        handler.close()
+    logger.handlers.clear()
+
+    return {
+        "mode": mode,
+        "detail_sample_rate": sample_rate,
+        "mean_us": float(timings.mean() * 1e6),
+        "p50_us": float(np.percentile(timings, 50) * 1e6),
+        "p99_us": float(np.percentile(timings, 99) * 1e6),
+        "drain_seconds": drain,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--sample-rate", type=float, default=0.1, help="Detail sample rate of the sampled mode")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_dir = Path(tmp)
+        rows = [
+            run_mode("sync", args.requests, 1.0, log_dir),
+            run_mode("async", args.requests, 1.0, log_dir),
+            run_mode("async_json", args.requests, 1.0, log_dir),
+            run_mode("async", args.requests, args.sample_rate, log_dir),
+        ]
+
+    print(f"{'mode':<11} {'sample':>6} {'mean us':>8} {'p50 us':>8} {'p99 us':>8} {'drain s':>8}")
+    for r in rows:
+        print(f"{r['mode']:<11} {r['detail_sample_rate']:>6.2f} {r['mean_us']:>8.1f} {r['p50_us']:>8.1f} "
+              f"{r['p99_us']:>8.1f} {r['drain_seconds']:>8.2f}")
+
+    write_json(args.output, {"requests": args.requests, "results": rows})
+
+
+if __name__ == "__main__":
+    main()
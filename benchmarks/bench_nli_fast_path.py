@@ -0,0 +1,64 @@
+"""Per-prompt latency and score parity: HF zero-shot pipeline vs. NLIScorer fast path.
+
+The prompts are the samples plus one pasted log longer than the model's
+input limit, so the parity check also covers truncation.
+
+Usage:
+    python -m benchmarks.bench_nli_fast_path --repeats 5 --output nli_fast_path.json
+"""
+import argparse
+import statistics
+
+import numpy as np
+
+from app.src.service.service import get_engine
+from benchmarks.bench_truncation import long_prompt
+from benchmarks.common import SAMPLE_PROMPTS, median_ms, write_json
+
+# Documented tolerance between the pipeline and the fast path (float32 padding noise)
+TOLERANCE = 1e-5
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    engine = get_engine()
+    if engine.name != "nli":
+        parser.error("this benchmark needs CLASSIFIER_ENGINE=nli")
+    run_pipeline, nli_scorer = engine.run_pipeline, engine.scorer
+
+    # Warm up both paths once
+    run_pipeline(SAMPLE_PROMPTS[:1])
+    nli_scorer.score(SAMPLE_PROMPTS[:1])
+
+    rows = []
+    for prompt in SAMPLE_PROMPTS + [long_prompt(80, 0)]:
+        pipeline_ms = median_ms(lambda: run_pipeline([prompt]), args.repeats)
+        fast_ms = median_ms(lambda: nli_scorer.score([prompt]), args.repeats)
+        max_diff = float(np.abs(run_pipeline([prompt]) - nli_scorer.score([prompt])).max())
+        rows.append({
+            "prompt_chars": len(prompt),
+            "prompt_tokens": len(nli_scorer.encode([prompt])[0]),
+            "pipeline_ms": pipeline_ms,
+            "fast_path_ms": fast_ms,
+            "speedup": pipeline_ms / fast_ms,
+            "max_abs_score_diff": max_diff,
+        })
+
+    print(f"{'chars':>6} {'tokens':>6} {'pipeline ms':>12} {'fast ms':>10} {'speedup':>8} {'max diff':>10}")
+    for row in rows:
+        print(f"{row['prompt_chars']:>6} {row['prompt_tokens']:>6} {row['pipeline_ms']:>12.2f} "
+              f"{row['fast_path_ms']:>10.2f} {row['speedup']:>7.2f}x {row['max_abs_score_diff']:>10.2e}")
+
+    worst = max(row["max_abs_score_diff"] for row in rows)
+    print(f"median speedup: {statistics.median(r['speedup'] for r in rows):.2f}x, "
+          f"max score diff: {worst:.2e} (tolerance {TOLERANCE:.0e}) -> {'OK' if worst <= TOLERANCE else 'FAIL'}")
+
+    write_json(args.output, {"tolerance": TOLERANCE, "results": rows})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Micro-benchmarks of the classify_prompt path around the model call.
+
+Each case is timed over --repeats rounds of --number calls and reported as
+the median and fastest per-call time in microseconds. classify_prompt runs
+against the stub engine (no model is loaded or downloaded) and without the
+micro-batching wait, so the uncached case measures the service's own work:
+cache lookups, selection, settings merge, logging and the latency log.
+Console log output is discarded so the terminal does not skew the numbers;
+logs still go through the configured handlers and the log file.
+
+With --baseline, the medians are compared against an earlier --output file.
+
+Usage:
+    python -m benchmarks.bench_service --output service.json
+    python -m benchmarks.bench_service --baseline service.json
+"""
+import argparse
+import os
+import statistics
+import time
+from itertools import count
+
+import numpy as np
+
+from app.src.routers.classify import to_response
+from app.src.service import logger as service_logger
+from app.src.service import service
+from app.src.service.cache import normalize_prompt
+from app.src.service.engines import create_engine
+from benchmarks.common import SAMPLE_PROMPTS, change, environment, load_baseline, write_json
+
+PROMPT = "How do I reverse a linked list in Python?"
+
+
+def time_us(func, number, repeats):
+    """Per-call times in microseconds of ``repeats`` rounds of ``number`` calls"""
+    rounds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - start) * 1e6 / number)
+    return rounds
+
+
+def cases(label_set):
+    """(name, function) pairs; every function does one call of the measured step"""
+    scores = service.get_engine(label_set).score([PROMPT])
+    candidates = label_set.candidate_labels
+    mask = service.select_labels(scores)[0]
+    filtered_labels = [candidates[i] for i in np.flatnonzero(mask)]
+    filtered_scores = [float(scores[0, i]) for i in np.flatnonzero(mask)]
+    batch_mask = service.select_labels(service.get_engine(label_set).score(SAMPLE_PROMPTS * 7))
+    categories, settings = service.classify_prompt(PROMPT)
+    unique = count()
+
+    result = [
+        ("normalize_prompt", lambda: normalize_prompt(PROMPT)),
+        ("cache_key", lambda: service.cache_key(label_set, PROMPT, 0.15, 0.8, 0.2)),
+        ("select_labels", lambda: service.select_labels(scores)),
+        ("map_to_settings", lambda: service.map_to_settings(filtered_labels, filtered_scores, label_set)),
+        (f"merge_settings_batch_{len(batch_mask)}", lambda: service.merge_settings(batch_mask, label_set)),
+        ("log_selected_labels", lambda: service.log_selected_labels(filtered_labels, filtered_scores)),
+        ("update_latency_log", lambda: service.update_latency_log(PROMPT, 0.05)),
+        ("to_response", lambda: to_response(categories, settings)),
+        ("classify_prompt_uncached", lambda: service.classify_prompt(f"{PROMPT} #{next(unique)}")),
+    ]
+    if service.result_cache is not None:
+        result.append(("classify_prompt_cached", lambda: service.classify_prompt(PROMPT)))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=1000, help="Calls per round")
+    parser.add_argument("--repeats", type=int, default=7, help="Rounds per case")
+    parser.add_argument("--baseline", help="Earlier --output file to compare against")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    label_set = service.label_registry.current
+    baseline = load_baseline(args.baseline)
+
+    service_logger.console_handler.setStream(open(os.devnull, "w"))
+    service.model_manager.loader = lambda: create_engine("stub", label_set.candidate_labels, label_set.labels)
+    service.model_manager.load()
+    # Measure the request path itself, not the wait for other prompts to join a batch
+    service.batcher = None
+
+    results = {}
+    print(f"{'case':<28} {'median us':>10} {'min us':>9} {'vs baseline':>11}")
+    for name, func in cases(label_set):
+        func()
+        rounds = time_us(func, args.number, args.repeats)
+        results[name] = {"median_us": statistics.median(rounds), "min_us": min(rounds)}
+        previous = (baseline or {}).get("cases", {}).get(name, {}).get("median_us")
+        print(f"{name:<28} {results[name]['median_us']:>10.2f} {results[name]['min_us']:>9.2f} "
+              f"{change(results[name]['median_us'], previous):>11}")
+
+    write_json(args.output, {
+        "environment": environment(),
+        "number": args.number,
+        "repeats": args.repeats,
+        "cases": results,
+    })
+
+
+if __name__ == "__main__":
+    main()
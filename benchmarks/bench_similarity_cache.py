@@ -0,0 +1,234 @@
+"""Hit rate and label disagreement of the near-duplicate (MinHash LSH) cache on a replay corpus.
+
+Every distinct prompt of the corpus is scored once with the configured
+engine and its category set selected with the default thresholds. The
+corpus is then replayed, in a fixed shuffled order, through a fresh
+SimilarityCache per --thresholds value, the way /classify uses it: an exact
+repeat of an earlier prompt is an exact hit, otherwise the similarity cache
+is looked up and, on a miss, the prompt's own result is added. For every
+approximate hit the served category set is compared with the prompt's own:
+"set disagreement" counts hits whose selected set differs, "top disagreement"
+hits whose highest-confidence category differs.
+
+The default corpus is --variants edited copies of each built-in sample prompt
+(words replaced, dropped or swapped, numbers and casing changed); with
+--data, the edited copies are made from the dataset prompts instead
+(--variants 0 replays the dataset as it is).
+
+Before the replay, and without a model, the built-in labelled prompt pairs
+are checked: for each threshold, "recall" is the share of same-intent pairs
+(template variations and light rewordings) where the second prompt is
+served the first one's result, "false matches" the share of pairs that
+share many words but ask for something else. --pairs-only stops there.
+
+Usage:
+    python -m benchmarks.bench_similarity_cache --pairs-only --thresholds 0.5 0.6 0.7 0.8
+    python -m benchmarks.bench_similarity_cache --variants 20 --thresholds 0.6 0.7 0.8 0.9
+    python -m benchmarks.bench_similarity_cache --data synthetic_data/ --variants 0 --output similarity.json
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.src.service import service
+from app.src.service.cache import normalize_prompt
+from app.src.service.config import (
+    CACHE_NFKC, SIMILARITY_BANDS, SIMILARITY_MAX_ENTRIES, SIMILARITY_NUM_PERM, SIMILARITY_SHINGLE_SIZE
+)
+from app.src.service.similarity_cache import SimilarityCache
+from benchmarks.common import load_prompts, write_json
+
+# (first prompt, second prompt, same intent)
+PARAPHRASE_PAIRS = [
+    ("translate 'hello' to french", "translate 'thanks' to french", True),
+    ("translate \"good morning\" into spanish", "translate \"see you tomorrow\" into spanish", True),
+    ("Translate this sentence to German: I like trains", "translate this sentence to german: we love cake", True),
+    ("plan a 3 day trip to Rome", "plan a 5 day trip to Paris", True),
+    ("plan a 3 day trip to rome", "plan a 3 day trip to rome with kids", True),
+    ("what is the capital of France", "what is the capital of Peru", True),
+    ("who was the first president of the usa", "who was the 16th president of the usa", True),
+    ("how do i reverse a list in python", "how to reverse a list in python", True),
+    ("write a python function to sort a list", "write a python function that sorts a list", True),
+    ("sql group by month sum revenue", "sql group by week sum revenue", True),
+    ("ibuprofen dosage for 35kg child", "ibuprofen dosage for 20kg child", True),
+    ("summarize this article in 3 bullet points", "summarize this article in 5 bullet points", True),
+    ("I'm getting 'IndexError: list index out of range' in my loop", "I'm getting 'KeyError: user_id' in my loop",
+     True),
+    ("write a short poem about the ocean", "write a short poem about the mountains", True),
+    ("hi how are you", "hi how are you doing", True),
+    ("calculate correlation pandas two cols", "calculate correlation between two columns pandas", True),
+    ("5 day norway hiking trip", "7 day norway hiking trip", True),
+    ("bp 150/90 is this dangerous", "bp 160/100 is this dangerous", True),
+    ("what does error code 404 mean", "what does error code 500 mean", True),
+    ("write a story about a dragon named Max", "write a story about a dragon named Luna", True),
+    ("translate this paragraph to french", "summarize this paragraph in french", False),
+    ("write a python function to sort a list", "why does my python function to sort a list fail", False),
+    ("what is the capital of france", "write a poem about the capital of france", False),
+    ("plan a trip to rome", "history of rome", False),
+    ("how do i reverse a list in python", "how do i reverse a diagnosis of diabetes", False),
+    ("summarize this article", "translate this article", False),
+    ("write a sql query to sum revenue by month", "my sql query to sum revenue by month returns null", False),
+    ("hi how are you", "how are you supposed to treat a burn", False),
+    ("is it legal to record a phone call", "write a story about recording a phone call", False),
+    ("translate 'hello' to french", "what does 'hello' mean in french culture", False),
+    ("analyze this sales data for trends", "write a poem about sales data trends", False),
+    ("explain this python code", "fix this python code it crashes", False),
+]
+
+FILLER = ["please", "quickly", "again", "now", "my", "the", "some", "python", "java", "rome", "monday", "data"]
+
+
+def edit(prompt, edits, rng):
+    """A copy of a prompt with ``edits`` random word-level edits"""
+    words = prompt.split()
+    for _ in range(edits):
+        op = rng.integers(5) if len(words) > 1 else 0
+        i = int(rng.integers(len(words)))
+        if op == 0:
+            words.insert(i, str(rng.choice(FILLER)))
+        elif op == 1:
+            words[i] = str(rng.choice(FILLER))
+        elif op == 2:
+            del words[i]
+        elif op == 3:
+            j = int(rng.integers(len(words)))
+            words[i], words[j] = words[j], words[i]
+        else:
+            words[i] = words[i].upper() if rng.random() < 0.5 else str(rng.integers(1, 100))
+    return " ".join(words)
+
+
+def replay_corpus(prompts, variants, max_edits, rng):
+    """Each prompt followed by ``variants`` edited copies, shuffled"""
+    corpus = list(prompts)
+    for prompt in prompts:
+        corpus += [edit(prompt, int(rng.integers(1, max_edits + 1)), rng) for _ in range(variants)]
+    return [corpus[i] for i in rng.permutation(len(corpus))]
+
+
+def pair_check(make_cache):
+    """Recall on same-intent pairs and false matches on different-intent pairs, for one cache setup"""
+    served = {True: 0, False: 0}
+    for first, second, same in PARAPHRASE_PAIRS:
+        cache = make_cache()
+        cache.put(cache.signature(first), 0)
+        served[same] += cache.get(cache.signature(second)) is not None
+    same_pairs = sum(same for _, _, same in PARAPHRASE_PAIRS)
+    return {
+        "recall": served[True] / same_pairs,
+        "false_matches": served[False] / (len(PARAPHRASE_PAIRS) - same_pairs),
+    }
+
+
+def replay(corpus, index, mask, top, cache):
+    """Replay the corpus through one cache, returns the hit and disagreement counts"""
+    seen = set()
+    exact = approximate = set_disagree = top_disagree = 0
+    similarities = []
+    lookup_seconds = 0.0
+    for prompt in corpus:
+        i = index[normalize_prompt(prompt, CACHE_NFKC)]
+        if i in seen:
+            exact += 1
+            continue
+        seen.add(i)
+
+        start = time.perf_counter()
+        signature = cache.signature(prompt)
+        near = cache.get(signature)
+        lookup_seconds += time.perf_counter() - start
+        if near is None:
+            cache.put(signature, i)
+            continue
+        similarity, source = near
+        approximate += 1
+        similarities.append(similarity)
+        set_disagree += not np.array_equal(mask[i], mask[source])
+        top_disagree += top[i] != top[source]
+
+    lookups = len(corpus) - exact
+    return {
+        "prompts": len(corpus),
+        "exact_hits": exact,
+        "approximate_hits": approximate,
+        "approximate_hit_rate": approximate / lookups if lookups else 0.0,
+        "set_disagreement": set_disagree / approximate if approximate else 0.0,
+        "top_disagreement": top_disagree / approximate if approximate else 0.0,
+        "mean_similarity": float(np.mean(similarities)) if similarities else None,
+        "lookup_us": lookup_seconds * 1e6 / lookups if lookups else 0.0,
+        "entries": len(cache),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", help="Labeled .json/.jsonl file or directory (default: built-in sample)")
+    parser.add_argument("--variants", type=int, default=20, help="Edited copies per prompt")
+    parser.add_argument("--max-edits", type=int, default=3, help="Most word edits per copy")
+    parser.add_argument("--thresholds", nargs="+", type=float, default=[0.6, 0.7, 0.8, 0.9])
+    parser.add_argument("--num-perm", type=int, default=SIMILARITY_NUM_PERM)
+    parser.add_argument("--bands", type=int, default=SIMILARITY_BANDS)
+    parser.add_argument("--shingle-size", type=int, default=SIMILARITY_SHINGLE_SIZE)
+    parser.add_argument("--max-entries", type=int, default=SIMILARITY_MAX_ENTRIES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pairs-only", action="store_true", help="Only check the labelled pairs (no model)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    def make_cache(threshold):
+        return SimilarityCache(threshold=threshold, max_entries=args.max_entries, num_perm=args.num_perm,
+                               bands=args.bands, shingle_size=args.shingle_size, ttl_seconds=0, nfkc=CACHE_NFKC)
+
+    pairs = []
+    print(f"{'threshold':>9} {'recall':>7} {'false matches':>13}  ({len(PARAPHRASE_PAIRS)} labelled pairs)")
+    for threshold in args.thresholds:
+        pairs.append({"threshold": threshold, **pair_check(lambda: make_cache(threshold))})
+        print(f"{threshold:>9.2f} {pairs[-1]['recall']:>7.1%} {pairs[-1]['false_matches']:>13.1%}")
+    config = {"num_perm": args.num_perm, "bands": args.bands, "shingle_size": args.shingle_size}
+    if args.pairs_only:
+        write_json(args.output, {**config, "pairs": pairs})
+        return
+
+    label_set = service.label_registry.current
+
+    rng = np.random.default_rng(args.seed)
+    prompts, _ = load_prompts(args.data)
+    corpus = replay_corpus(prompts, args.variants, args.max_edits, rng)
+
+    # One row per distinct normalized prompt; exact repeats share it
+    index = {}
+    for prompt in corpus:
+        index.setdefault(normalize_prompt(prompt, CACHE_NFKC), (len(index), prompt))
+    distinct = [prompt for _, prompt in index.values()]
+    index = {key: i for key, (i, _) in index.items()}
+
+    start = time.perf_counter()
+    scores = service.score_prompts(distinct, label_set=label_set)
+    print(f"Scored {len(distinct)} distinct prompts of {len(corpus)} in {time.perf_counter() - start:.1f}s")
+    mask = service.select_labels(scores)
+    top = scores.argmax(axis=1)
+
+    results = []
+    print(f"\n{'threshold':>9} {'exact':>6} {'approx':>6} {'hit rate':>8} {'set diff':>8} {'top diff':>8} "
+          f"{'mean sim':>8} {'lookup us':>9}")
+    for threshold in args.thresholds:
+        result = {"threshold": threshold, **replay(corpus, index, mask, top, make_cache(threshold))}
+        results.append(result)
+        mean_similarity = "-" if result["mean_similarity"] is None else f"{result['mean_similarity']:.3f}"
+        print(f"{threshold:>9.2f} {result['exact_hits']:>6} {result['approximate_hits']:>6} "
+              f"{result['approximate_hit_rate']:>8.1%} {result['set_disagreement']:>8.1%} "
+              f"{result['top_disagreement']:>8.1%} {mean_similarity:>8} {result['lookup_us']:>9.1f}")
+
+    write_json(args.output, {
+        "corpus": len(corpus),
+        "distinct": len(distinct),
+        "config_version": label_set.version,
+        **config,
+        "pairs": pairs,
+        "results": results,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Tail latency of prompt truncation policies and length bucketing on a mixed-length corpus.
+
+Prompts arrive in micro-batches of --batch-size, in a fixed shuffled order.
+Without bucketing a batch is scored in one padded forward pass; with it,
+the batch is split at the CLASSIFIER_LENGTH_BUCKETS bounds and the groups
+are scored one after the other, as the micro-batcher does. A prompt's
+latency is the time until its group is done. Selected category sets are
+compared against the untruncated, unbucketed baseline, and against gold
+categories when a labeled dataset is given.
+
+The default corpus mixes the built-in sample prompts with pasted log files
+of a few hundred up to about a thousand tokens.
+
+Usage:
+    python -m benchmarks.bench_truncation --max-tokens 128 256 --policies head tail head_tail --output truncation.json
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.src.service import service
+from app.src.service.config import LENGTH_BUCKETS
+from app.src.service.truncation import TRUNCATION_POLICIES, length_bucket
+from benchmarks.common import SAMPLE_PROMPTS, load_prompts, write_json
+
+LOG_LINE = "2024-05-01 12:00:{:02d} INFO worker-{} processed request id={} status=200 duration_ms={}\n"
+LOG_ERROR = "Traceback (most recent call last):\n  File \"app.py\", line 42, in handler\nKeyError: 'user_id'\n"
+
+
+def long_prompt(lines, seed):
+    body = "".join(LOG_LINE.format(i % 60, i % 8, seed * 1000 + i, 10 + i % 90) for i in range(lines))
+    return "Why does my service crash? Here is the log:\n" + body + LOG_ERROR
+
+
+def mixed_corpus(size, long_fraction, rng):
+    """Short sample prompts with a fraction of long pasted logs, shuffled"""
+    n_long = int(size * long_fraction)
+    prompts = [SAMPLE_PROMPTS[i % len(SAMPLE_PROMPTS)] for i in range(size - n_long)]
+    prompts += [long_prompt(int(rng.integers(10, 40)), i) for i in range(n_long)]
+    return [prompts[i] for i in rng.permutation(len(prompts))], None
+
+
+def run(engine, prompts, lengths, batch_size, bucketing):
+    """Score prompts in arrival-order micro-batches, returns (per-prompt latency seconds, scores)"""
+    latencies = np.zeros(len(prompts))
+    scores = np.zeros((len(prompts), len(engine.candidate_labels)))
+    kept = np.minimum(lengths, engine.scorer.max_prompt_tokens)
+
+    for start in range(0, len(prompts), batch_size):
+        index = np.arange(start, min(start + batch_size, len(prompts)))
+        if bucketing:
+            buckets = {}
+            for i in index:
+                buckets.setdefault(length_bucket(kept[i], LENGTH_BUCKETS), []).append(i)
+            groups = list(buckets.values())
+        else:
+            groups = [list(index)]
+
+        elapsed = 0.0
+        for group in groups:
+            t = time.perf_counter()
+            scores[group] = engine.score([prompts[i] for i in group])
+            elapsed += time.perf_counter() - t
+            latencies[group] = elapsed
+    return latencies, scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", help="Labeled .json/.jsonl file or directory (default: synthetic mixed-length corpus)")
+    parser.add_argument("--size", type=int, default=200, help="Prompts in the synthetic corpus")
+    parser.add_argument("--long-fraction", type=float, default=0.2, help="Share of long prompts in the corpus")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-tokens", nargs="+", type=int, default=[128, 256])
+    parser.add_argument("--policies", nargs="+", default=list(TRUNCATION_POLICIES), choices=TRUNCATION_POLICIES)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    label_set = service.label_registry.current
+
+    rng = np.random.default_rng(0)
+    prompts, gold = load_prompts(args.data) if args.data else mixed_corpus(args.size, args.long_fraction, rng)
+    label_names = np.array(label_set.labels)
+
+    engine = service.get_engine()
+    if engine.name != "nli" or not engine.fast_path:
+        parser.error("this benchmark needs CLASSIFIER_ENGINE=nli with the fast path")
+    scorer = engine.scorer
+    model_limit = scorer.max_length - scorer.num_special_tokens - max(len(h) for h in scorer.hypothesis_ids)
+    lengths = np.array(engine.token_lengths(prompts))
+
+    configs = [("model limit", "head", model_limit, False), ("model limit", "head", model_limit, True)]
+    configs += [(f"{budget} tokens", policy, budget, bucketing)
+                for budget in args.max_tokens for policy in args.policies for bucketing in (False, True)]
+
+    engine.score(prompts[:args.batch_size])  # warm-up
+    rows, reference_mask = [], None
+    for name, policy, budget, bucketing in configs:
+        scorer.set_budget(None if name == "model limit" else budget, policy)
+        latencies, scores = run(engine, prompts, lengths, args.batch_size, bucketing)
+        mask = service.select_labels(scores)
+        if reference_mask is None:
+            reference_mask = mask
+
+        row = {
+            "budget": name,
+            "policy": policy,
+            "bucketing": bucketing,
+            "truncated_prompts": int((lengths > scorer.max_prompt_tokens).sum()),
+            "p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "p95_ms": float(np.percentile(latencies, 95) * 1000),
+            "p99_ms": float(np.percentile(latencies, 99) * 1000),
+            "agreement_exact_set": float(np.mean((mask == reference_mask).all(axis=1))),
+        }
+        if gold is not None:
+            row["top1_accuracy"] = float(np.mean(label_names[scores.argmax(axis=1)] == np.array(gold)))
+        rows.append(row)
+
+    print(f"{'budget':<12} {'policy':<10} {'buckets':>7} {'truncated':>9} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'exact set':>10} {'top1 acc':>9}")
+    for r in rows:
+        print(f"{r['budget']:<12} {r['policy']:<10} {str(r['bucketing']):>7} {r['truncated_prompts']:>9} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['agreement_exact_set']:>10.3f} "
+              f"{r.get('top1_accuracy', float('nan')):>9.3f}")
+
+    write_json(args.output, {
+        "prompts": len(prompts),
+        "median_prompt_tokens": float(np.median(lengths)),
+        "max_prompt_tokens": int(lengths.max()),
+        "batch_size": args.batch_size,
+        "length_buckets": list(LENGTH_BUCKETS),
+        "results": rows,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from app.src.service.datasets import load_labeled_examples
+
+SAMPLE_PROMPTS = [
+    "hi",
+    "reverse list python",
+    "How do I reverse a linked list in Python?",
+    "Write a short story about a robot discovering emotions.",
+    "I'm getting 'IndexError: list index out of range'. How do I fix this in my python loop?",
+    "plan 3 days in paris with museums and cafes, we arrive friday evening and leave monday",
+    "translate 'good morning' to french",
+    "what are the side effects of ibuprofen",
+    "calculate correlation pandas two cols",
+    "Summarize the following text: " + "The quick brown fox jumps over the lazy dog. " * 20,
+]
+
+
+def median_ms(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def load_prompts(data=None):
+    """Return (prompts, gold categories or None) from a labeled dataset, or the built-in sample"""
+    if not data:
+        return list(SAMPLE_PROMPTS), None
+    examples = load_labeled_examples(data)
+    return [text for text, _ in examples], [category for _, category in examples]
+
+
+def write_json(path, payload):
+    if path:
+        with open(path, "w") as f:
+            json.dump(payload, f, indent=2)
+
+
+def environment():
+    """Where and on what a benchmark ran, stored with its results so runs can be compared"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "engine": os.environ.get("CLASSIFIER_ENGINE", "nli"),
+    }
+
+
+def load_baseline(path):
+    """Results of an earlier run written with --output, or None"""
+    if not path:
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def change(value, baseline):
+    """Relative change against a baseline value as a printable string"""
+    if value is None or not baseline:
+        return "-"
+    return f"{(value - baseline) / baseline:+.1%}"
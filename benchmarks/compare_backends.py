@@ -0,0 +1,129 @@
+"""Accuracy parity, memory and latency of the NLI inference backends.
+
+Every backend scores the same prompts with the fast path; scores and the
+selected category sets are compared against the fp32 HF pipeline, and
+against gold categories when a labeled dataset is given. The process exits
+with status 1 when a backend drifts further than --max-diff from fp32 or
+disagrees on more than --min-agreement of the category sets.
+
+Usage:
+    python -m benchmarks.compare_backends --data synthetic_data/ --backends fp32 int8 bf16 jit --output backends.json
+"""
+import argparse
+import gc
+import io
+import sys
+import time
+
+import numpy as np
+import torch
+
+from app.src.service import service
+from app.src.service.backends import BACKENDS
+from app.src.service.config import NLI_MODEL
+from app.src.service.engines import NLIEngine
+from benchmarks.common import load_prompts, median_ms, write_json
+
+
+def rss_mb():
+    """Resident set size of this process in MB (Linux)"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def serialized_mb(model):
+    """Size of the model weights as saved by torch (quantized weights stay packed)"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / 1024 / 1024
+
+
+def score_all(engine, prompts, chunk_size=32):
+    return np.concatenate([engine.score(prompts[i:i + chunk_size]) for i in range(0, len(prompts), chunk_size)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", help="Labeled .json/.jsonl file or directory (default: built-in sample prompts)")
+    parser.add_argument("--backends", nargs="+", default=["fp32", "int8", "bf16"], choices=BACKENDS)
+    parser.add_argument("--onnx-path", default="nli_model.onnx", help="Where the onnx backend exports the graph")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-diff", type=float, default=0.05, help="Largest tolerated absolute score difference")
+    parser.add_argument("--min-agreement", type=float, default=0.95, help="Smallest tolerated exact-set agreement")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    label_set = service.label_registry.current
+
+    prompts, gold = load_prompts(args.data)
+    label_names = np.array(label_set.labels)
+
+    reference_engine = NLIEngine(NLI_MODEL, label_set.candidate_labels, device=service.device, fast_path=False)
+    reference = score_all(reference_engine, prompts)
+    reference_mask = service.select_labels(reference)
+    del reference_engine
+    gc.collect()
+
+    report, failed = {}, []
+    for backend in args.backends:
+        rss_before = rss_mb()
+        start = time.perf_counter()
+        engine = NLIEngine(
+            NLI_MODEL, label_set.candidate_labels, device=service.device, backend=backend, onnx_path=args.onnx_path
+        )
+        engine.score(prompts[:1])  # warm-up (and compilation for jit/compile)
+        startup = time.perf_counter() - start
+        rss_after = rss_mb()
+
+        single_ms = [median_ms(lambda p=p, e=engine: e.score([p]), args.repeats) for p in prompts[:50]]
+        start = time.perf_counter()
+        scores = score_all(engine, prompts)
+        elapsed = time.perf_counter() - start
+
+        mask = service.select_labels(scores)
+        r = report[engine.backend] = {
+            "model": NLI_MODEL,
+            "startup_seconds": startup,
+            "rss_delta_mb": rss_after - rss_before,
+            "serialized_mb": serialized_mb(engine.scorer.model),
+            "median_single_prompt_ms": float(np.median(single_ms)),
+            "p95_single_prompt_ms": float(np.percentile(single_ms, 95)),
+            "batched_prompts_per_second": len(prompts) / elapsed,
+            "max_abs_score_diff": float(np.abs(scores - reference).max()),
+            "mean_abs_score_diff": float(np.abs(scores - reference).mean()),
+            "agreement_exact_set": float(np.mean((mask == reference_mask).all(axis=1))),
+            "agreement_top1": float(np.mean(scores.argmax(axis=1) == reference.argmax(axis=1))),
+        }
+        if gold is not None:
+            r["top1_accuracy"] = float(np.mean(label_names[scores.argmax(axis=1)] == np.array(gold)))
+        if r["max_abs_score_diff"] > args.max_diff or r["agreement_exact_set"] < args.min_agreement:
+            failed.append(engine.backend)
+
+        del engine
+        gc.collect()
+
+    print(f"{'backend':<8} {'startup s':>9} {'rss MB':>8} {'size MB':>8} {'median ms':>10} {'p95 ms':>8} "
+          f"{'prompts/s':>10} {'max diff':>9} {'exact set':>10} {'top1 acc':>9}")
+    for name, r in report.items():
+        print(f"{name:<8} {r['startup_seconds']:>9.2f} {r['rss_delta_mb']:>8.1f} {r['serialized_mb']:>8.1f} "
+              f"{r['median_single_prompt_ms']:>10.2f} {r['p95_single_prompt_ms']:>8.2f} "
+              f"{r['batched_prompts_per_second']:>10.1f} {r['max_abs_score_diff']:>9.2e} "
+              f"{r['agreement_exact_set']:>10.3f} {r.get('top1_accuracy', float('nan')):>9.3f}")
+
+    write_json(args.output, {
+        "prompts": len(prompts),
+        "reference": "fp32 pipeline",
+        "max_diff": args.max_diff,
+        "min_agreement": args.min_agreement,
+        "failed": failed,
+        "backends": report,
+    })
+    if failed:
+        print(f"Parity check failed for: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Latency and agreement of the embedding engine next to the NLI engine.
+
+Both engines score the same prompts; the selected category sets (after the
+usual dual-threshold selection) are compared against the NLI engine, and
+against gold categories when a labeled dataset is given.
+
+Usage:
+    python -m benchmarks.compare_engines --data synthetic_data/ --output engines.json
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.src.service import service
+from app.src.service.engines import create_engine
+from benchmarks.common import load_prompts, median_ms, write_json
+
+REFERENCE = "nli"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", help="Labeled .json/.jsonl file or directory (default: built-in sample prompts)")
+    parser.add_argument("--engines", nargs="+", default=["nli", "embedding"])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    label_set = service.label_registry.current
+
+    prompts, gold = load_prompts(args.data)
+    label_names = np.array(label_set.labels)
+
+    engine = service.get_engine()
+    engines = {engine.name: engine}
+    for name in args.engines:
+        if name not in engines:
+            engines[name] = create_engine(name, label_set.candidate_labels, label_set.labels, device=service.device)
+
+    masks, report = {}, {}
+    for name in args.engines:
+        engine = engines[name]
+        engine.score(prompts[:1])  # warm-up
+
+        single_ms = [median_ms(lambda p=p: engine.score([p]), args.repeats) for p in prompts[:50]]
+        start = time.perf_counter()
+        scores = np.concatenate([engine.score(prompts[i:i + 32]) for i in range(0, len(prompts), 32)])
+        elapsed = time.perf_counter() - start
+
+        masks[name] = service.select_labels(scores)
+        report[name] = {
+            "model": engine.model_name,
+            "median_single_prompt_ms": float(np.median(single_ms)),
+            "p95_single_prompt_ms": float(np.percentile(single_ms, 95)),
+            "batched_prompts_per_second": len(prompts) / elapsed,
+        }
+        if gold is not None:
+            top = label_names[scores.argmax(axis=1)]
+            report[name]["top1_accuracy"] = float(np.mean(top == np.array(gold)))
+
+    if REFERENCE in masks:
+        reference = masks[REFERENCE]
+        for name, mask in masks.items():
+            union = (mask | reference).sum(axis=1)
+            report[name]["agreement_exact_set"] = float(np.mean((mask == reference).all(axis=1)))
+            report[name]["agreement_jaccard"] = float(np.mean((mask & reference).sum(axis=1) / np.maximum(union, 1)))
+
+    print(f"{'engine':<10} {'median ms':>10} {'p95 ms':>8} {'prompts/s':>10} {'exact set':>10} {'jaccard':>8} {'top1 acc':>9}")
+    for name, r in report.items():
+        print(f"{name:<10} {r['median_single_prompt_ms']:>10.2f} {r['p95_single_prompt_ms']:>8.2f} "
+              f"{r['batched_prompts_per_second']:>10.1f} {r.get('agreement_exact_set', float('nan')):>10.3f} "
+              f"{r.get('agreement_jaccard', float('nan')):>8.3f} {r.get('top1_accuracy', float('nan')):>9.3f}")
+
+    write_json(args.output, {"prompts": len(prompts), "reference": REFERENCE, "engines": report})
+
+
+if __name__ == "__main__":
+    main()
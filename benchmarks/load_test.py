@@ -0,0 +1,287 @@
+"""Load test of /classify: latency percentiles, throughput and error rate over HTTP.
+
+Requests are sent by an asyncio HTTP/1.1 client over keep-alive connections,
+either closed loop (--concurrency clients, each sending its next request as
+soon as the previous one is answered) or open loop (--rate requests per
+second on a fixed schedule, or Poisson arrivals with --poisson). In open
+loop, latency is measured from the scheduled send time, so a server that
+falls behind is not hidden by requests that were sent late. Latencies and
+errors count the requests sent during --duration after --warmup seconds,
+the throughput counts the successful responses received in that window.
+Non-2xx responses (e.g. 429/503 from load shedding), timeouts and connection
+failures are errors, reported per kind.
+
+With --serve, the server is started for the run (python -m app.serve) with
+the stub engine, so the serving path can be measured without a model:
+CLASSIFIER_STUB_LATENCY_MS and CLASSIFIER_STUB_LATENCY_PER_PROMPT_MS stand in
+for the cost of a forward pass. Other CLASSIFIER_* variables are passed
+through. With --baseline, the results are compared against an earlier
+--output file.
+
+Usage:
+    python -m benchmarks.load_test --serve --concurrency 32 --duration 30 --output load.json
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --rate 200 --poisson --baseline load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from benchmarks.common import change, environment, load_baseline, load_prompts, write_json
+from benchmarks.scale_workers import wait_ready
+
+
+class HttpConnection:
+    """Minimal keep-alive HTTP/1.1 client connection for JSON POST requests"""
+
+    def __init__(self, host, port, headers=()):
+        self.host, self.port = host, port
+        self.extra_headers = "".join(f"{name}: {value}\r\n" for name, value in headers)
+        self.reader = self.writer = None
+
+    async def request(self, path, payload):
+        """Send one POST, returns (status, body); the connection is reopened when needed"""
+        body = json.dumps(payload).encode("utf-8")
+        if self.writer is not None:
+            try:
+                return await self._exchange(path, body)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # The server closed the idle keep-alive connection; send again on a new one
+                self.close()
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return await self._exchange(path, body)
+
+    async def _exchange(self, path, body):
+        self.writer.write(
+            f"POST {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nContent-Type: application/json\r\n"
+            f"{self.extra_headers}Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+        )
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by the server")
+        status = int(status_line.split()[1])
+        headers = {}
+        while (line := await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while size := int((await self.reader.readline()).split(b";")[0], 16):
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            await self.reader.readline()
+            response = b"".join(chunks)
+        else:
+            response = await self.reader.readexactly(int(headers.get("content-length", 0)))
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, response
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Recorder:
+    """Latencies and errors of the requests sent inside the measurement window"""
+
+    def __init__(self, measure_from, measure_until):
+        self.measure_from, self.measure_until = measure_from, measure_until
+        self.latencies = []
+        self.errors = {}
+        self.completed = 0  # successful responses received inside the window, for the throughput
+
+    def record(self, sent_at, latency, error=None):
+        if error is None and self.measure_from <= sent_at + latency < self.measure_until:
+            self.completed += 1
+        if not self.measure_from <= sent_at < self.measure_until:
+            return
+        if error is None:
+            self.latencies.append(latency)
+        else:
+            self.errors[error] = self.errors.get(error, 0) + 1
+
+
+async def send(connection, path, prompt, timeout):
+    """One request, returns None or the kind of error"""
+    try:
+        status, _ = await asyncio.wait_for(connection.request(path, {"prompt": prompt}), timeout)
+    except asyncio.TimeoutError:
+        connection.close()
+        return "timeout"
+    except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+        connection.close()
+        return "connection"
+    return None if 200 <= status < 300 else f"http_{status}"
+
+
+async def closed_loop(args, host, port, prompt_for, recorder, stop_at):
+    async def client(offset):
+        connection = HttpConnection(host, port, args.header)
+        i = offset
+        while (sent_at := time.perf_counter()) < stop_at:
+            error = await send(connection, args.path, prompt_for(i), args.timeout)
+            recorder.record(sent_at, time.perf_counter() - sent_at, error)
+            i += args.concurrency
+        connection.close()
+
+    await asyncio.gather(*(client(i) for i in range(args.concurrency)))
+
+
+async def open_loop(args, host, port, prompt_for, recorder, stop_at):
+    idle = []
+    open_connections = 0
+    available = asyncio.Condition()
+    rng = np.random.default_rng(args.seed)
+
+    async def one(prompt, scheduled):
+        nonlocal open_connections
+        async with available:
+            # Beyond --max-connections, requests wait for a free connection (and their latency grows)
+            await available.wait_for(lambda: idle or open_connections < args.max_connections)
+            if idle:
+                connection = idle.pop()
+            else:
+                connection = HttpConnection(host, port, args.header)
+                open_connections += 1
+        error = await send(connection, args.path, prompt, args.timeout)
+        recorder.record(scheduled, time.perf_counter() - scheduled, error)
+        async with available:
+            idle.append(connection)
+            available.notify()
+
+    tasks = []
+    scheduled = time.perf_counter()
+    i = 0
+    while scheduled < stop_at:
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(prompt_for(i), scheduled)))
+        i += 1
+        scheduled += rng.exponential(1 / args.rate) if args.poisson else 1 / args.rate
+    await asyncio.gather(*tasks)
+    for connection in idle:
+        connection.close()
+
+
+def run(args, prompt_for):
+    url = urlsplit(args.url)
+    start = time.perf_counter()
+    recorder = Recorder(start + args.warmup, start + args.warmup + args.duration)
+    loop = open_loop if args.rate else closed_loop
+    asyncio.run(loop(args, url.hostname, url.port or 80, prompt_for, recorder, recorder.measure_until))
+
+    latencies = np.array(recorder.latencies) * 1000
+    errors = sum(recorder.errors.values())
+    total = len(latencies) + errors
+    percentile = (lambda q: float(np.percentile(latencies, q))) if len(latencies) else (lambda q: None)
+    return {
+        "requests": total,
+        "ok": len(latencies),
+        "errors": recorder.errors,
+        "error_rate": errors / total if total else 0.0,
+        "throughput_rps": recorder.completed / args.duration,
+        "mean_ms": float(latencies.mean()) if len(latencies) else None,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": float(latencies.max()) if len(latencies) else None,
+    }
+
+
+def start_server(args):
+    url = urlsplit(args.url)
+    # Also recorded with the results, see environment()
+    os.environ.setdefault("CLASSIFIER_ENGINE", "stub")
+    env = dict(os.environ)
+    command = [sys.executable, "-m", "app.serve", "--host", url.hostname, "--port", str(url.port or 80),
+               "--workers", str(args.workers)]
+    process = subprocess.Popen(command, env=env)
+    try:
+        wait_ready(args.url, process, args.workers, args.ready_timeout)
+    except BaseException:
+        process.terminate()
+        raise
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the service")
+    parser.add_argument("--path", default="/classify")
+    parser.add_argument("--concurrency", type=int, default=16, help="Closed loop: concurrent clients")
+    parser.add_argument("--rate", type=float, help="Open loop: requests per second (instead of --concurrency)")
+    parser.add_argument("--poisson", action="store_true", help="Open loop: exponential inter-arrival times")
+    parser.add_argument("--max-connections", type=int, default=512, help="Open loop: connections to keep open")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds of load before measuring")
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds before a request counts as timed out")
+    parser.add_argument("--header", action="append", default=[], type=lambda h: tuple(map(str.strip, h.split(":", 1))),
+                        metavar="NAME:VALUE", help="Extra request header, e.g. X-Deadline-Ms:500 (repeatable)")
+    parser.add_argument("--data", help="Labeled .json/.jsonl file or directory to take prompts from")
+    parser.add_argument("--unique", action="store_true", help="Make every prompt unique, so no cache answers")
+    parser.add_argument("--serve", action="store_true", help="Start app.serve (stub engine by default) for the run")
+    parser.add_argument("--workers", type=int, default=1, help="Server workers with --serve")
+    parser.add_argument("--ready-timeout", type=float, default=600)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="Earlier --output file to compare against")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    baseline = load_baseline(args.baseline)
+
+    prompts, _ = load_prompts(args.data)
+
+    def prompt_for(i):
+        """The prompt of the i-th request"""
+        prompt = prompts[i % len(prompts)]
+        return f"{prompt} #{i}" if args.unique else prompt
+
+    process = start_server(args) if args.serve else None
+    try:
+        result = run(args, prompt_for)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=60)
+
+    mode = f"open loop, {args.rate:g} req/s{' (Poisson)' if args.poisson else ''}" if args.rate \
+        else f"closed loop, {args.concurrency} clients"
+    print(f"{args.url}{args.path}, {mode}, {args.duration:g}s")
+    print(f"{'metric':<14} {'value':>10} {'vs baseline':>11}")
+    for name in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms", "error_rate"):
+        value = result[name]
+        previous = (baseline or {}).get("result", {}).get(name)
+        shown = "-" if value is None else f"{value:.3f}" if name == "error_rate" else f"{value:.1f}"
+        print(f"{name:<14} {shown:>10} {change(value, previous):>11}")
+    if result["errors"]:
+        print("errors: " + ", ".join(f"{kind} {n}" for kind, n in sorted(result["errors"].items())))
+
+    write_json(args.output, {
+        "environment": environment(),
+        "server": {k: v for k, v in os.environ.items() if k.startswith("CLASSIFIER_")} if args.serve else None,
+        "url": args.url + args.path,
+        "mode": "open" if args.rate else "closed",
+        "concurrency": None if args.rate else args.concurrency,
+        "rate": args.rate,
+        "poisson": args.poisson,
+        "duration_seconds": args.duration,
+        "warmup_seconds": args.warmup,
+        "unique_prompts": args.unique,
+        "headers": dict(args.header),
+        "result": result,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Memory per worker and aggregate throughput of app.serve as workers scale.
+
+For every worker count, the prefork server is started with the model
+preloaded in the parent (shared copy-on-write) and, with --compare-no-preload,
+loaded separately in each worker. Once it is ready, --concurrency client
+threads send /classify requests for --duration seconds. RSS, PSS (resident
+memory with shared pages split between the processes mapping them) and
+private memory are then read from /proc for the parent and every worker
+(Linux only). The result cache is disabled so every request reaches the model.
+
+Usage:
+    python -m benchmarks.scale_workers --workers 1 2 4 --compare-no-preload --output workers.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+from benchmarks.common import SAMPLE_PROMPTS, write_json
+
+
+def memory_mb(pid):
+    """RSS, PSS and private memory of a process in MB, from /proc/<pid>/smaps_rollup"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": fields.get("Rss", 0.0),
+        "pss_mb": fields.get("Pss", 0.0),
+        "private_mb": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+
+def child_pids(pid):
+    pids = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            pids.extend(int(p) for p in f.read().split())
+    return pids
+
+
+def post(url, payload, timeout=60):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read()
+
+
+def wait_ready(base_url, process, workers, timeout):
+    """Wait until /ready answers 200 on enough consecutive calls to have reached every worker"""
+    deadline = time.monotonic() + timeout
+    streak = 0
+    while streak < 4 * workers:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Server not ready after {timeout}s")
+        try:
+            with urllib.request.urlopen(f"{base_url}/ready", timeout=5):
+                streak += 1
+        except (urllib.error.URLError, ConnectionError):
+            streak = 0
+            time.sleep(0.5)
+
+
+def load_test(base_url, concurrency, duration):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(offset):
+        nonlocal errors
+        i = offset
+        while time.monotonic() < stop_at:
+            prompt = SAMPLE_PROMPTS[i % len(SAMPLE_PROMPTS)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                post(f"{base_url}/classify", {"prompt": prompt})
+            except (urllib.error.URLError, ConnectionError):
+                with lock:
+                    errors += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_latency_ms": float(np.percentile(latencies, 50) * 1000) if latencies else None,
+        "p95_latency_ms": float(np.percentile(latencies, 95) * 1000) if latencies else None,
+    }
+
+
+def run(workers, preload, args):
+    base_url = f"http://127.0.0.1:{args.port}"
+    env = dict(os.environ, CLASSIFIER_CACHE="0")
+    command = [sys.executable, "-m", "app.serve", "--host", "127.0.0.1", "--port", str(args.port),
+               "--workers", str(workers), "--preload" if preload else "--no-preload"]
+    process = subprocess.Popen(command, env=env)
+    try:
+        start = time.perf_counter()
+        wait_ready(base_url, process, workers, args.ready_timeout)
+        startup = time.perf_counter() - start
+
+        throughput = load_test(base_url, args.concurrency, args.duration)
+        parent = memory_mb(process.pid)
+        per_worker = [memory_mb(pid) for pid in child_pids(process.pid)]
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+
+    return {
+        "workers": workers,
+        "preload": preload,
+        "startup_seconds": startup,
+        "parent": parent,
+        "per_worker": per_worker,
+        "mean_worker_rss_mb": float(np.mean([m["rss_mb"] for m in per_worker])),
+        "mean_worker_pss_mb": float(np.mean([m["pss_mb"] for m in per_worker])),
+        "mean_worker_private_mb": float(np.mean([m["private_mb"] for m in per_worker])),
+        "total_pss_mb": parent["pss_mb"] + sum(m["pss_mb"] for m in per_worker),
+        **throughput,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--compare-no-preload", action="store_true",
+                        help="Also run every worker count with the model loaded in each worker")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent client threads")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load per run")
+    parser.add_argument("--ready-timeout", type=float, default=600)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    modes = [True, False] if args.compare_no_preload else [True]
+    runs = [run(workers, preload, args) for preload in modes for workers in args.workers]
+
+    print(f"{'workers':>7} {'preload':>7} {'startup s':>9} {'worker rss':>10} {'worker pss':>10} "
+          f"{'private':>8} {'total pss':>9} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'errors':>6}")
+    for r in runs:
+        print(f"{r['workers']:>7} {str(r['preload']):>7} {r['startup_seconds']:>9.1f} "
+              f"{r['mean_worker_rss_mb']:>10.1f} {r['mean_worker_pss_mb']:>10.1f} "
+              f"{r['mean_worker_private_mb']:>8.1f} {r['total_pss_mb']:>9.1f} {r['requests_per_second']:>7.1f} "
+              f"{r['p50_latency_ms'] or float('nan'):>8.1f} {r['p95_latency_ms'] or float('nan'):>8.1f} "
+              f"{r['errors']:>6}")
+
+    write_json(args.output, {
+        "concurrency": args.concurrency,
+        "duration_seconds": args.duration,
+        "runs": runs,
+    })
+
+
+if __name__ == "__main__":
+    main()
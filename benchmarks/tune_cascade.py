@@ -0,0 +1,87 @@
+"""Sweep the cascade margin against an accuracy budget.
+
+Scores a labeled dataset once with the first tier (hashed n-gram model) and
+once with the second tier (the configured engine), then reports for each
+margin the share of prompts the first tier answers, top-1 accuracy,
+agreement with second-tier-only selection and the expected mean latency.
+
+Usage:
+    python -m benchmarks.tune_cascade --data synthetic_data/ --model cascade_model.npz --budget 0.01
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.src.service import service
+from app.src.service.cascade import CascadeEngine, HashedNgramClassifier, top_margin
+from benchmarks.common import load_prompts, write_json
+
+
+def timed_scores(score, prompts, chunk=32):
+    start = time.perf_counter()
+    scores = np.concatenate([score(prompts[i:i + chunk]) for i in range(0, len(prompts), chunk)])
+    return scores, (time.perf_counter() - start) * 1000 / len(prompts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", required=True, help="Labeled .json/.jsonl file or directory")
+    parser.add_argument("--model", required=True, help="First-tier model (.npz) from app.src.service.cascade")
+    parser.add_argument("--budget", type=float, default=0.01, help="Allowed top-1 accuracy drop vs. second tier only")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    label_set = service.label_registry.current
+
+    prompts, gold = load_prompts(args.data)
+    gold = np.array(gold)
+    names = np.array(label_set.labels)
+
+    engine = service.get_engine()
+    second = engine.second_tier if isinstance(engine, CascadeEngine) else engine
+    first = HashedNgramClassifier.load(args.model).aligned_to(label_set.labels)
+    tier1, tier1_ms = timed_scores(first.score, prompts)
+    tier2, tier2_ms = timed_scores(second.score, prompts)
+
+    reference_mask = service.select_labels(tier2)
+    reference_accuracy = float(np.mean(names[tier2.argmax(axis=1)] == gold))
+    margins = top_margin(tier1)
+
+    rows = []
+    for margin in np.round(np.linspace(0, 1, 21), 2):
+        confident = margins >= margin
+        combined = np.where(confident[:, None], tier1, tier2)
+        hit_rate = float(confident.mean())
+        rows.append({
+            "margin": float(margin),
+            "tier1_hit_rate": hit_rate,
+            "top1_accuracy": float(np.mean(names[combined.argmax(axis=1)] == gold)),
+            "agreement_exact_set": float(np.mean((service.select_labels(combined) == reference_mask).all(axis=1))),
+            "expected_ms_per_prompt": tier1_ms + (1 - hit_rate) * tier2_ms,
+        })
+
+    print(f"tier1 {tier1_ms:.2f} ms/prompt, tier2 {tier2_ms:.2f} ms/prompt, "
+          f"tier2-only accuracy {reference_accuracy:.3f}")
+    print(f"{'margin':>6} {'tier1 hit':>9} {'accuracy':>9} {'agreement':>9} {'ms/prompt':>10}")
+    for row in rows:
+        print(f"{row['margin']:>6.2f} {row['tier1_hit_rate']:>9.3f} {row['top1_accuracy']:>9.3f} "
+              f"{row['agreement_exact_set']:>9.3f} {row['expected_ms_per_prompt']:>10.2f}")
+
+    within_budget = [r for r in rows if r["top1_accuracy"] >= reference_accuracy - args.budget]
+    best = min(within_budget, key=lambda r: r["expected_ms_per_prompt"]) if within_budget else None
+    if best:
+        print(f"Recommended CLASSIFIER_CASCADE_MARGIN={best['margin']} "
+              f"({best['tier1_hit_rate']:.1%} answered by tier 1, {best['expected_ms_per_prompt']:.2f} ms/prompt)")
+
+    write_json(args.output, {
+        "tier1_ms_per_prompt": tier1_ms,
+        "tier2_ms_per_prompt": tier2_ms,
+        "tier2_accuracy": reference_accuracy,
+        "budget": args.budget,
+        "recommended_margin": best["margin"] if best else None,
+        "sweep": rows,
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Evaluate the label selection thresholds on a labeled dataset and grid-search better ones.
+
+The dataset is scored once with the configured engine (service.score_prompts,
+the same path /classify/batch takes) and the raw score matrix is cached in
+--scores. Later runs on the same dataset, labels and model load the matrix
+instead of running inference again. The sweep applies select_labels for every
+combination of high_gap, ratio and min_threshold at once in NumPy and reports
+micro/macro F1, exact-set match (selected set == {gold category}) and the
+mean number of selected labels. Per-category precision/recall/F1 and a
+confusion matrix (gold category x selected category) are printed for the
+current defaults and the best combination.
+
+Usage:
+    python -m benchmarks.tune_thresholds --data synthetic_data/ --scores scores.npz --objective macro_f1
+"""
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.src.service import service
+from app.src.service.cache import config_version
+from benchmarks.common import load_prompts, write_json
+
+DEFAULTS = {"high_gap": 0.15, "ratio": 0.8, "min_threshold": 0.2}
+OBJECTIVES = ("macro_f1", "micro_f1", "exact_set")
+
+
+def load_or_score(path, prompts, gold, label_set):
+    """Return the (N, L) score matrix, from the cache file if it matches this dataset and label set"""
+    key = config_version(label_set.version, prompts, gold)
+    if path and Path(path).exists():
+        cached = np.load(path)
+        if str(cached["key"]) == key:
+            print(f"Loaded cached scores from {path}")
+            return cached["scores"]
+        print(f"{path} was scored with a different dataset or label set, scoring again")
+
+    start = time.perf_counter()
+    scores = service.score_prompts(prompts, label_set=label_set)
+    elapsed = time.perf_counter() - start
+    print(f"Scored {len(prompts)} prompts in {elapsed:.1f}s ({elapsed * 1000 / len(prompts):.1f} ms/prompt)")
+    if path:
+        np.savez_compressed(path, scores=scores, key=key, labels=np.array(label_set.labels))
+    return scores
+
+
+def row_stats(selected, gold_mask):
+    """Per-row additive counts of a selection: true positives and selections per label, exact match, labels"""
+    return np.concatenate([
+        selected & gold_mask,
+        selected,
+        (selected == gold_mask).all(axis=1, keepdims=True),
+        selected.sum(axis=1, keepdims=True),
+    ], axis=1).astype(np.int64)
+
+
+def metrics(totals, gold_mask):
+    """Scores from summed row_stats, one row of totals per threshold combination"""
+    labels = gold_mask.shape[1]
+    tp, selected = totals[:, :labels], totals[:, labels:2 * labels]
+    fp, fn = selected - tp, gold_mask.sum(axis=0) - tp
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.nan_to_num(tp / (tp + fp))
+        recall = np.nan_to_num(tp / (tp + fn))
+        f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+        micro_p = tp.sum(axis=1) / np.maximum((tp + fp).sum(axis=1), 1)
+        micro_r = tp.sum(axis=1) / np.maximum((tp + fn).sum(axis=1), 1)
+        micro_f1 = np.nan_to_num(2 * micro_p * micro_r / (micro_p + micro_r))
+
+    # Categories without gold examples would only pull the macro average down
+    present = gold_mask.any(axis=0)
+    return {
+        "macro_f1": f1[:, present].mean(axis=1),
+        "micro_f1": micro_f1,
+        "exact_set": totals[:, -2] / len(gold_mask),
+        "mean_labels": totals[:, -1] / len(gold_mask),
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+    }
+
+
+def sweep(scores, gold_mask, high_gaps, ratios, min_thresholds):
+    """Summed row_stats of select_labels for every (high_gap, ratio, min_threshold), shape (H, R, M, K).
+
+    For a fixed ratio and min_threshold, high_gap only decides which rows
+    keep the top label alone: those whose top-vs-second delta exceeds it.
+    With the rows sorted by delta that is a prefix, so the totals for every
+    high_gap come from one cumulative sum instead of one pass each.
+    """
+    rows = np.arange(scores.shape[0])
+    top_idx = scores.argmax(axis=1)
+    top_score = scores[rows, top_idx]
+    if scores.shape[1] > 1:
+        second_score = np.partition(scores, -2, axis=1)[:, -2]
+    else:
+        second_score = np.zeros_like(top_score)
+    delta = top_score - second_score
+    top_only = np.zeros(scores.shape, dtype=bool)
+    top_only[rows, top_idx] = True
+
+    order = np.argsort(-delta, kind="stable")
+    dominant = (delta[None, :] > high_gaps[:, None]).sum(axis=1)  # rows in the prefix, per high_gap
+    top_only_stats = row_stats(top_only, gold_mask)
+
+    totals = np.zeros((len(high_gaps), len(ratios), len(min_thresholds), top_only_stats.shape[1]), dtype=np.int64)
+    for j, ratio in enumerate(ratios):
+        for k, min_threshold in enumerate(min_thresholds):
+            selected = scores >= np.maximum(min_threshold, top_score * ratio)[:, None]
+            # Rows where nothing cleared the threshold keep the top label whatever high_gap is
+            empty = ~selected.any(axis=1)
+            selected[empty] = top_only[empty]
+            stats = row_stats(selected, gold_mask)
+            switch = np.cumsum((top_only_stats - stats)[order], axis=0)
+            switch = np.vstack([np.zeros((1, switch.shape[1]), dtype=np.int64), switch])
+            totals[:, j, k] = stats.sum(axis=0) + switch[dominant]
+    return totals
+
+
+def report(title, thresholds, mask, gold_mask, labels):
+    """Print per-category metrics and the confusion matrix of one selection mask, returns them as a dict"""
+    totals = row_stats(mask, gold_mask).sum(axis=0)[None]
+    result = {name: value[0] for name, value in metrics(totals, gold_mask).items()}
+    confusion = gold_mask.T.astype(np.int64) @ mask.astype(np.int64)
+
+    print(f"\n{title}: " + ", ".join(f"{k}={v:.3f}" for k, v in thresholds.items()))
+    print(f"macro F1 {result['macro_f1']:.3f}, micro F1 {result['micro_f1']:.3f}, "
+          f"exact set {result['exact_set']:.3f}, labels/prompt {result['mean_labels']:.2f}")
+    print(f"{'category':<26} {'support':>7} {'precision':>9} {'recall':>7} {'f1':>6}")
+    for i, label in enumerate(labels):
+        print(f"{label:<26} {int(gold_mask[:, i].sum()):>7} {result['precision'][i]:>9.3f} "
+              f"{result['recall'][i]:>7.3f} {result['f1'][i]:>6.3f}")
+
+    short = [label[:6] for label in labels]
+    print("Confusion (rows: gold, columns: selected)")
+    print(f"{'':<26} " + " ".join(f"{s:>6}" for s in short))
+    for i, label in enumerate(labels):
+        print(f"{label:<26} " + " ".join(f"{c:>6}" for c in confusion[i]))
+
+    return {
+        "thresholds": thresholds,
+        **{k: float(result[k]) for k in ("macro_f1", "micro_f1", "exact_set", "mean_labels")},
+        "per_category": {
+            label: {"support": int(gold_mask[:, i].sum()), "precision": float(result["precision"][i]),
+                    "recall": float(result["recall"][i]), "f1": float(result["f1"][i])}
+            for i, label in enumerate(labels)
+        },
+        "confusion": {"labels": list(labels), "matrix": confusion.tolist()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", required=True, help="Labeled .json/.jsonl file or directory")
+    parser.add_argument("--scores", help="Score matrix cache (.npz), written on the first run and reused after")
+    parser.add_argument("--objective", choices=OBJECTIVES, default="macro_f1")
+    parser.add_argument("--steps", type=int, default=21, help="Grid points per threshold")
+    parser.add_argument("--high-gap-range", nargs=2, type=float, default=[0.0, 0.5])
+    parser.add_argument("--ratio-range", nargs=2, type=float, default=[0.5, 1.0])
+    parser.add_argument("--min-threshold-range", nargs=2, type=float, default=[0.0, 0.5])
+    parser.add_argument("--top", type=int, default=10, help="Best combinations to print")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+    label_set = service.label_registry.current
+
+    prompts, gold = load_prompts(args.data)
+    known = [i for i, category in enumerate(gold) if category in label_set.labels]
+    if len(known) < len(gold):
+        print(f"Skipping {len(gold) - len(known)} examples with categories outside labels.json")
+    prompts, gold = [prompts[i] for i in known], [gold[i] for i in known]
+    if not prompts:
+        parser.error("no examples with a known category")
+
+    scores = load_or_score(args.scores, prompts, gold, label_set)
+    labels = label_set.labels
+    gold_mask = np.zeros(scores.shape, dtype=bool)
+    gold_mask[np.arange(len(gold)), [labels.index(category) for category in gold]] = True
+
+    axes = [np.linspace(*args.high_gap_range, args.steps), np.linspace(*args.ratio_range, args.steps),
+            np.linspace(*args.min_threshold_range, args.steps)]
+    grid = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+
+    start = time.perf_counter()
+    totals = sweep(scores, gold_mask, *axes).reshape(len(grid), -1)
+    results = metrics(totals, gold_mask)
+    print(f"Evaluated {len(grid)} threshold combinations on {len(prompts)} prompts "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    ranking = np.argsort(-results[args.objective], kind="stable")
+    print(f"\n{'high_gap':>8} {'ratio':>6} {'min_thr':>7} {'macro F1':>8} {'micro F1':>8} {'exact set':>9} "
+          f"{'labels':>6}")
+    for i in ranking[:args.top]:
+        print(f"{grid[i, 0]:>8.3f} {grid[i, 1]:>6.3f} {grid[i, 2]:>7.3f} {results['macro_f1'][i]:>8.3f} "
+              f"{results['micro_f1'][i]:>8.3f} {results['exact_set'][i]:>9.3f} {results['mean_labels'][i]:>6.2f}")
+
+    best = dict(zip(DEFAULTS, map(float, grid[ranking[0]])))
+    best_mask = service.select_labels(scores, **best)
+    if not np.array_equal(row_stats(best_mask, gold_mask).sum(axis=0), totals[ranking[0]]):
+        raise RuntimeError("The vectorized sweep does not reproduce service.select_labels")
+
+    current = report("Current defaults", DEFAULTS, service.select_labels(scores, **DEFAULTS), gold_mask, labels)
+    tuned = report(f"Best by {args.objective}", best, best_mask, gold_mask, labels)
+
+    write_json(args.output, {
+        "prompts": len(prompts),
+        "config_version": label_set.version,
+        "objective": args.objective,
+        "current": current,
+        "best": tuned,
+        "top": [{**dict(zip(DEFAULTS, map(float, grid[i]))),
+                 **{k: float(results[k][i]) for k in ("macro_f1", "micro_f1", "exact_set", "mean_labels")}}
+                for i in ranking[:args.top]],
+    })
+
+
+if __name__ == "__main__":
+    main()